@@ -1,6 +1,9 @@
 import argparse
+import hashlib
 import json
 import subprocess
+import time
+from typing import Dict, List, Optional
 
 import redis
 ## TO RUN: python py/evaluate-urban.py
@@ -12,7 +15,17 @@ PYTHON_ROOT = "/storage/cmarnold/projects/maps"
 GRADE_DATASET = "/storage/cmarnold/projects/maps/SurveyBridge/grade_dataset.py"
 SURVEY_PYTHON = "/storage/cmarnold/shared/conda/envs/map-survey/bin/python"
 SURVEY_ROOT = "/storage/cmarnold/projects/map-survey"
-ADD_EVAL = "/storage/cmarnold/projects/map-survey/py/add_eval.py"
+SURVEY_CLI = "/storage/cmarnold/projects/map-survey/py/survey.py"
+
+# (pid, dataset) → last grading, so unchanged answers are never regraded:
+#   HASH field "<pid>:<dataset>" → {"digest", "grader", "accuracy", "eval_file", "ts"}
+CACHE_KEY = "v1:grading:cache"
+# written back into the answers by add_eval.py – not part of what is graded
+GRADER_FIELDS = ("llm_eval",)
+# datasets assigned to <pid> and not yet submitted – see py/availability.py;
+# writing the submission marker must take the dataset out of it
+OPEN_PREFIX = "v1:open:"
+BATCH_SIZE = 5_000
 
 
 def parse_args() -> argparse.Namespace:
@@ -23,11 +36,57 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--force",
         action="store_true",
-        help="Regrade even if v1:<pid>:<dataset>:meta already exists.",
+        help="Regrade even if v1:<pid>:<dataset>:meta already exists "
+        "(pairs whose answers and grader are unchanged still come from the cache).",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help=f"Ignore {CACHE_KEY} and regrade every selected pair.",
+    )
+    parser.add_argument(
+        "--grader-version",
+        help="Grader version for the cache (default: sha256 of grade_dataset.py).",
     )
     return parser.parse_args()
 
 
+def grader_version() -> Optional[str]:
+    try:
+        with open(GRADE_DATASET, "rb") as fh:
+            return hashlib.sha256(fh.read()).hexdigest()[:16]
+    except OSError:
+        return None
+
+
+def answers_digest(r: redis.Redis, pid: str, dataset: str, uids: List[str]) -> str:
+    """sha256 over the user's answers to the dataset's questions, minus grader output."""
+    h = hashlib.sha256()
+    for start in range(0, len(uids), BATCH_SIZE):
+        chunk = uids[start : start + BATCH_SIZE]
+        for uid, raw in zip(chunk, r.mget([f"v1:{pid}:{dataset}:{uid}" for uid in chunk])):
+            if raw is None:
+                continue
+            try:
+                obj = json.loads(raw)
+            except json.JSONDecodeError:
+                obj = raw
+            if isinstance(obj, dict):
+                for field in GRADER_FIELDS:
+                    obj.pop(field, None)
+            h.update(uid.encode() + b"\0")
+            h.update(json.dumps(obj, sort_keys=True, separators=(",", ":")).encode() + b"\n")
+    return h.hexdigest()
+
+
+def cached(r: redis.Redis, pid: str, dataset: str) -> Dict:
+    raw = r.hget(CACHE_KEY, f"{pid}:{dataset}")
+    try:
+        return json.loads(raw) if raw else {}
+    except json.JSONDecodeError:
+        return {}
+
+
 def run_grade(pid: str, dataset: str) -> dict:
     result = subprocess.run(
         [PYTHON_BIN, GRADE_DATASET, pid, dataset],
@@ -51,14 +110,18 @@ def run_grade(pid: str, dataset: str) -> dict:
 
 def run_add_eval(pid: str, dataset: str, eval_file: str) -> None:
     result = subprocess.run(
-        [SURVEY_PYTHON, ADD_EVAL, pid, dataset, eval_file],
+        [SURVEY_PYTHON, SURVEY_CLI, "add-eval", pid, dataset, eval_file, "--json"],
         cwd=SURVEY_ROOT,
         check=False,
         capture_output=True,
         text=True,
     )
     if result.returncode != 0:
-        raise RuntimeError(result.stderr.strip() or "add_eval failed")
+        try:
+            error = json.loads(result.stdout or "{}").get("error")
+        except json.JSONDecodeError:
+            error = None
+        raise RuntimeError(error or result.stderr.strip() or "add-eval failed")
 
 
 def main() -> None:
@@ -72,14 +135,20 @@ def main() -> None:
         print(f"No datasets found starting with '{DATASET_PREFIX}'.")
         return
 
+    grader = None if args.no_cache else (args.grader_version or grader_version())
+    if grader is None and not args.no_cache:
+        print(f"Cannot read {GRADE_DATASET} – grading cache disabled.")
+
     total = 0
     skipped = 0
     failures = 0
+    hits = 0
 
     for dataset in urban_datasets:
         assigned = r.smembers(f"v1:assignments:{dataset}")
         if not assigned:
             continue
+        uids = sorted(r.smembers(f"v1:datasets:{dataset}"))
 
         for pid in sorted(assigned):
             meta_key = f"v1:{pid}:{dataset}:meta"
@@ -87,6 +156,18 @@ def main() -> None:
                 skipped += 1
                 continue
 
+            digest = answers_digest(r, pid, dataset, uids) if grader else None
+            if digest:
+                entry = cached(r, pid, dataset)
+                if entry.get("digest") == digest and entry.get("grader") == grader:
+                    pipe = r.pipeline(transaction=True)
+                    if r.get(meta_key) != str(entry["accuracy"]):
+                        pipe.set(meta_key, entry["accuracy"])
+                    pipe.srem(f"{OPEN_PREFIX}{pid}", dataset)
+                    pipe.execute()
+                    hits += 1
+                    continue
+
             try:
                 result = run_grade(pid, dataset)
                 accuracy = result.get("accuracy")
@@ -97,16 +178,27 @@ def main() -> None:
                 if eval_file:
                     run_add_eval(pid, dataset, eval_file)
 
-                r.set(meta_key, accuracy)
+                pipe = r.pipeline(transaction=True)
+                pipe.set(meta_key, accuracy)
+                pipe.srem(f"{OPEN_PREFIX}{pid}", dataset)
+                if digest:
+                    pipe.hset(CACHE_KEY, f"{pid}:{dataset}", json.dumps({
+                        "digest": digest, "grader": grader, "accuracy": accuracy,
+                        "eval_file": eval_file, "ts": int(time.time() * 1000),
+                    }))
+                pipe.execute()
                 total += 1
                 print(f"Graded {pid}/{dataset}: {accuracy}")
             except Exception as exc:  # noqa: BLE001
                 failures += 1
                 print(f"Failed {pid}/{dataset}: {exc}")
 
+    looked_up = hits + total + failures
+    hit_rate = f"{hits / looked_up:.0%}" if grader and looked_up else "n/a"
     print(
         "\nDone. "
-        f"graded={total}, skipped={skipped}, failures={failures}, datasets={len(urban_datasets)}"
+        f"graded={total}, cached={hits} (hit rate {hit_rate}), skipped={skipped}, "
+        f"failures={failures}, datasets={len(urban_datasets)}"
     )
 
 
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 """Export difficulty responses from Redis in adjudication-like format.
 
-This script iterates through every stored answer in Redis and updates
+This script iterates through every stored answer in Redis (and in the
+archive segments, for datasets py/archive_datasets.py moved out) and updates
 per-dataset JSON Lines files so they mirror how adjudication exports are
 structured. Each JSON object includes the full answer payload plus question
 metadata, dataset metadata, and an inferred difficulty scale (0-10, 0-5, or
@@ -12,20 +13,32 @@ stdout.
 After updating the JSONL files, the script prints a summary describing when
 the recorded difficulties switched from a 0-10 scale to 0-5 and then to
 time-based values.
+
+Datasets whose answers and JSONL file are unchanged since the previous run
+(tracked in the export manifest, see export_manifest.py) skip the question
+and metadata lookups, the merge and the rewrite; only changed files are
+reported.
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import sys
 from collections import defaultdict
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Iterator, List, Optional, Tuple, Union
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
 import redis
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "py"))
+
+from archive_datasets import archived_answers, load_all as load_archived  # noqa: E402
+from export_manifest import ExportManifest, answers_digest
+from latency_scan import LATENCY_BUDGET_MS, AdaptiveScanner  # noqa: E402  (py/)
+
 # ---------------------------------------------------------------------------
 # Configuration constants
 # ---------------------------------------------------------------------------
@@ -65,7 +78,7 @@ class DifficultyRecord:
 # Helper functions
 # ---------------------------------------------------------------------------
 
-def parse_args() -> argparse.Namespace:
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Export difficulty responses in JSON Lines format"
     )
@@ -96,7 +109,19 @@ def parse_args() -> argparse.Namespace:
             "scale switch summary and any requested stdout emission"
         ),
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--latency-budget-ms",
+        type=float,
+        default=LATENCY_BUDGET_MS,
+        help="p99 Redis round trip the key scan slows down to stay under "
+        f"(default: {LATENCY_BUDGET_MS:g})",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rewrite every JSONL export even if the manifest says it is unchanged",
+    )
+    return parser.parse_args(argv)
 
 
 def to_str(value: Union[str, bytes]) -> str:
@@ -164,9 +189,9 @@ def isoformat_from_millis(ts: Optional[int]) -> str:
         return "unknown"
 
 
-def iter_answer_keys(r: redis.Redis, pid: str) -> Iterator[str]:
+def iter_answer_keys(scanner: AdaptiveScanner, pid: str) -> Iterator[str]:
     pattern = f"v1:{pid}:*:*"
-    for key in r.scan_iter(match=pattern, count=10_000):
+    for key in scanner.scan_iter(match=pattern):
         if isinstance(key, bytes) and key.endswith(META_SUFFIX):
             continue
         key_str = to_str(key)
@@ -186,7 +211,10 @@ def extract_ids_from_key(key: str) -> Optional[Tuple[str, str, str]]:
 
 
 def load_json(r: redis.Redis, key: str) -> Optional[JsonDict]:
-    raw = r.get(key)
+    return parse_json(r.get(key))
+
+
+def parse_json(raw: Union[str, bytes, None]) -> Optional[JsonDict]:
     if not raw:
         return None
     if isinstance(raw, bytes):
@@ -197,81 +225,134 @@ def load_json(r: redis.Redis, key: str) -> Optional[JsonDict]:
         return None
 
 
-def collect_difficulties(r: redis.Redis) -> Tuple[List[DifficultyRecord], Dict[str, str]]:
-    dataset_meta_cache: Dict[str, Optional[JsonDict]] = {}
-    question_cache: Dict[Tuple[str, str], Optional[JsonDict]] = {}
+def load_raw_answers(scanner: AdaptiveScanner, pid: str) -> List[Tuple[str, bytes]]:
+    keys = list(iter_answer_keys(scanner, pid))
+    return [(key, raw) for key, raw in zip(keys, scanner.mget(keys)) if raw]
+
+
+def load_questions(
+    scanner: AdaptiveScanner, dataset: str, uids: List[str]
+) -> Dict[str, Optional[JsonDict]]:
+    values = scanner.mget([f"v1:datasets:{dataset}:{uid}" for uid in uids])
+    return {uid: parse_json(raw) for uid, raw in zip(uids, values)}
+
+
+def collect_difficulties(
+    r: redis.Redis,
+    is_current: Optional[Callable[[str, str], bool]] = None,
+    enrich_unchanged: bool = False,
+    scanner: Optional[AdaptiveScanner] = None,
+) -> Tuple[List[DifficultyRecord], Dict[str, str], Dict[str, str], Set[str]]:
+    """Load every answer and classify difficulty scales per dataset.
+
+    Returns the records, the scale per dataset, the answer digest per dataset
+    and the set of datasets `is_current(dataset, digest)` reported as already
+    exported. Unless `enrich_unchanged` is set, records of those datasets are
+    not enriched with question/dataset metadata. Key scans and value reads go
+    through `scanner` (a default-budget AdaptiveScanner if none is given).
+    """
+    scanner = scanner or AdaptiveScanner(r)
     dataset_max_numeric: Dict[str, float] = {}
     dataset_time_like: Dict[str, bool] = {}
 
     records: List[DifficultyRecord] = []
+    loaded: List[Tuple[str, JsonDict, str, str]] = []
+    sources_by_dataset: Dict[str, List[Tuple[str, bytes]]] = defaultdict(list)
+    uids_by_dataset: Dict[str, Set[str]] = defaultdict(set)
 
     pids = sorted(to_str(pid) for pid in r.smembers(USER_SET_KEY))
+    archived = load_archived(r)        # archived datasets: answers live in archive/
 
-    for pid in pids:
-        for key in iter_answer_keys(r, pid):
-            ids = extract_ids_from_key(key)
-            if ids is None:
-                continue
-            _, dataset_from_key, uid_from_key = ids
+    def answer_sources() -> Iterator[Tuple[str, str, Union[str, bytes]]]:
+        for pid in pids:
+            for key, raw in load_raw_answers(scanner, pid):
+                yield pid, key, raw
+        yield from archived_answers(archived, set(pids))
 
-            answer = load_json(r, key)
-            if answer is None:
-                continue
+    for pid, key, raw in answer_sources():
+        ids = extract_ids_from_key(key)
+        if ids is None:
+            continue
+        _, dataset_from_key, uid_from_key = ids
+
+        answer = parse_json(raw)
+        if not isinstance(answer, dict):
+            continue
 
-            dataset = to_str(answer.get("dataset") or dataset_from_key)
-            uid = to_str(answer.get("uid") or uid_from_key)
-
-            # Fetch question metadata once per (dataset, uid)
-            q_cache_key = (dataset, uid)
-            if q_cache_key not in question_cache:
-                question_cache[q_cache_key] = load_json(
-                    r, f"v1:datasets:{dataset}:{uid}"
-                )
-            question_data = question_cache[q_cache_key]
-            if question_data:
-                answer.setdefault(
-                    "question", question_data.get("Question") or question_data.get("question")
-                )
-                answer.setdefault("label", question_data.get("Label"))
-                answer.setdefault("map", question_data.get("Map") or question_data.get("map"))
-                answer["questionData"] = question_data
-
-            # Fetch dataset metadata once per dataset
-            if dataset not in dataset_meta_cache:
-                dataset_meta_cache[dataset] = load_json(
-                    r, f"v1:datasets:{dataset}:meta"
-                )
-            dataset_meta = dataset_meta_cache[dataset]
-            if dataset_meta:
-                answer["datasetMeta"] = dataset_meta
-
-            answer["prolificID"] = to_str(answer.get("prolificID") or pid)
-            answer["dataset"] = dataset
-            answer["uid"] = uid
-
-            difficulty_value = answer.get("difficulty")
-            numeric_value = parse_numeric(difficulty_value)
-            if numeric_value is not None:
-                current_max = dataset_max_numeric.get(dataset)
-                if current_max is None or numeric_value > current_max:
-                    dataset_max_numeric[dataset] = numeric_value
-            elif difficulty_value not in (None, ""):
-                dataset_time_like[dataset] = True
-
-            ts = parse_timestamp(
-                answer.get("origTimestamp")
-                or answer.get("timestamp")
-                or answer.get("created_at")
+        dataset = to_str(answer.get("dataset") or dataset_from_key)
+        uid = to_str(answer.get("uid") or uid_from_key)
+
+        loaded.append((pid, answer, dataset, uid))
+        sources_by_dataset[dataset].append((key, raw))
+        uids_by_dataset[dataset].add(uid)
+
+    dataset_sources = {
+        dataset: answers_digest(items) for dataset, items in sources_by_dataset.items()
+    }
+    unchanged: Set[str] = set()
+    if is_current is not None:
+        unchanged = {
+            dataset
+            for dataset, digest in dataset_sources.items()
+            if is_current(dataset, digest)
+        }
+
+    # Fetch question metadata once per (dataset, uid) and dataset metadata once
+    # per dataset, but only for datasets that will actually be rewritten.
+    question_cache: Dict[str, Dict[str, Optional[JsonDict]]] = {}
+    dataset_meta_cache: Dict[str, Optional[JsonDict]] = {}
+    for dataset, uids in uids_by_dataset.items():
+        if dataset in unchanged and not enrich_unchanged:
+            continue
+        if dataset in archived:
+            doc = archived[dataset]
+            question_cache[dataset] = {uid: parse_json(doc["questions"].get(uid)) for uid in uids}
+            dataset_meta_cache[dataset] = doc["meta"]
+            continue
+        question_cache[dataset] = load_questions(scanner, dataset, sorted(uids))
+        dataset_meta_cache[dataset] = load_json(r, f"v1:datasets:{dataset}:meta")
+
+    for pid, answer, dataset, uid in loaded:
+        question_data = question_cache.get(dataset, {}).get(uid)
+        if question_data:
+            answer.setdefault(
+                "question", question_data.get("Question") or question_data.get("question")
             )
+            answer.setdefault("label", question_data.get("Label"))
+            answer.setdefault("map", question_data.get("Map") or question_data.get("map"))
+            answer["questionData"] = question_data
+
+        dataset_meta = dataset_meta_cache.get(dataset)
+        if dataset_meta:
+            answer["datasetMeta"] = dataset_meta
+
+        answer["prolificID"] = to_str(answer.get("prolificID") or pid)
+        answer["dataset"] = dataset
+        answer["uid"] = uid
+
+        difficulty_value = answer.get("difficulty")
+        numeric_value = parse_numeric(difficulty_value)
+        if numeric_value is not None:
+            current_max = dataset_max_numeric.get(dataset)
+            if current_max is None or numeric_value > current_max:
+                dataset_max_numeric[dataset] = numeric_value
+        elif difficulty_value not in (None, ""):
+            dataset_time_like[dataset] = True
+
+        ts = parse_timestamp(
+            answer.get("origTimestamp")
+            or answer.get("timestamp")
+            or answer.get("created_at")
+        )
 
-            records.append(
-                DifficultyRecord(
-                    payload=answer,
-                    dataset=dataset,
-                    difficulty_value=difficulty_value,
-                    timestamp=ts,
-                )
+        records.append(
+            DifficultyRecord(
+                payload=answer,
+                dataset=dataset,
+                difficulty_value=difficulty_value,
+                timestamp=ts,
             )
+        )
 
     dataset_scales: Dict[str, str] = {}
     for dataset in {rec.dataset for rec in records}:
@@ -282,7 +363,7 @@ def collect_difficulties(r: redis.Redis) -> Tuple[List[DifficultyRecord], Dict[s
     for rec in records:
         rec.payload["difficultyScale"] = dataset_scales.get(rec.dataset, "unknown")
 
-    return records, dataset_scales
+    return records, dataset_scales, dataset_sources, unchanged
 
 
 def compute_record_key(payload: JsonDict) -> str:
@@ -378,6 +459,9 @@ def export_records_to_jsonl(
     records: List[DifficultyRecord],
     dataset_scales: Dict[str, str],
     export_dir: Path,
+    manifest: Optional[ExportManifest] = None,
+    dataset_sources: Optional[Dict[str, str]] = None,
+    unchanged: Optional[Set[str]] = None,
 ) -> Dict[str, Path]:
     grouped: Dict[str, Dict[str, JsonDict]] = defaultdict(dict)
     for rec in records:
@@ -389,6 +473,8 @@ def export_records_to_jsonl(
     written: Dict[str, Path] = {}
 
     for dataset, new_entries in grouped.items():
+        if unchanged and dataset in unchanged:
+            continue
         dataset_file = export_dir / f"{dataset}.jsonl"
         existing_entries = load_existing_jsonl(dataset_file)
 
@@ -406,9 +492,15 @@ def export_records_to_jsonl(
                 dataset_scale,
             )
 
+        if not merged_entries:
+            continue
         write_jsonl(dataset_file, merged_entries)
         written[dataset] = dataset_file
+        if manifest is not None and dataset_sources and dataset in dataset_sources:
+            manifest.record(dataset, dataset_sources[dataset], dataset_file)
 
+    if manifest is not None:
+        manifest.save()
     return written
 
 
@@ -429,11 +521,21 @@ def find_first_scale_after(
     return None
 
 
-def main() -> None:
-    args = parse_args()
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
     r = redis.Redis.from_url(args.redis_url, decode_responses=False)
+    scanner = AdaptiveScanner(r, args.latency_budget_ms)
 
-    records, dataset_scales = collect_difficulties(r)
+    manifest: Optional[ExportManifest] = None
+    is_current: Optional[Callable[[str, str], bool]] = None
+    if not args.read_only:
+        manifest = ExportManifest.load(args.export_dir)
+        if not args.force:
+            is_current = manifest.is_unchanged
+
+    records, dataset_scales, dataset_sources, unchanged = collect_difficulties(
+        r, is_current, enrich_unchanged=args.emit_stdout, scanner=scanner
+    )
 
     # Sort records by timestamp for stable output
     def sort_key(rec: DifficultyRecord) -> Tuple[int, str, str]:
@@ -443,12 +545,23 @@ def main() -> None:
     records.sort(key=sort_key)
 
     if not args.read_only:
-        export_paths = export_records_to_jsonl(records, dataset_scales, args.export_dir)
+        export_paths = export_records_to_jsonl(
+            records,
+            dataset_scales,
+            args.export_dir,
+            manifest=manifest,
+            dataset_sources=dataset_sources,
+            unchanged=unchanged,
+        )
         if export_paths:
             for dataset, path in sorted(export_paths.items()):
                 print(f"Updated {dataset} export at {path}")
+        elif unchanged:
+            print("No difficulty exports changed.")
         else:
             print("No difficulty responses found to export.")
+        if unchanged:
+            print(f"Skipped {len(unchanged)} unchanged dataset(s).")
 
     timeline: List[Tuple[Optional[int], DifficultyRecord]] = [
         (rec.timestamp, rec) for rec in records
@@ -517,6 +630,7 @@ def main() -> None:
         switch_messages.append("0-5 → time switch not observed")
 
     print("Difficulty scale switches: " + "; ".join(switch_messages))
+    print(scanner.report())
 
 
 if __name__ == "__main__":
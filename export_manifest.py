@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""Skip-unchanged manifest shared by the JSONL exporters.
+
+The manifest lives next to the exported files (`.export-manifest.json`) and
+records, per dataset, a digest of the Redis answers that produced the export
+and a digest of the file that was written. When both still match on the next
+run the dataset can be skipped entirely: no question/meta lookups, no merge
+with the existing JSONL and no rewrite of the file.
+
+    {
+      "version": 1,
+      "datasets": {
+        "<dataset>": {"source": "<sha256>", "output": "<sha256>", "file": "<name>"}
+      }
+    }
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+MANIFEST_NAME = ".export-manifest.json"
+MANIFEST_VERSION = 1
+CHUNK_SIZE = 1 << 20
+
+RawValue = Union[str, bytes, None]
+
+
+def _as_bytes(value: RawValue) -> bytes:
+    if value is None:
+        return b""
+    if isinstance(value, bytes):
+        return value
+    return value.encode("utf-8")
+
+
+def answers_digest(items: Iterable[Tuple[RawValue, RawValue]]) -> str:
+    """Digest a set of (redis key, raw value) pairs independent of scan order."""
+    h = hashlib.sha256()
+    for key, value in sorted((_as_bytes(k), _as_bytes(v)) for k, v in items):
+        h.update(key)
+        h.update(b"\0")
+        h.update(value)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def file_digest(path: Path) -> Optional[str]:
+    try:
+        with path.open("rb") as fh:
+            h = hashlib.sha256()
+            for chunk in iter(lambda: fh.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+            return h.hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+class ExportManifest:
+    """Per-dataset source/output digests for one export directory."""
+
+    def __init__(self, path: Path, datasets: Optional[Dict[str, Dict[str, str]]] = None):
+        self.path = path
+        self.datasets: Dict[str, Dict[str, str]] = datasets or {}
+        self._dirty = False
+
+    @classmethod
+    def load(cls, export_dir: Path) -> "ExportManifest":
+        path = export_dir / MANIFEST_NAME
+        try:
+            with path.open("r", encoding="utf-8") as fh:
+                data = json.load(fh)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return cls(path)
+        if not isinstance(data, dict) or data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        datasets = data.get("datasets")
+        return cls(path, datasets if isinstance(datasets, dict) else {})
+
+    def is_current(self, dataset: str, source: str, output_path: Path) -> bool:
+        """True when the answers and the file on disk match the last export."""
+        entry = self.datasets.get(dataset)
+        if not entry or entry.get("source") != source:
+            return False
+        return file_digest(output_path) == entry.get("output")
+
+    def is_unchanged(self, dataset: str, source: str) -> bool:
+        """`is_current` for the default `<export_dir>/<dataset>.jsonl` layout."""
+        return self.is_current(dataset, source, self.path.parent / f"{dataset}.jsonl")
+
+    def record(self, dataset: str, source: str, output_path: Path) -> None:
+        self.datasets[dataset] = {
+            "source": source,
+            "output": file_digest(output_path) or "",
+            "file": output_path.name,
+        }
+        self._dirty = True
+
+    def save(self) -> None:
+        if not self._dirty:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with tmp_path.open("w", encoding="utf-8") as fh:
+            json.dump(
+                {"version": MANIFEST_VERSION, "datasets": self.datasets},
+                fh,
+                indent=2,
+                sort_keys=True,
+            )
+            fh.write("\n")
+        tmp_path.replace(self.path)
+        self._dirty = False
@@ -1,24 +1,39 @@
 #!/usr/bin/env python3
 """Export every response from Redis into per-dataset JSONL files.
 
+Datasets moved out of Redis by py/archive_datasets.py are read from their
+archive segment, under the same answer keys, so archiving changes nothing
+in the export.
+
 Each dataset receives a `<dataset>.jsonl` file under the export directory
 (`/storage/cmarnold/projects/maps/survey-responses/annotations/difficulties`
 by default). Every line contains the complete answer payload augmented with
 question metadata (`questionData`) and dataset metadata (`datasetMeta`)
 when available. Existing files are merged so that no previously stored
 responses are lost.
+
+A skip-unchanged manifest (see export_manifest.py) records a digest of the
+answers behind every dataset file; datasets whose answers and output file are
+unchanged since the last run are not re-fetched, merged or rewritten.
 """
 
 from __future__ import annotations
 
 import argparse
 import json
+import sys
 from collections import defaultdict
 from pathlib import Path
 from typing import Dict, Iterator, List, MutableMapping, Optional, Tuple, Union
 
 import redis
 
+sys.path.insert(0, str(Path(__file__).resolve().parent / "py"))
+
+from archive_datasets import archived_answers, load_all as load_archived  # noqa: E402
+from export_manifest import ExportManifest, answers_digest
+from latency_scan import LATENCY_BUDGET_MS, AdaptiveScanner  # noqa: E402  (py/)
+
 DEFAULT_REDIS_URL = "redis://localhost:6397/0"
 DEFAULT_EXPORT_DIR = Path(
     "/storage/cmarnold/projects/maps/survey-responses/annotations/difficulties"
@@ -47,6 +62,18 @@ def parse_args() -> argparse.Namespace:
             "/storage/cmarnold/projects/maps/survey-responses/annotations/difficulties)"
         ),
     )
+    parser.add_argument(
+        "--latency-budget-ms",
+        type=float,
+        default=LATENCY_BUDGET_MS,
+        help="p99 Redis round trip the key scan slows down to stay under "
+        f"(default: {LATENCY_BUDGET_MS:g})",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rewrite every dataset file even if the manifest says it is unchanged",
+    )
     return parser.parse_args()
 
 
@@ -58,9 +85,9 @@ def to_str(value: Union[str, bytes, None]) -> str:
     return value
 
 
-def iter_answer_keys(r: redis.Redis, pid: str) -> Iterator[str]:
+def iter_answer_keys(scanner: AdaptiveScanner, pid: str) -> Iterator[str]:
     pattern = f"v1:{pid}:*:*"
-    for key in r.scan_iter(match=pattern, count=10_000):
+    for key in scanner.scan_iter(match=pattern):
         if isinstance(key, bytes) and key.endswith(META_SUFFIX):
             continue
         key_str = to_str(key)
@@ -80,7 +107,10 @@ def extract_ids_from_key(key: str) -> Optional[Tuple[str, str, str]]:
 
 
 def load_json(r: redis.Redis, key: str) -> Optional[JsonDict]:
-    raw = r.get(key)
+    return parse_json(r.get(key))
+
+
+def parse_json(raw: Union[str, bytes, None]) -> Optional[JsonDict]:
     if not raw:
         return None
     if isinstance(raw, bytes):
@@ -94,6 +124,11 @@ def load_json(r: redis.Redis, key: str) -> Optional[JsonDict]:
     return None
 
 
+def load_raw_answers(scanner: AdaptiveScanner, pid: str) -> List[Tuple[str, bytes]]:
+    keys = list(iter_answer_keys(scanner, pid))
+    return [(key, raw) for key, raw in zip(keys, scanner.mget(keys)) if raw]
+
+
 def compute_record_key(payload: MutableMapping[str, object]) -> Optional[str]:
     pid = to_str(payload.get("prolificID"))
     uid = to_str(payload.get("uid"))
@@ -148,39 +183,73 @@ def write_dataset_file(path: Path, records: List[JsonDict]) -> None:
     tmp_path.replace(path)
 
 
-def export_all_responses(r: redis.Redis, export_dir: Path) -> None:
-    dataset_meta_cache: Dict[str, Optional[JsonDict]] = {}
-    question_cache: Dict[Tuple[str, str], Optional[JsonDict]] = {}
-    responses_by_dataset: Dict[str, List[JsonDict]] = defaultdict(list)
+def export_all_responses(
+    r: redis.Redis,
+    export_dir: Path,
+    force: bool = False,
+    scanner: Optional[AdaptiveScanner] = None,
+) -> Tuple[Dict[str, Path], int]:
+    """Write changed datasets; return the written files and the skipped count."""
+    scanner = scanner or AdaptiveScanner(r)
+    manifest = ExportManifest.load(export_dir)
+    answers_by_dataset: Dict[str, List[JsonDict]] = defaultdict(list)
+    sources_by_dataset: Dict[str, List[Tuple[str, bytes]]] = defaultdict(list)
 
     pids = sorted(to_str(pid) for pid in r.smembers(USER_SET_KEY) if pid)
+    archived = load_archived(r)        # archived datasets: answers live in archive/
 
-    for pid in pids:
-        if not pid:
+    def answer_sources() -> Iterator[Tuple[str, str, Union[str, bytes]]]:
+        for pid in pids:
+            for key, raw in load_raw_answers(scanner, pid):
+                yield pid, key, raw
+        yield from archived_answers(archived, set(pids))
+
+    for pid, key, raw in answer_sources():
+        ids = extract_ids_from_key(key)
+        if ids is None:
             continue
-        for key in iter_answer_keys(r, pid):
-            ids = extract_ids_from_key(key)
-            if ids is None:
-                continue
-            _, dataset_from_key, uid_from_key = ids
+        _, dataset_from_key, uid_from_key = ids
 
-            answer = load_json(r, key)
-            if answer is None:
-                continue
+        answer = parse_json(raw)
+        if answer is None:
+            continue
 
-            dataset = to_str(answer.get("dataset") or dataset_from_key)
-            uid = to_str(answer.get("uid") or uid_from_key)
+        dataset = to_str(answer.get("dataset") or dataset_from_key)
+        uid = to_str(answer.get("uid") or uid_from_key)
 
-            answer["prolificID"] = to_str(answer.get("prolificID") or pid)
-            answer["dataset"] = dataset
-            answer["uid"] = uid
+        answer["prolificID"] = to_str(answer.get("prolificID") or pid)
+        answer["dataset"] = dataset
+        answer["uid"] = uid
 
-            q_cache_key = (dataset, uid)
-            if q_cache_key not in question_cache:
-                question_cache[q_cache_key] = load_json(
-                    r, f"v1:datasets:{dataset}:{uid}"
-                )
-            question_data = question_cache[q_cache_key]
+        answers_by_dataset[dataset].append(answer)
+        sources_by_dataset[dataset].append((key, raw))
+
+    written: Dict[str, Path] = {}
+    skipped = 0
+
+    for dataset, answers in answers_by_dataset.items():
+        if not dataset:
+            continue
+        out_path = export_dir / f"{dataset}.jsonl"
+        source = answers_digest(sources_by_dataset[dataset])
+        if not force and manifest.is_current(dataset, source, out_path):
+            skipped += 1
+            continue
+
+        uids = sorted({to_str(answer["uid"]) for answer in answers})
+        if dataset in archived:
+            doc = archived[dataset]
+            values = [doc["questions"].get(uid) for uid in uids]
+            dataset_meta = doc["meta"]
+        else:
+            values = scanner.mget([f"v1:datasets:{dataset}:{uid}" for uid in uids])
+            dataset_meta = load_json(r, f"v1:datasets:{dataset}:meta")
+        question_cache: Dict[str, Optional[JsonDict]] = {
+            uid: parse_json(raw) for uid, raw in zip(uids, values)
+        }
+
+        for answer in answers:
+            question_data = question_cache.get(to_str(answer["uid"]))
             if question_data:
                 answer.setdefault(
                     "question", question_data.get("Question") or question_data.get("question")
@@ -190,29 +259,28 @@ def export_all_responses(r: redis.Redis, export_dir: Path) -> None:
                     "map", question_data.get("Map") or question_data.get("map")
                 )
                 answer["questionData"] = question_data
-
-            if dataset not in dataset_meta_cache:
-                dataset_meta_cache[dataset] = load_json(
-                    r, f"v1:datasets:{dataset}:meta"
-                )
-            dataset_meta = dataset_meta_cache[dataset]
             if dataset_meta:
                 answer["datasetMeta"] = dataset_meta
 
-            responses_by_dataset[dataset].append(answer)
-
-    for dataset, records in responses_by_dataset.items():
-        if not dataset:
-            continue
-        out_path = export_dir / f"{dataset}.jsonl"
-        write_dataset_file(out_path, records)
+        write_dataset_file(out_path, answers)
+        manifest.record(dataset, source, out_path)
+        written[dataset] = out_path
 
+    manifest.save()
+    return written, skipped
 
 
 def main() -> None:
     args = parse_args()
     r = redis.Redis.from_url(args.redis_url, decode_responses=False)
-    export_all_responses(r, args.export_dir)
+    scanner = AdaptiveScanner(r, args.latency_budget_ms)
+    written, skipped = export_all_responses(
+        r, args.export_dir, force=args.force, scanner=scanner
+    )
+    for dataset, path in sorted(written.items()):
+        print(f"Updated {dataset} export at {path}")
+    print(f"{len(written)} dataset(s) written, {skipped} unchanged.")
+    print(scanner.report())
 
 
 if __name__ == "__main__":
@@ -6,6 +6,7 @@ module.exports = {
     compareResponses: '/storage/cmarnold/projects/maps/SurveyBridge/compare_responses.py',
     surveyPython: '/storage/cmarnold/shared/conda/envs/map-survey/bin/python',
     surveyRoot: '/storage/cmarnold/projects/map-survey',
-    addEval: '/storage/cmarnold/projects/map-survey/py/add_eval.py',
-    addUnmatchedResponse: '/storage/cmarnold/projects/map-survey/py/add_unmatched_response.py',
+    surveyCli: '/storage/cmarnold/projects/map-survey/py/survey.py',
+    exportAdjudications: '/storage/cmarnold/projects/map-survey/py/export_adjudications.py',
+    availabilityIndex: '/storage/cmarnold/projects/map-survey/py/availability.py',
   };
\ No newline at end of file
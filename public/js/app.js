@@ -497,11 +497,20 @@ const Pages = {
         });
       });
 
-      // 5) Now build each card inside cardsContainer
+      // 5) Load every question of the dataset once (static, cacheable bundle)
+      const questionsByUid = {};
+      try {
+        const bundle = await fetch(`/question_bundle/${encodeURIComponent(ds)}`);
+        if (bundle.ok) (await bundle.json()).forEach(q => { questionsByUid[q.uid] = q; });
+      } catch (e) {
+        console.warn(`Error fetching question bundle for ${ds}:`, e);
+      }
+
+      // 6) Now build each card inside cardsContainer
       for (const r of responses) {
-        // (a) Attempt to load the stored question JSON (to get its Label)
-        let questionJSON = null;
-        try {
+        // (a) Look up the stored question JSON (to get its Label)
+        let questionJSON = questionsByUid[r.uid] ?? null;
+        if (!questionJSON) try {
           const qobj = await fetch(
             `/get_question_by_uid?dataset=${encodeURIComponent(ds)}&uid=${encodeURIComponent(r.uid)}`
           );
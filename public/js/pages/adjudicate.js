@@ -2,6 +2,7 @@ import { Common } from '../common/common.js';
 
 export const adjudicate = {
   passcode: null,
+  pastLimit: 50,      // newest resolved adjudications shown; "Show older" pages further
   async init() {
     Common.initNavbar();
     this.passcode = prompt('Enter adjudication passcode:');
@@ -21,7 +22,9 @@ export const adjudicate = {
     if (!resp.ok) { status.textContent = 'Invalid passcode.'; return; }
     const list = await resp.json();
 
-    const pastResp = await fetch(`/past_adjudications?code=${encodeURIComponent(this.passcode)}`);
+    const pastResp = await fetch(
+      `/past_adjudications?code=${encodeURIComponent(this.passcode)}&limit=${this.pastLimit}`
+    );
     const pastList = pastResp.ok ? await pastResp.json() : [];
 
     container.innerHTML = '';
@@ -183,6 +186,15 @@ export const adjudicate = {
 
       pastCont.appendChild(card);
     }
+    if (pastList.length === this.pastLimit) {
+      const moreBtn = document.createElement('button');
+      moreBtn.textContent = 'Show older';
+      moreBtn.addEventListener('click', async () => {
+        this.pastLimit += 50;
+        await this.load();
+      });
+      pastCont.appendChild(moreBtn);
+    }
   },
 
   async judge(rec, choice, reason, label, newQuestion) {
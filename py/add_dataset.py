@@ -13,12 +13,12 @@ everything directly in Redis using the schema:
     v1:campaigns:<topic>:meta     JSON({curIndex,numImages})
 
 Run:
-    python add_dataset_to_redis.py <topic> <index:int> <jsonl_path>
+    python py/survey.py add-dataset <ds_id> <topic> <jsonl_path>
 
 If the dataset already exists nothing is inserted.
 """
 
-import sys, json, uuid, redis, requests
+import sys, json, uuid, redis
 from pathlib import Path
 from tqdm import tqdm               # purely for a nice progress bar
 
@@ -28,6 +28,7 @@ BATCH_SIZE = 5_000
 
 def notify_server(ds_id: str, meta_payload: dict) -> None:
     """POST /admin/dataset"""
+    import requests                     # only needed here; keeps CLI start-up fast
     meta_payload['id'] = ds_id
     try:
         r = requests.post(f"{SERVER_URL}/admin/dataset", json=meta_payload, timeout=5)
@@ -41,7 +42,12 @@ def notify_server(ds_id: str, meta_payload: dict) -> None:
     except requests.RequestException as e:
         print(f"Could not reach the server at {SERVER_URL}: {e}")
 
-def main(ds_id: str, topic: str, jsonl_file: Path) -> None:
+def main(ds_id: str, topic: str, jsonl_file: Path) -> dict:
+    from availability import track
+    from build_question_bundles import build_bundle
+    from ground_truth import store as store_ground_truth
+    from invalidation import publish
+
     camp_set_key = f"v1:campaigns:{topic}"
     ds_set_key   = f"v1:datasets:{ds_id}"
 
@@ -96,20 +102,14 @@ def main(ds_id: str, topic: str, jsonl_file: Path) -> None:
         pipe.set(camp_meta_key, json.dumps(camp_meta).encode())
 
     pipe.execute()
+    track(r, ds_id, topic)
+    store_ground_truth(r, ds_id)
+    publish(r, ds_id, "created")
+    build_bundle(r, ds_id)
     notify_server(ds_id, meta_payload)
     print(f"Done – {ds_id} loaded with {len(entries)} questions.")
+    return {"dataset": ds_id, "topic": topic, "questions": len(entries)}
 
 if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        ds_id = "NaturalWorldTraining"
-        topic = "Natural World"
-        jsonl = Path("/storage/cmarnold/projects/maps/labeldata/mapqa/NaturalWorldTraining_20.jsonl")
-    elif len(sys.argv) != 4:
-        sys.exit("usage: add_dataset_to_redis.py <topic> <index:int> <jsonl_path>")
-    else:
-        ds_id  = sys.argv[1]
-        topic  = sys.argv[2]
-        jsonl  = Path(sys.argv[3])
-    if not jsonl.exists():
-        sys.exit(f"{jsonl} not found")
-    main(ds_id, topic, jsonl)
+    from survey import main as survey
+    sys.exit(survey(["add-dataset", *sys.argv[1:]]))
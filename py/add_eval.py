@@ -1,3 +1,11 @@
+"""
+add_eval.py  –  set the "llm_eval" field on one user's answers from a JSONL file
+of {"uid", "llm_eval"} objects.
+
+Usage:
+    python py/survey.py add-eval <user_id> <ds_id> <jsonl_with_updates>
+"""
+
 import sys
 import json
 import redis
@@ -9,7 +17,7 @@ REDIS_URL  = "redis://localhost:6397/0"
 BATCH_SIZE = 5_000
 # ------------------------------------------------------------------------------
 
-def main(user_id: str, ds_id: str, updates_jsonl: Path) -> None:
+def main(user_id: str, ds_id: str, updates_jsonl: Path) -> dict:
     """
     Connect to Redis and update the "llm_eval" field for each question UID
     in the specified user's dataset.
@@ -75,32 +83,8 @@ def main(user_id: str, ds_id: str, updates_jsonl: Path) -> None:
     total   = len(updates)
     applied = total - skipped
     print(f"\nDone. {applied} / {total} entries updated. {skipped} entries skipped.")
+    return {"dataset": ds_id, "user": user_id, "applied": applied, "skipped": skipped}
 
 if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        user_id = "cmarnold"
-        ds_id = "MilitaryAccuracy"
-        updates_jsonl = Path("/storage/cmarnold/projects/maps/survey-responses/MilitaryAccuracy/cmarnold.jsonl")
-    elif len(sys.argv) != 4:
-        sys.exit("usage: update_llm_eval.py <user_id> <ds_id> <jsonl_with_updates>")
-    else:
-        user_id       = sys.argv[1]
-        ds_id         = sys.argv[2]
-        updates_jsonl = Path(sys.argv[3])
-    if not updates_jsonl.exists():
-        sys.exit(f"{updates_jsonl} not found")
-
-    main(user_id, ds_id, updates_jsonl)
-
-    # from pathlib import Path
-    # import sys
-
-    # # --- ADJUST THESE TWO LINES AS NEEDED ---
-    # ds_id = "MilitaryAccuracy"
-    # folder = Path("/storage/cmarnold/projects/maps/survey-responses/MilitaryAccuracy")
-    # # -----------------------------------------
-
-    # for jsonl_file in folder.glob("*.jsonl"):
-    #     user_id = jsonl_file.stem
-    #     print(f"Processing user: {user_id}")
-    #     main(user_id, ds_id, jsonl_file)
\ No newline at end of file
+    from survey import main as survey
+    sys.exit(survey(["add-eval", *sys.argv[1:]]))
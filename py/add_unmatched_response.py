@@ -1,4 +1,12 @@
 
+"""
+add_unmatched_response.py  –  record the other annotator's answer and the LLM
+verdict on both answers of every question two annotators disagreed on.
+
+Usage:
+    python py/survey.py add-unmatched <user_id1> <user_id2> <ds_id> <json array | ->
+"""
+
 import sys, json
 import redis
 from tqdm import tqdm
@@ -8,11 +16,12 @@ REDIS_URL  = "redis://localhost:6397/0"
 BATCH_SIZE = 5_000
 # ------------------------------------------------------------------------------
 
-def main(user_id1: str, user_id2: str, ds_id: str, unmatched_responses: json) -> None:
+def main(user_id1: str, user_id2: str, ds_id: str, unmatched_responses: list) -> dict:
     """
-    Connect to Redis and update the "llm_eval" field for each question UID
-    in the specified user's dataset.
+    Connect to Redis and set "llm_eval" and "nonconcurred_response" on both
+    users' answers for every unmatched question UID.
     """
+    from adjudication_view import refresh_dataset
 
     user1_key = f'v1:{user_id1}:{ds_id}'
     user2_key = f'v1:{user_id2}:{ds_id}'
@@ -30,7 +39,7 @@ def main(user_id1: str, user_id2: str, ds_id: str, unmatched_responses: json) ->
 
     if not updates:
         print(f"Given json contained no valid update entries.")
-        return
+        return {"dataset": ds_id, "applied": 0, "skipped": 0}
 
     # ---------- apply updates via pipeline ----------
     print("Updating Redis entries …")
@@ -58,11 +67,13 @@ def main(user_id1: str, user_id2: str, ds_id: str, unmatched_responses: json) ->
 
     if pending:
         pipe.execute()
+    refresh_dataset(r, ds_id, updates)      # otherAnswer may have changed
 
     total   = len(updates)
     skipped_uids = skipped // 2
     applied = total - skipped_uids
     print(f"Done. {applied} / {total} UIDs updated; {skipped_uids} UIDs skipped.")
+    return {"dataset": ds_id, "applied": applied, "skipped": skipped_uids}
 
 def get_payload(r: redis.Redis, key: str, new_eval: str, nonconcurred: str) -> dict | None:
     raw = r.get(key)
@@ -82,14 +93,5 @@ def get_payload(r: redis.Redis, key: str, new_eval: str, nonconcurred: str) -> d
 
 
 if __name__ == "__main__":
-    if len(sys.argv) != 5:
-        sys.exit("usage: add_unmatched_response.py <user_id1> <user_id2> <ds_id> <json object>")
-    else:
-        pid1 = sys.argv[1]
-        pid2 = sys.argv[2]
-        ds = sys.argv[3]
-        unmatched_responses = json.loads(sys.argv[4])
-
-    main(pid1, pid2, ds, unmatched_responses)
-
-
+    from survey import main as survey
+    sys.exit(survey(["add-unmatched", *sys.argv[1:]]))
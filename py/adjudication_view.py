@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+adjudication_view.py
+────────────────────
+Denormalised adjudication queue, so `/adjudications` and
+`/past_adjudications` read one hash per row instead of three or four GETs
+plus an assignment lookup per id on every page load.
+
+    v1:adjview:<pid>:<ds>:<uid>   HASH  question, both answers, map file,
+                                        reasons, labels, adjudication, ts
+    v1:adjview:pending            ZSET  id → request time (ms)
+    v1:adjview:past               ZSET  id → resolution time (ms)
+    v1:adjview:skip:pending       SET   ids of the pending / past set that are
+    v1:adjview:skip:past                deliberately not in that index
+
+Membership still comes from the `v1:adjudications` / `v1:past_adjudications`
+sets; the view mirrors them. An id in both sets (a re-requested adjudication)
+is pending; pending ids of ground-truth datasets (*Accuracy / *Training) are
+not listed, like the old `/adjudications`. Every index therefore has exactly
+SCARD(set) − SCARD(skip) entries, which is what the server checks before it
+resyncs. The server refreshes rows when adjudications are
+requested, resolved, cancelled or answers edited. Scripts that rewrite
+answers call the hook afterwards:
+
+    from adjudication_view import refresh_dataset
+    refresh_dataset(r, ds)                 # every row of <ds>
+    refresh_dataset(r, ds, {"uid1", …})    # rows for these questions
+
+A rebuilt row keeps its index score when it has one; otherwise the score is
+the answer's edit/orig timestamp.
+
+Run:
+    python py/adjudication_view.py                 # rebuild from the sets
+    python py/adjudication_view.py --dataset <ds>  # refresh one dataset
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Set
+
+import redis
+
+from ground_truth import has_ground_truth_suffix
+
+REDIS_URL     = "redis://localhost:6397/0"
+VIEW_PREFIX   = "v1:adjview:"
+PENDING_SET   = "v1:adjudications"
+PAST_SET      = "v1:past_adjudications"
+PENDING_INDEX = f"{VIEW_PREFIX}pending"
+PAST_INDEX    = f"{VIEW_PREFIX}past"
+ARCHIVED_SET  = "v1:archived"              # see archive_datasets.py
+SKIP          = {PENDING_SET: f"{VIEW_PREFIX}skip:pending", PAST_SET: f"{VIEW_PREFIX}skip:past"}
+BATCH_SIZE    = 5_000
+SCAN_COUNT    = 10_000
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def view_key(adj_id: str) -> str:
+    return f"{VIEW_PREFIX}{adj_id}"
+
+
+def _json(raw) -> dict:
+    if raw is None:
+        return {}
+    try:
+        obj = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return {}
+    return obj if isinstance(obj, dict) else {}
+
+
+def _flag(value) -> str:
+    return "1" if value else ""
+
+
+def target_index(adj_id: str, pending: bool, past: bool) -> Optional[str]:
+    """Index an id belongs in: pending wins; ground-truth ids are never pending."""
+    ds = adj_id.split(":", 2)[1] if adj_id.count(":") >= 2 else ""
+    if pending and not has_ground_truth_suffix(ds):
+        return PENDING_INDEX
+    if past:
+        return PAST_INDEX
+    return None
+
+
+def _raws(r: redis.Redis, docs: Dict[str, dict],
+          refs: Sequence[tuple]) -> List[Optional[str]]:
+    """Values of v1:<pid>:<ds>:<uid> (pid None: v1:datasets:<ds>:<uid>) for
+    *refs*; datasets in *docs* are archived and read from their document."""
+    out: List[Optional[str]] = [None] * len(refs)
+    live = [i for i, (_, ds, _) in enumerate(refs) if ds not in docs]
+    if live:
+        keys = [f"v1:datasets:{ds}:{uid}" if pid is None else f"v1:{pid}:{ds}:{uid}"
+                for pid, ds, uid in (refs[i] for i in live)]
+        for i, raw in zip(live, r.mget(keys)):
+            out[i] = raw
+    for i, (pid, ds, uid) in enumerate(refs):
+        if ds in docs:
+            doc = docs[ds]
+            out[i] = (doc["questions"].get(uid) if pid is None
+                      else doc["answers"].get(pid, {}).get(uid))
+    return out
+
+
+def build_entries(r: redis.Redis, ids: Sequence[str]) -> Dict[str, dict]:
+    """id → row, mirroring what the server used to assemble per request.
+
+    Rows of archived datasets are read through archive_datasets.load(), so a
+    rebuild after archiving keeps their questions and answers.
+    """
+    parsed = []
+    for adj_id in ids:
+        parts = adj_id.split(":", 2)
+        if len(parts) == 3:
+            parsed.append((adj_id, *parts))
+
+    assigned: Dict[str, List[str]] = {}
+    for _, _, ds, _ in parsed:
+        if ds not in assigned:
+            assigned[ds] = sorted(to_str(p) for p in r.smembers(f"v1:assignments:{ds}"))
+
+    docs: Dict[str, dict] = {}
+    datasets = sorted(assigned)
+    if datasets:
+        archived = [ds for ds, flag in zip(datasets, r.smismember(ARCHIVED_SET, datasets)) if flag]
+        if archived:
+            from archive_datasets import load    # archive_datasets imports this module
+            docs = {ds: doc for ds in archived if (doc := load(r, ds)) is not None}
+
+    out: Dict[str, dict] = {}
+    for start in range(0, len(parsed), BATCH_SIZE):
+        chunk = parsed[start:start + BATCH_SIZE]
+        others = [next((p for p in assigned[ds] if p != pid), None) for _, pid, ds, _ in chunk]
+        answers = _raws(r, docs, [(pid, ds, uid) for _, pid, ds, uid in chunk])
+        questions = _raws(r, docs, [(None, ds, uid) for _, _, ds, uid in chunk])
+        with_other = [i for i, o in enumerate(others) if o]
+        other_raws = dict(zip(with_other, _raws(
+            r, docs, [(others[i], chunk[i][2], chunk[i][3]) for i in with_other]))) if with_other else {}
+        for i, ((adj_id, pid, ds, uid), other) in enumerate(zip(chunk, others)):
+            ans, q = _json(answers[i]), _json(questions[i])
+            other_ans = _json(other_raws.get(i))
+            ts = ans.get("editTimestamp") or ans.get("origTimestamp") or 0
+            out[adj_id] = {
+                "pid": pid, "otherPid": other or "", "dataset": ds, "uid": uid,
+                "question": q.get("Question") or q.get("question") or "",
+                "label": q.get("Label") or "",
+                "mapFile": q.get("Map") or q.get("map") or "",
+                "answer": ans.get("answer") or "",
+                "otherAnswer": ans.get("nonconcurred_response") or other_ans.get("answer") or "",
+                "adjudication": ans.get("adjudication") or "",
+                "adjudication_reason": ans.get("adjudication_reason") or "",
+                "adjudicator_label": ans.get("adjudicator_label") or "",
+                "badQuestion": _flag(ans.get("badQuestion")),
+                "badReason": ans.get("badReason") or "",
+                "otherBadQuestion": _flag(other_ans.get("badQuestion")),
+                "otherBadReason": other_ans.get("badReason") or "",
+                "ts": int(ts) if isinstance(ts, (int, float)) else 0,
+            }
+    return out
+
+
+def refresh(r: redis.Redis, ids: Iterable[str]) -> int:
+    """Rewrite the rows for *ids* and fix their index membership; return rows kept."""
+    ids = sorted({to_str(i) for i in ids})
+    if not ids:
+        return 0
+    pipe = r.pipeline(transaction=False)
+    for adj_id in ids:
+        pipe.sismember(PENDING_SET, adj_id)
+        pipe.sismember(PAST_SET, adj_id)
+    flags = pipe.execute()
+    entries = build_entries(r, ids)
+    now = int(time.time() * 1000)
+
+    kept = 0
+    pipe = r.pipeline(transaction=False)
+    for i, adj_id in enumerate(ids):
+        pending, past = flags[2 * i], flags[2 * i + 1]
+        entry = entries.get(adj_id)
+        index = target_index(adj_id, pending, past) if entry is not None else None
+        for source, member, listed in ((PENDING_SET, pending, PENDING_INDEX),
+                                       (PAST_SET, past, PAST_INDEX)):
+            if member and index != listed:
+                pipe.sadd(SKIP[source], adj_id)
+            else:
+                pipe.srem(SKIP[source], adj_id)
+        if index is None:
+            pipe.delete(view_key(adj_id))
+            pipe.zrem(PENDING_INDEX, adj_id)
+            pipe.zrem(PAST_INDEX, adj_id)
+            continue
+        other = PAST_INDEX if index == PENDING_INDEX else PENDING_INDEX
+        pipe.hset(view_key(adj_id), mapping=entry)
+        pipe.zadd(index, {adj_id: entry["ts"] or now}, nx=True)
+        pipe.zrem(other, adj_id)
+        kept += 1
+    pipe.execute()
+    return kept
+
+
+def refresh_dataset(r: redis.Redis, ds: str, uids: Optional[Iterable[str]] = None) -> int:
+    """Hook for scripts that change answers or questions of <ds>."""
+    wanted: Optional[Set[str]] = {to_str(u) for u in uids} if uids is not None else None
+    members = [*r.smembers(PENDING_SET), *r.smembers(PAST_SET),
+               *r.zrange(PENDING_INDEX, 0, -1), *r.zrange(PAST_INDEX, 0, -1),
+               *r.smembers(SKIP[PENDING_SET]), *r.smembers(SKIP[PAST_SET])]
+    ids = []
+    for raw in members:
+        parts = to_str(raw).split(":", 2)
+        if len(parts) == 3 and parts[1] == ds and (wanted is None or parts[2] in wanted):
+            ids.append(to_str(raw))
+    return refresh(r, ids)
+
+
+def rebuild(r: redis.Redis) -> int:
+    """Regenerate every row from the two sets; index scores survive, stale ids go."""
+    pipe = r.pipeline(transaction=False)
+    pending = 0
+    for key in r.scan_iter(match=f"{VIEW_PREFIX}*", count=SCAN_COUNT):
+        if to_str(key) in (PENDING_INDEX, PAST_INDEX):
+            continue
+        pipe.delete(key)
+        pending += 1
+        if pending >= BATCH_SIZE:
+            pipe.execute(); pending = 0
+    pipe.execute()
+    ids: Set[str] = set()
+    for key in (PENDING_SET, PAST_SET):
+        ids.update(to_str(i) for i in r.smembers(key))
+    for key in (PENDING_INDEX, PAST_INDEX):
+        ids.update(to_str(i) for i in r.zrange(key, 0, -1))
+    return refresh(r, ids)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild the v1:adjview:* adjudication view.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--dataset", help="Only refresh rows of this dataset")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    if args.dataset:
+        n = refresh_dataset(r, args.dataset)
+        print(f"Done – {n} row(s) refreshed for {args.dataset}.")
+        return
+    n = rebuild(r)
+    print(f"Done – {n} row(s) rebuilt "
+          f"(pending={r.zcard(PENDING_INDEX)}, past={r.zcard(PAST_INDEX)}).")
+
+
+if __name__ == "__main__":
+    main()
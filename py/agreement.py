@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+agreement.py
+────────────
+Batch inter-annotator agreement for double-annotated datasets.
+
+For every dataset with exactly two assigned annotators who have both
+submitted (`v1:<pid>:<ds>:meta` exists) the engine
+
+  • pulls both annotators' answers with one MGET per BATCH_SIZE uids,
+  • normalises the answer strings and compares them a batch at a time,
+  • writes `llm_eval` ("Correct" / "Incorrect") and, for disagreements,
+    `nonconcurred_response` (the other annotator's answer) back through
+    pipelines – the same fields py/add_unmatched_response.py sets,
+  • stores the agreement rate in both annotators' `:meta` markers.
+
+Results are cached in the `v1:agreement` hash (dataset → JSON) keyed by a
+digest of both answer sets, so re-running over a whole campaign only touches
+datasets whose answers changed.
+
+Datasets with ground truth (`*Accuracy`, `*Training`) and Urban datasets are
+graded by grade_dataset.py and are skipped here.
+
+Run:
+    python py/agreement.py                    # every eligible dataset
+    python py/agreement.py <ds> [<ds> …]      # only these datasets
+    python py/agreement.py --force --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import redis
+
+from availability import open_key
+
+REDIS_URL    = "redis://localhost:6397/0"
+BATCH_SIZE   = 5_000
+CACHE_KEY    = "v1:agreement"
+ENGINE_VERSION = 1
+
+# Fields written back by this engine; ignored when digesting answers so that
+# our own write-back does not invalidate the cache.
+DERIVED_FIELDS = ("llm_eval", "nonconcurred_response")
+
+_PUNCT_RE = re.compile(r"[^\w\s.]")
+_SPACE_RE = re.compile(r"\s+")
+_ARTICLES = frozenset(("a", "an", "the"))
+
+
+@dataclass
+class DatasetResult:
+    dataset: str
+    pids: Tuple[str, str]
+    digest: str
+    compared: int = 0
+    matched: int = 0
+    mismatched: List[str] = field(default_factory=list)
+    cached: bool = False
+
+    @property
+    def accuracy(self) -> Optional[float]:
+        if not self.compared:
+            return None
+        return self.matched / self.compared
+
+    def to_cache(self) -> dict:
+        return {
+            "version": ENGINE_VERSION,
+            "digest": self.digest,
+            "pids": list(self.pids),
+            "compared": self.compared,
+            "matched": self.matched,
+            "mismatched": self.mismatched,
+        }
+
+
+def to_str(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return str(value)
+
+
+def is_ground_truth_dataset(ds: str) -> bool:
+    lowered = ds.lower()
+    return (
+        lowered.endswith("accuracy")
+        or lowered.endswith("training")
+        or lowered.startswith("urban")
+    )
+
+
+# ── normalisation ────────────────────────────────────────────────────────────
+def normalise_batch(answers: Sequence[object]) -> List[str]:
+    """Canonicalise a batch of free-text answers for equality comparison.
+
+    NFKC + casefold, punctuation dropped (decimal points kept), leading
+    articles removed, whitespace collapsed and trailing zeros stripped from
+    numbers, so "The Rhine." and "rhine" or "12.0" and "12" compare equal.
+    """
+    out: List[str] = []
+    for raw in answers:
+        text = unicodedata.normalize("NFKC", to_str(raw)).casefold()
+        text = _PUNCT_RE.sub(" ", text)
+        tokens = []
+        for tok in _SPACE_RE.split(text.strip()):
+            tok = tok.strip(".")
+            if not tok:
+                continue
+            if re.fullmatch(r"\d+\.\d+", tok):
+                tok = tok.rstrip("0").rstrip(".")
+            tokens.append(tok)
+        while tokens and tokens[0] in _ARTICLES:
+            tokens.pop(0)
+        out.append(" ".join(tokens))
+    return out
+
+
+def compare_batch(left: Sequence[object], right: Sequence[object]) -> List[bool]:
+    return [a == b for a, b in zip(normalise_batch(left), normalise_batch(right))]
+
+
+# ── redis helpers ────────────────────────────────────────────────────────────
+def parse_answer(raw) -> Optional[dict]:
+    if not raw:
+        return None
+    try:
+        obj = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def find_candidates(r: redis.Redis, only: Iterable[str] = ()) -> Dict[str, Tuple[str, str]]:
+    """Datasets with exactly two assignees who have both submitted."""
+    datasets = sorted(only) or sorted(to_str(d) for d in r.smembers("v1:datasets"))
+    datasets = [ds for ds in datasets if not is_ground_truth_dataset(ds)]
+
+    pipe = r.pipeline()
+    for ds in datasets:
+        pipe.smembers(f"v1:assignments:{ds}")
+    assigned = [sorted(to_str(p) for p in members) for members in pipe.execute()]
+
+    pairs = [(ds, pids) for ds, pids in zip(datasets, assigned) if len(pids) == 2]
+    pipe = r.pipeline()
+    for ds, (p1, p2) in pairs:
+        pipe.exists(f"v1:{p1}:{ds}:meta", f"v1:{p2}:{ds}:meta")
+    submitted = pipe.execute()
+
+    return {ds: (p1, p2) for (ds, (p1, p2)), n in zip(pairs, submitted) if n == 2}
+
+
+def load_answers(
+    r: redis.Redis, ds: str, pids: Tuple[str, str]
+) -> Tuple[List[str], List[Optional[dict]], List[Optional[dict]]]:
+    uids = sorted(to_str(u) for u in r.smembers(f"v1:datasets:{ds}"))
+    left: List[Optional[dict]] = []
+    right: List[Optional[dict]] = []
+    for start in range(0, len(uids), BATCH_SIZE):
+        chunk = uids[start:start + BATCH_SIZE]
+        left.extend(parse_answer(v) for v in r.mget([f"v1:{pids[0]}:{ds}:{u}" for u in chunk]))
+        right.extend(parse_answer(v) for v in r.mget([f"v1:{pids[1]}:{ds}:{u}" for u in chunk]))
+    return uids, left, right
+
+
+def answers_digest(
+    pids: Tuple[str, str],
+    uids: Sequence[str],
+    left: Sequence[Optional[dict]],
+    right: Sequence[Optional[dict]],
+) -> str:
+    h = hashlib.sha256(f"{ENGINE_VERSION}\0{pids[0]}\0{pids[1]}".encode())
+    for uid, a, b in zip(uids, left, right):
+        for ans in (a, b):
+            core = {k: v for k, v in (ans or {}).items() if k not in DERIVED_FIELDS}
+            h.update(b"\0" + uid.encode() + b"\0")
+            h.update(json.dumps(core, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def load_cache(r: redis.Redis, datasets: Iterable[str]) -> Dict[str, dict]:
+    datasets = list(datasets)
+    if not datasets:
+        return {}
+    cached = {}
+    for ds, raw in zip(datasets, r.hmget(CACHE_KEY, datasets)):
+        entry = parse_answer(raw)
+        if entry and entry.get("version") == ENGINE_VERSION:
+            cached[ds] = entry
+    return cached
+
+
+# ── engine ───────────────────────────────────────────────────────────────────
+def apply_verdict(payload: dict, same: bool, other_answer: object) -> bool:
+    """Set llm_eval / nonconcurred_response; return True if payload changed."""
+    before = (payload.get("llm_eval"), payload.get("nonconcurred_response"))
+    if same:
+        payload["llm_eval"] = "Correct"
+        payload.pop("nonconcurred_response", None)
+    else:
+        payload["llm_eval"] = "Incorrect"
+        payload["nonconcurred_response"] = other_answer
+    return before != (payload.get("llm_eval"), payload.get("nonconcurred_response"))
+
+
+def evaluate_dataset(
+    r: redis.Redis,
+    ds: str,
+    pids: Tuple[str, str],
+    cached: Optional[dict] = None,
+    dry_run: bool = False,
+) -> DatasetResult:
+    uids, left, right = load_answers(r, ds, pids)
+    digest = answers_digest(pids, uids, left, right)
+    result = DatasetResult(dataset=ds, pids=pids, digest=digest)
+
+    if cached and cached.get("digest") == digest:
+        result.compared = int(cached.get("compared", 0))
+        result.matched = int(cached.get("matched", 0))
+        result.mismatched = list(cached.get("mismatched", []))
+        result.cached = True
+        return result
+
+    both = [i for i, (a, b) in enumerate(zip(left, right)) if a is not None and b is not None]
+    pipe, pending = r.pipeline(), 0
+    for start in range(0, len(both), BATCH_SIZE):
+        idx = both[start:start + BATCH_SIZE]
+        a_answers = [left[i].get("answer") for i in idx]
+        b_answers = [right[i].get("answer") for i in idx]
+        verdicts = compare_batch(a_answers, b_answers)
+        for i, a_ans, b_ans, same in zip(idx, a_answers, b_answers, verdicts):
+            uid = uids[i]
+            result.compared += 1
+            if same:
+                result.matched += 1
+            else:
+                result.mismatched.append(uid)
+            if dry_run:
+                continue
+            for pid, payload, other in ((pids[0], left[i], b_ans), (pids[1], right[i], a_ans)):
+                if apply_verdict(payload, same, other):
+                    pipe.set(f"v1:{pid}:{ds}:{uid}", json.dumps(payload).encode("utf-8"))
+                    pending += 1
+        if pending >= BATCH_SIZE:
+            pipe.execute(); pending = 0
+
+    if dry_run:
+        return result
+
+    if result.accuracy is not None:
+        for pid in pids:
+            pipe.set(f"v1:{pid}:{ds}:meta", result.accuracy)
+            pipe.srem(open_key(pid), ds)
+    pipe.hset(CACHE_KEY, ds, json.dumps(result.to_cache()))
+    pipe.execute()
+    return result
+
+
+def run(
+    r: redis.Redis,
+    only: Iterable[str] = (),
+    force: bool = False,
+    dry_run: bool = False,
+) -> List[DatasetResult]:
+    candidates = find_candidates(r, only)
+    cache = {} if force else load_cache(r, candidates)
+    return [
+        evaluate_dataset(r, ds, pids, cache.get(ds), dry_run=dry_run)
+        for ds, pids in sorted(candidates.items())
+    ]
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Compare the two annotators of every double-annotated dataset."
+    )
+    parser.add_argument("datasets", nargs="*", help="Limit to these dataset ids")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--force", action="store_true",
+                        help="Ignore the digest cache and recompare every dataset")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Compare and report without writing to Redis")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=False)
+    results = run(r, args.datasets, force=args.force, dry_run=args.dry_run)
+    if not results:
+        print("No double-annotated datasets with two submissions found.")
+        return
+
+    hits = 0
+    for res in results:
+        hits += res.cached
+        acc = "n/a" if res.accuracy is None else f"{res.accuracy:.3f}"
+        tag = " (cached)" if res.cached else ""
+        print(f"{res.dataset}: {'/'.join(res.pids)} agreement={acc} "
+              f"({res.matched}/{res.compared}, {len(res.mismatched)} nonconcurred){tag}")
+    print(f"\nDone – {len(results)} datasets, {hits} cache hits.")
+
+
+if __name__ == "__main__":
+    main()
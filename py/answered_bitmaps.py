@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+answered_bitmaps.py
+───────────────────
+Per-(dataset, user) bitmaps of answered questions, so `/get_questions` reads
+the user's answered set with one GET and tests bits locally instead of an
+EXISTS per question (a user without a bitmap gets one written from a single
+MULTI of EXISTS on first visit).
+
+    v1:answered:<ds>:<pid>    STRING bitmap; bit i set ⇔ question i answered
+
+Question i is the i-th uid of `v1:datasets:<ds>` in sorted order whose value
+is a question (py/questions.py) – the order server.js `getDatasetQuestions`
+serves.
+The server sets bits on /submit_question. Anything that changes a dataset's
+question set (and therefore the positions) must rebuild its bitmaps:
+
+    from answered_bitmaps import rebuild
+    rebuild(r, ds)
+
+Users covered by a rebuild are the assignees of <ds> plus everyone already in
+`v1:progress:<ds>`. `delete_dataset.py` removes the bitmaps with its
+`v1:*:<ds>:*` sweep.
+
+Deploying: the sorted order replaced plain SMEMBERS order, so the
+`questionIndex` an annotator already holds can point at a different question
+after the server restarts. Run the backfill below first; clients that send
+`uid` with /submit_question (public/js) are unaffected, the legacy
+questions.html form that sends only `questionIndex` should be reloaded.
+
+Run:
+    python py/answered_bitmaps.py [datasets...] [--workers N]
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterable, List, Optional, Sequence
+
+import redis
+
+from progress import read as read_progress
+from questions import parse_question
+
+REDIS_URL  = "redis://localhost:6397/0"
+BATCH_SIZE = 5_000
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def bitmap_key(ds: str, pid: str) -> str:
+    return f"v1:answered:{ds}:{pid}"
+
+
+def question_order(r: redis.Redis, ds: str) -> List[str]:
+    """uids in the position order the server uses (sorted, non-questions skipped)."""
+    uids = sorted(to_str(u) for u in r.smembers(f"v1:datasets:{ds}"))
+    order: List[str] = []
+    for start in range(0, len(uids), BATCH_SIZE):
+        chunk = uids[start:start + BATCH_SIZE]
+        for uid, raw in zip(chunk, r.mget([f"v1:datasets:{ds}:{u}" for u in chunk])):
+            if parse_question(raw) is not None:
+                order.append(uid)
+    return order
+
+
+def encode(flags: Sequence[bool]) -> bytes:
+    """Pack flags MSB-first, matching Redis SETBIT/BITPOS offsets."""
+    out = bytearray((len(flags) + 7) // 8)
+    for i, flag in enumerate(flags):
+        if flag:
+            out[i >> 3] |= 0x80 >> (i & 7)
+    return bytes(out)
+
+
+def rebuild(r: redis.Redis, ds: str, pids: Optional[Iterable[str]] = None) -> int:
+    """Recompute the bitmaps for <ds>; return how many users were written."""
+    order = question_order(r, ds)
+    if pids is None:
+        pids = {to_str(p) for p in r.smembers(f"v1:assignments:{ds}")} | set(read_progress(r, ds))
+    written = 0
+    for pid in sorted(set(pids)):
+        flags: List[bool] = []
+        for start in range(0, len(order), BATCH_SIZE):
+            chunk = order[start:start + BATCH_SIZE]
+            pipe = r.pipeline(transaction=False)
+            for uid in chunk:
+                pipe.exists(f"v1:{pid}:{ds}:{uid}")
+            flags.extend(bool(n) for n in pipe.execute())
+        if any(flags):
+            r.set(bitmap_key(ds, pid), encode(flags))
+        else:
+            r.delete(bitmap_key(ds, pid))
+        written += 1
+    return written
+
+
+def backfill(redis_url: str, datasets: Sequence[str], workers: int) -> int:
+    def one(ds: str) -> int:
+        return rebuild(redis.Redis.from_url(redis_url, decode_responses=False), ds)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return sum(pool.map(one, datasets))
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build v1:answered:<ds>:<pid> bitmaps.")
+    parser.add_argument("datasets", nargs="*", help="Datasets (default: every v1:datasets member)")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--workers", type=int, default=8, help="Datasets processed in parallel")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    datasets = args.datasets or sorted(r.smembers("v1:datasets"))
+    n = backfill(args.redis_url, datasets, args.workers)
+    print(f"Done – {n} bitmap(s) rebuilt across {len(datasets)} dataset(s).")
+
+
+if __name__ == "__main__":
+    main()
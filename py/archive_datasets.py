@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+archive_datasets.py
+───────────────────
+Move finished datasets out of Redis into compressed, indexed segment files,
+so Redis memory tracks active work instead of every answer ever given.
+
+A dataset is archived when
+  • it is not an *Accuracy / *Training set (those keep getting new users),
+  • every assignee has a `v1:<pid>:<ds>:meta` marker (and Urban grading is
+    no longer pending),
+  • none of its adjudications is pending and all resolved ones are in the
+    export worktree's exported_ids.txt (py/export_adjudications.py),
+  • nobody answered anything for --min-idle-days (a dataset without a
+    `v1:progress:<ds>` hash is not archived – run py/progress.py first).
+
+Its questions and answers are written as one gzip member appended to
+`archive/segments/<n>.seg` (rolled over at SEGMENT_BYTES) and read back and
+verified before anything is removed from Redis. The removal is one MULTI
+guarded by WATCH on every answer key of the dataset, so an answer that
+arrives while archiving sends the dataset round again instead of being
+lost. `archive/index.json` maps ds → {segment, offset, length, sha256}; the
+same entry is kept as `"archived"` in the `v1:datasets:<ds>:meta` stub,
+which also keeps the label and topic. The dataset moves from `v1:datasets` to `v1:archived`.
+Assignments, submission markers and `v1:progress:<ds>` stay in Redis; the
+question / answer keys and everything derived from them are removed.
+
+Readers go through the stub:
+
+    from archive_datasets import load
+    doc = load(r, ds)     # {"questions": {uid: raw}, "answers": {pid: {uid: raw}}, …} or None
+
+server.js does the same for /qresponses, /export_responses and the exports;
+export_difficulties.py and move_difficulties.py add `archived_answers(load_all(r))`
+to their live answers.
+
+Run:
+    python py/archive_datasets.py [datasets...] [--min-idle-days N] [--dry-run]
+    python py/archive_datasets.py --restore <dataset>
+"""
+
+from __future__ import annotations
+
+import argparse
+import fcntl
+import gzip
+import hashlib
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+import redis
+
+from adjudication_view import refresh_dataset as refresh_adjudications
+from answered_bitmaps import rebuild as rebuild_bitmaps
+from availability import track, untrack
+from build_question_bundles import remove_bundle
+from ground_truth import gt_key, has_ground_truth_suffix, store as store_ground_truth
+from invalidation import publish
+from latency_scan import AdaptiveScanner
+from progress import progress_key, read as read_progress
+from response_counts import answer_uid, rcount_key, write as write_counts
+
+REDIS_URL      = "redis://localhost:6397/0"
+ROOT           = Path(__file__).resolve().parent.parent
+ARCHIVE_DIR    = ROOT / "archive"
+SEGMENT_DIR    = "segments"
+INDEX_FILE     = "index.json"
+ARCHIVED_SET   = "v1:archived"
+SEGMENT_BYTES  = 64 * 1024 * 1024
+MIN_IDLE_DAYS  = 14
+DOC_VERSION    = 1
+BATCH_SIZE     = 5_000
+SCAN_COUNT     = 10_000
+ATTEMPTS       = 5          # archive() retries when an answer changes underneath it
+# written by py/export_adjudications.py (<worktree>/<EXPORT_SUBDIR>/exported_ids.txt)
+EXPORTED_IDS   = Path("/storage/cmarnold/projects/maps/mapqa-export"
+                      "/survey-responses/annotations/adjudicated/exported_ids.txt")
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def load_exported_ids(path: Path) -> Set[str]:
+    if not path.exists():
+        return set()
+    with path.open(encoding="utf-8") as fh:
+        return {line.strip() for line in fh if line.strip()}
+
+
+def _meta(r: redis.Redis, ds: str) -> dict:
+    raw = r.get(f"v1:datasets:{ds}:meta")
+    try:
+        meta = json.loads(raw) if raw else {}
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        meta = {}
+    return meta if isinstance(meta, dict) else {}
+
+
+# ── segments ─────────────────────────────────────────────────────────────────
+@contextmanager
+def locked(archive_dir: Path) -> Iterator[None]:
+    """One archiver at a time appends to the segments."""
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    with (archive_dir / ".lock").open("w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def load_index(archive_dir: Path) -> Dict[str, dict]:
+    try:
+        with (archive_dir / INDEX_FILE).open(encoding="utf-8") as fh:
+            return json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def save_index(archive_dir: Path, index: Dict[str, dict]) -> None:
+    tmp = archive_dir / (INDEX_FILE + ".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump(index, fh, sort_keys=True, indent=1)
+    os.replace(tmp, archive_dir / INDEX_FILE)
+
+
+def current_segment(archive_dir: Path) -> Path:
+    seg_dir = archive_dir / SEGMENT_DIR
+    seg_dir.mkdir(parents=True, exist_ok=True)
+    segments = sorted(seg_dir.glob("*.seg"))
+    if segments and segments[-1].stat().st_size < SEGMENT_BYTES:
+        return segments[-1]
+    n = int(segments[-1].stem) + 1 if segments else 1
+    return seg_dir / f"{n:06d}.seg"
+
+
+def append(archive_dir: Path, payload: bytes) -> dict:
+    """Append one gzip member; return its index entry."""
+    data = gzip.compress(payload, 9, mtime=0)
+    segment = current_segment(archive_dir)
+    with segment.open("ab") as fh:
+        offset = fh.tell()
+        fh.write(data)
+        fh.flush()
+        os.fsync(fh.fileno())
+    return {"segment": f"{SEGMENT_DIR}/{segment.name}", "offset": offset,
+            "length": len(data), "sha256": hashlib.sha256(payload).hexdigest()}
+
+
+def read_entry(entry: dict, archive_dir: Path = ARCHIVE_DIR) -> dict:
+    with (archive_dir / entry["segment"]).open("rb") as fh:
+        fh.seek(entry["offset"])
+        payload = gzip.decompress(fh.read(entry["length"]))
+    if hashlib.sha256(payload).hexdigest() != entry["sha256"]:
+        raise RuntimeError(f"archive entry {entry['segment']}@{entry['offset']} is corrupt")
+    return json.loads(payload)
+
+
+def load(r: redis.Redis, ds: str, archive_dir: Path = ARCHIVE_DIR) -> Optional[dict]:
+    """Read-through loader: the archived document of <ds>, or None if it is live."""
+    entry = _meta(r, ds).get("archived")
+    return read_entry(entry, archive_dir) if entry else None
+
+
+def load_all(r: redis.Redis, archive_dir: Path = ARCHIVE_DIR) -> Dict[str, dict]:
+    """ds → archived document for every member of v1:archived."""
+    docs = {}
+    for ds in sorted(to_str(d) for d in r.smembers(ARCHIVED_SET)):
+        doc = load(r, ds, archive_dir)
+        if doc is not None:
+            docs[ds] = doc
+    return docs
+
+
+def archived_answers(docs: Dict[str, dict],
+                     pids: Optional[Set[str]] = None) -> Iterator[Tuple[str, str, str]]:
+    """(pid, v1:<pid>:<ds>:<uid>, raw) for the answers in *docs* – the keys the
+    answers had while live, so export digests do not change on archiving."""
+    for ds, doc in sorted(docs.items()):
+        for pid, by_uid in sorted(doc["answers"].items()):
+            if pids is not None and pid not in pids:
+                continue
+            for uid, raw in sorted(by_uid.items()):
+                yield pid, f"v1:{pid}:{ds}:{uid}", raw
+
+
+# ── eligibility ──────────────────────────────────────────────────────────────
+def adjudications_by_dataset(r: redis.Redis, key: str) -> Dict[str, Set[str]]:
+    out: Dict[str, Set[str]] = defaultdict(set)
+    for raw in r.smembers(key):
+        adj_id = to_str(raw)
+        parts = adj_id.split(":", 2)
+        if len(parts) == 3:
+            out[parts[1]].add(adj_id)
+    return out
+
+
+def blocker(r: redis.Redis, ds: str, pending: Set[str], past: Set[str],
+            exported: Set[str], min_idle_ms: int, now: int) -> Optional[str]:
+    """Why <ds> cannot be archived yet (None = it can)."""
+    if has_ground_truth_suffix(ds):
+        return "ground-truth set"
+    if "archived" in _meta(r, ds):
+        return "already archived"
+    pids = sorted(to_str(p) for p in r.smembers(f"v1:assignments:{ds}"))
+    if not pids:
+        return "no assignees"
+    markers = r.mget([f"v1:{pid}:{ds}:meta" for pid in pids])
+    if any(m is None for m in markers):
+        return "not submitted by every assignee"
+    if ds.lower().startswith("urban") and any(to_str(m) == "submitted" for m in markers):
+        return "grading pending"
+    if pending:
+        return "adjudication pending"
+    if past - exported:
+        return "adjudications not exported"
+    last = max((t for _, t in read_progress(r, ds).values() if t is not None), default=None)
+    if last is None:
+        return "no activity recorded (run py/progress.py)"
+    if now - last < min_idle_ms:
+        return "recently active"
+    return None
+
+
+# ── archive / restore ────────────────────────────────────────────────────────
+def answer_keys(r: redis.Redis, ds: str) -> List[str]:
+    return sorted(key for raw in AdaptiveScanner(r).scan_iter(match=f"v1:*:{ds}:*")
+                  if answer_uid(key := to_str(raw), ds))
+
+
+def _mget(r: redis.Redis, keys: List[str]) -> List:
+    out: List = []
+    for start in range(0, len(keys), BATCH_SIZE):
+        out.extend(r.mget(keys[start:start + BATCH_SIZE]))
+    return out
+
+
+def collect(r: redis.Redis, ds: str) -> dict:
+    uids = sorted(to_str(u) for u in r.smembers(f"v1:datasets:{ds}"))
+    questions = {uid: to_str(raw) for uid, raw in
+                 zip(uids, _mget(r, [f"v1:datasets:{ds}:{uid}" for uid in uids])) if raw is not None}
+    keys = answer_keys(r, ds)
+    answers: Dict[str, Dict[str, str]] = defaultdict(dict)
+    for key, raw in zip(keys, _mget(r, keys)):
+        if raw is not None:
+            answers[key.split(":", 3)[1]][answer_uid(key, ds)] = to_str(raw)
+    pids = sorted(to_str(p) for p in r.smembers(f"v1:assignments:{ds}"))
+    markers = dict(zip(pids, (to_str(m) for m in r.mget([f"v1:{p}:{ds}:meta" for p in pids]))))
+    return {
+        "version": DOC_VERSION, "dataset": ds, "archivedAt": int(time.time() * 1000),
+        "meta": _meta(r, ds), "assignments": pids, "markers": markers,
+        "progress": {to_str(k): to_str(v) for k, v in r.hgetall(progress_key(ds)).items()},
+        "questions": questions, "answers": dict(answers),
+    }
+
+
+def watch_keys(r: redis.Redis, ds: str) -> List[str]:
+    """Every key an answer to <ds> touches, including answers not written yet."""
+    uids = sorted(to_str(u) for u in r.smembers(f"v1:datasets:{ds}"))
+    pids = sorted(to_str(p) for p in r.smembers(f"v1:assignments:{ds}"))
+    return ([progress_key(ds), rcount_key(ds), f"v1:assignments:{ds}"]
+            + [f"v1:{pid}:{ds}:{uid}" for pid in pids for uid in uids])
+
+
+def archive(r: redis.Redis, ds: str, archive_dir: Path = ARCHIVE_DIR) -> dict:
+    """Archive <ds>; its keys only go if no answer changed since they were read.
+
+    The answer keys (existing or not) are WATCHed before collect() and the
+    removal runs in the same MULTI as the stub, so an answer written in
+    between makes the transaction fail and the dataset is collected again
+    instead of the answer being unlinked unarchived.
+    """
+    for _ in range(ATTEMPTS):
+        with r.pipeline(transaction=True) as pipe:
+            keys = watch_keys(r, ds)
+            for start in range(0, len(keys), BATCH_SIZE):
+                pipe.watch(*keys[start:start + BATCH_SIZE])
+            doc = collect(r, ds)
+            extra = [f"v1:{pid}:{ds}:{uid}" for pid, by_uid in doc["answers"].items()
+                     for uid in by_uid]
+            for start in range(0, len(extra), BATCH_SIZE):
+                pipe.watch(*extra[start:start + BATCH_SIZE])
+
+            payload = json.dumps(doc, separators=(",", ":"), ensure_ascii=False).encode()
+            with locked(archive_dir):
+                entry = append(archive_dir, payload)
+                read_entry(entry, archive_dir)              # verify before deleting anything
+            refresh_adjudications(r, ds)                    # later rebuilds read load()
+
+            stub = dict(doc["meta"], archived=dict(entry, responders=sorted(doc["answers"])))
+            doomed = ([f"v1:datasets:{ds}:{uid}" for uid in doc["questions"]] + extra
+                      + [to_str(k) for k in r.scan_iter(match=f"v1:answered:{ds}:*",
+                                                          count=SCAN_COUNT)]
+                      + [f"v1:datasets:{ds}", rcount_key(ds), gt_key(ds)])
+            pipe.multi()
+            pipe.set(f"v1:datasets:{ds}:meta", json.dumps(stub))
+            pipe.srem("v1:datasets", ds)
+            pipe.sadd(ARCHIVED_SET, ds)
+            for start in range(0, len(doomed), BATCH_SIZE):
+                pipe.unlink(*doomed[start:start + BATCH_SIZE])
+            try:
+                pipe.execute()
+            except redis.WatchError:
+                print(f"  • {ds}: answered while archiving – collecting again")
+                continue
+        break
+    else:
+        raise RuntimeError(f"{ds} kept changing; not archived")
+
+    with locked(archive_dir):
+        index = load_index(archive_dir)
+        index[ds] = entry
+        save_index(archive_dir, index)
+    untrack(r, ds, (doc["meta"].get("topic") or "").strip(), doc["assignments"])
+    publish(r, ds, "archived")
+    remove_bundle(ds)
+    return dict(entry, questions=len(doc["questions"]),
+                answers=sum(len(a) for a in doc["answers"].values()), keys=len(doomed))
+
+
+def restore(r: redis.Redis, ds: str, archive_dir: Path = ARCHIVE_DIR) -> dict:
+    """Bring an archived dataset back into Redis (the segment bytes stay)."""
+    doc = load(r, ds, archive_dir)
+    if doc is None:
+        entry = load_index(archive_dir).get(ds)
+        if entry is None:
+            raise RuntimeError(f"{ds} is not archived")
+        doc = read_entry(entry, archive_dir)
+
+    pipe, pending = r.pipeline(transaction=False), 0
+    for uid, raw in doc["questions"].items():
+        pipe.sadd(f"v1:datasets:{ds}", uid)
+        pipe.set(f"v1:datasets:{ds}:{uid}", raw)
+        pending += 1
+        if pending >= BATCH_SIZE:
+            pipe.execute(); pending = 0
+    for pid, by_uid in doc["answers"].items():
+        for uid, raw in by_uid.items():
+            pipe.set(f"v1:{pid}:{ds}:{uid}", raw)
+            pending += 1
+            if pending >= BATCH_SIZE:
+                pipe.execute(); pending = 0
+    for pid, marker in doc["markers"].items():
+        pipe.set(f"v1:{pid}:{ds}:meta", marker, nx=True)
+    for pid in doc["assignments"]:
+        pipe.sadd(f"v1:assignments:{ds}", pid)
+        pipe.sadd(f"v1:assignments:{pid}", ds)
+    if doc["progress"]:
+        pipe.hset(progress_key(ds), mapping=doc["progress"])
+    pipe.set(f"v1:datasets:{ds}:meta", json.dumps(doc["meta"]))
+    pipe.sadd("v1:datasets", ds)
+    pipe.srem(ARCHIVED_SET, ds)
+    pipe.execute()
+
+    counts = Counter(uid for by_uid in doc["answers"].values() for uid in by_uid)
+    write_counts(r, ds, counts)
+    store_ground_truth(r, ds)
+    rebuild_bitmaps(r, ds)
+    refresh_adjudications(r, ds)
+    track(r, ds)
+    publish(r, ds, "created")
+
+    with locked(archive_dir):
+        index = load_index(archive_dir)
+        index.pop(ds, None)
+        save_index(archive_dir, index)
+    return {"questions": len(doc["questions"]), "answers": sum(counts.values())}
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Archive finished datasets out of Redis.")
+    parser.add_argument("datasets", nargs="*", help="Datasets (default: every v1:datasets member)")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--archive-dir", type=Path, default=ARCHIVE_DIR)
+    parser.add_argument("--exported-ids", type=Path, default=EXPORTED_IDS,
+                        help="exported_ids.txt of the adjudication export worktree")
+    parser.add_argument("--min-idle-days", type=float, default=MIN_IDLE_DAYS)
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be archived")
+    parser.add_argument("--restore", metavar="DATASET", help="Move an archived dataset back into Redis")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+
+    if args.restore:
+        stats = restore(r, args.restore, args.archive_dir)
+        print(f"Done – {args.restore} restored ({stats['questions']} questions, "
+              f"{stats['answers']} answers).")
+        return
+
+    datasets = args.datasets or sorted(r.smembers("v1:datasets"))
+    pending = adjudications_by_dataset(r, "v1:adjudications")
+    past = adjudications_by_dataset(r, "v1:past_adjudications")
+    exported = load_exported_ids(args.exported_ids)
+    now = int(time.time() * 1000)
+    min_idle_ms = int(args.min_idle_days * 86_400_000)
+
+    archived = freed = 0
+    for ds in datasets:
+        reason = blocker(r, ds, pending.get(ds, set()), past.get(ds, set()),
+                         exported, min_idle_ms, now)
+        if reason:
+            if args.datasets:
+                print(f"  • {ds}: skipped ({reason})")
+            continue
+        if args.dry_run:
+            print(f"  • {ds}: would be archived")
+            archived += 1
+            continue
+        stats = archive(r, ds, args.archive_dir)
+        archived += 1
+        freed += stats["keys"]
+        print(f"  • {ds}: {stats['questions']} questions, {stats['answers']} answers "
+              f"→ {stats['segment']} ({stats['length']:,} bytes)")
+    verb = "would be archived" if args.dry_run else "archived"
+    print(f"Done – {archived} dataset(s) {verb}, {freed:,} Redis key(s) removed.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+availability.py
+───────────────
+Per-topic availability index, so server.js `getNextDataset` picks the next
+dataset with a few set operations instead of walking every dataset of the
+campaign with sequential SISMEMBER / EXISTS / SCARD calls.
+
+    v1:avail:<topic>            ZSET  dataset → number of assignees
+                                      (every campaign dataset except *Accuracy)
+    v1:avail:<topic>:accuracy   SET   *Accuracy datasets (open to everyone)
+    v1:open:<pid>               SET   datasets assigned to <pid> and not yet
+                                      submitted (no v1:<pid>:<ds>:meta)
+    v1:avail:built              STRING ms timestamp of the last full rebuild
+
+The server keeps the index current when it assigns users, stores a
+submission marker or moves a dataset between campaigns. Scripts that create,
+delete or re-open datasets call the hooks:
+
+    from availability import track, untrack, refresh_users
+    track(r, ds)                    # created / assignees changed
+    untrack(r, ds, topic, pids)     # deleted
+    refresh_users(r, ds)            # submission markers written or removed
+
+Run:
+    python py/availability.py       # rebuild everything from the sets
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Iterable, List, Optional, Sequence
+
+import redis
+
+REDIS_URL    = "redis://localhost:6397/0"
+AVAIL_PREFIX = "v1:avail:"
+OPEN_PREFIX  = "v1:open:"
+BUILT_KEY    = f"{AVAIL_PREFIX}built"
+BATCH_SIZE   = 5_000
+SCAN_COUNT   = 10_000
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def avail_key(topic: str) -> str:
+    return f"{AVAIL_PREFIX}{topic}"
+
+
+def accuracy_key(topic: str) -> str:
+    return f"{AVAIL_PREFIX}{topic}:accuracy"
+
+
+def open_key(pid: str) -> str:
+    return f"{OPEN_PREFIX}{pid}"
+
+
+def is_accuracy_dataset(ds: str) -> bool:
+    """Python twin of server.js isAccuracyDataset()."""
+    return ds.lower().endswith("accuracy")
+
+
+def dataset_topic(r: redis.Redis, ds: str) -> str:
+    raw = r.get(f"v1:datasets:{ds}:meta")
+    try:
+        meta = json.loads(raw) if raw else {}
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        meta = {}
+    return (meta.get("topic") or "").strip() if isinstance(meta, dict) else ""
+
+
+# ── hooks ────────────────────────────────────────────────────────────────────
+def track(r: redis.Redis, ds: str, topic: Optional[str] = None) -> None:
+    """(Re)index <ds> under its campaign with its current assignee count."""
+    topic = dataset_topic(r, ds) if topic is None else topic
+    if not topic:
+        return
+    if is_accuracy_dataset(ds):
+        r.sadd(accuracy_key(topic), ds)
+    else:
+        r.zadd(avail_key(topic), {ds: r.scard(f"v1:assignments:{ds}")})
+
+
+def untrack(r: redis.Redis, ds: str, topic: Optional[str],
+            pids: Iterable[str] = ()) -> None:
+    pipe = r.pipeline(transaction=False)
+    if topic:
+        pipe.zrem(avail_key(topic), ds)
+        pipe.srem(accuracy_key(topic), ds)
+    for pid in pids:
+        pipe.srem(open_key(to_str(pid)), ds)
+    pipe.execute()
+
+
+def refresh_users(r: redis.Redis, ds: str, pids: Optional[Iterable[str]] = None) -> None:
+    """Recompute v1:open:<pid> membership of <ds> from the submission markers."""
+    if pids is None:
+        pids = r.smembers(f"v1:assignments:{ds}")
+    pids = sorted(to_str(p) for p in pids)
+    if not pids:
+        return
+    pipe = r.pipeline(transaction=False)
+    for pid in pids:
+        pipe.exists(f"v1:{pid}:{ds}:meta")
+    submitted = pipe.execute()
+    pipe = r.pipeline(transaction=False)
+    for pid, done in zip(pids, submitted):
+        if done:
+            pipe.srem(open_key(pid), ds)
+        else:
+            pipe.sadd(open_key(pid), ds)
+    pipe.execute()
+
+
+# ── rebuild ──────────────────────────────────────────────────────────────────
+def campaign_topics(r: redis.Redis) -> List[str]:
+    topics = []
+    for raw in r.scan_iter(match="v1:campaigns:*", count=SCAN_COUNT):
+        key = to_str(raw)
+        if not key.endswith(":meta") and to_str(r.type(raw)) == "set":
+            topics.append(key[len("v1:campaigns:"):])
+    return sorted(topics)
+
+
+def _delete_matching(r: redis.Redis, pattern: str) -> None:
+    pipe = r.pipeline(transaction=False)
+    pending = 0
+    for key in r.scan_iter(match=pattern, count=SCAN_COUNT):
+        pipe.delete(key)
+        pending += 1
+        if pending >= BATCH_SIZE:
+            pipe.execute(); pending = 0
+    pipe.execute()
+
+
+def rebuild(r: redis.Redis) -> dict:
+    _delete_matching(r, f"{AVAIL_PREFIX}*")
+    _delete_matching(r, f"{OPEN_PREFIX}*")
+
+    indexed = 0
+    for topic in campaign_topics(r):
+        members = sorted(to_str(d) for d in r.smembers(f"v1:campaigns:{topic}"))
+        regular = [ds for ds in members if not is_accuracy_dataset(ds)]
+        accuracy = [ds for ds in members if is_accuracy_dataset(ds)]
+        pipe = r.pipeline(transaction=False)
+        for ds in regular:
+            pipe.scard(f"v1:assignments:{ds}")
+        counts = pipe.execute() if regular else []
+        pipe = r.pipeline(transaction=False)
+        if regular:
+            pipe.zadd(avail_key(topic), dict(zip(regular, counts)))
+        if accuracy:
+            pipe.sadd(accuracy_key(topic), *accuracy)
+        pipe.execute()
+        indexed += len(members)
+
+    datasets = sorted(to_str(d) for d in r.smembers("v1:datasets"))
+    for ds in datasets:
+        refresh_users(r, ds)
+    r.set(BUILT_KEY, int(time.time() * 1000))
+    return {"datasets": indexed, "open_sets": sum(1 for _ in r.scan_iter(match=f"{OPEN_PREFIX}*"))}
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Rebuild the dataset availability index.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    stats = rebuild(r)
+    print(f"Done – indexed {stats['datasets']} campaign dataset(s), "
+          f"{stats['open_sets']} user open set(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+build_question_bundles.py
+─────────────────────────
+Write each dataset's normalised questions to a static, precompressed bundle
+so pages can load them from disk / a CDN instead of SMEMBERS + MGET.
+
+    bundles/<ds>/<etag>.json         questions, ordered like getDatasetQuestions
+    bundles/<ds>/<etag>.json.gz      gzip -9
+    bundles/<ds>/<etag>.json.br      brotli (only when the `brotli` module exists)
+    bundles/manifest.json            ds → {file, etag, count, bytes, version}
+
+<etag> is a content hash, so bundle URLs never change meaning and are served
+with immutable caching; only manifest.json is revalidated. `version` is the
+dataset's `v1:versions` counter (py/invalidation.py) when the bundle was
+built – a dataset whose counter has not moved is skipped.
+
+py/add_dataset.py, py/update_questions.py and py/del_questions.py rebuild the
+affected bundle; py/delete_dataset.py removes it.
+
+Run:
+    python py/build_question_bundles.py [datasets...] [--force]
+"""
+
+from __future__ import annotations
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import redis
+
+from questions import parse_question
+
+try:
+    import brotli
+except ImportError:  # optional – gzip alone is still served
+    brotli = None
+
+REDIS_URL      = "redis://localhost:6397/0"
+ROOT           = Path(__file__).resolve().parent.parent
+OUT_DIR        = ROOT / "bundles"
+MANIFEST       = "manifest.json"
+BATCH_SIZE     = 5_000
+BUNDLE_VERSION = 1
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def normalise(q: dict) -> dict:
+    """Python twin of server.js normalise()."""
+    if q.get("uid") is None and q.get("QID") is not None:
+        q["uid"] = q["QID"]
+    q.pop("QID", None)
+    if not q.get("Question") and q.get("question"):
+        q["Question"] = q["question"]
+    if not q.get("Map") and q.get("map"):
+        q["Map"] = q["map"]
+    if not q.get("locations"):
+        q["locations"] = []
+    return q
+
+
+def load_questions(r: redis.Redis, ds: str) -> List[dict]:
+    uids = sorted(to_str(u) for u in r.smembers(f"v1:datasets:{ds}"))
+    out: List[dict] = []
+    for start in range(0, len(uids), BATCH_SIZE):
+        chunk = uids[start:start + BATCH_SIZE]
+        for raw in r.mget([f"v1:datasets:{ds}:{uid}" for uid in chunk]):
+            obj = parse_question(raw)
+            if obj is not None:
+                out.append(normalise(obj))
+    return out
+
+
+# ── manifest ─────────────────────────────────────────────────────────────────
+def load_manifest(out_dir: Path) -> Dict[str, dict]:
+    try:
+        with (out_dir / MANIFEST).open(encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if data.get("version") != BUNDLE_VERSION:
+        return {}
+    return data.get("datasets", {})
+
+
+def save_manifest(out_dir: Path, datasets: Dict[str, dict]) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = out_dir / (MANIFEST + ".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump({"version": BUNDLE_VERSION, "datasets": datasets}, fh, sort_keys=True)
+    os.replace(tmp, out_dir / MANIFEST)
+
+
+def _write(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _prune(ds_dir: Path, keep: Sequence[str]) -> None:
+    """Drop old bundles, keeping *keep* (current + previous for in-flight pages)."""
+    for path in ds_dir.iterdir():
+        if path.name.split(".", 1)[0] not in keep:
+            path.unlink()
+
+
+# ── build ────────────────────────────────────────────────────────────────────
+def build_bundle(r: redis.Redis, ds: str, out_dir: Path = OUT_DIR,
+                 force: bool = False) -> Optional[dict]:
+    """(Re)build one dataset's bundle; return its manifest entry (None if skipped)."""
+    manifest = load_manifest(out_dir)
+    prev = manifest.get(ds)
+    version = int(r.hget("v1:versions", ds) or 0)
+    if (not force and prev and prev.get("version") == version
+            and (out_dir / prev["file"]).exists()):
+        return None
+
+    questions = load_questions(r, ds)
+    body = json.dumps(questions, separators=(",", ":"), ensure_ascii=False).encode()
+    etag = hashlib.sha256(body).hexdigest()[:20]
+    ds_dir = out_dir / ds
+    ds_dir.mkdir(parents=True, exist_ok=True)
+    base = ds_dir / f"{etag}.json"
+    if not base.exists():
+        _write(base.with_name(base.name + ".gz"), gzip.compress(body, 9, mtime=0))
+        if brotli is not None:
+            _write(base.with_name(base.name + ".br"), brotli.compress(body, quality=11))
+        _write(base, body)
+
+    entry = {"file": f"{ds}/{etag}.json", "etag": etag, "count": len(questions),
+             "bytes": len(body), "version": version,
+             "encodings": ["gzip"] + (["br"] if brotli is not None else [])}
+    previous_etag = prev.get("etag") if prev else None
+    _prune(ds_dir, [etag] + ([previous_etag] if previous_etag else []))
+
+    manifest = load_manifest(out_dir)       # re-read: keep concurrent writers' entries
+    manifest[ds] = entry
+    save_manifest(out_dir, manifest)
+    return entry
+
+
+def remove_bundle(ds: str, out_dir: Path = OUT_DIR) -> None:
+    manifest = load_manifest(out_dir)
+    if manifest.pop(ds, None) is not None:
+        save_manifest(out_dir, manifest)
+    ds_dir = out_dir / ds
+    if ds_dir.is_dir():
+        _prune(ds_dir, [])
+        ds_dir.rmdir()
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build static question bundles per dataset.")
+    parser.add_argument("datasets", nargs="*", help="Datasets (default: every v1:datasets member)")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the version is unchanged")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=False)
+    datasets = args.datasets or sorted(to_str(d) for d in r.smembers("v1:datasets"))
+    built = 0
+    for ds in datasets:
+        entry = build_bundle(r, ds, args.out_dir, args.force)
+        if entry:
+            built += 1
+            print(f"  • {ds}: {entry['count']} questions → {entry['file']}")
+    if not args.datasets:
+        manifest = load_manifest(args.out_dir)
+        for gone in sorted(set(manifest) - set(datasets)):
+            remove_bundle(gone, args.out_dir)
+            print(f"  • {gone}: removed")
+    print(f"Done – built={built}, unchanged={len(datasets) - built}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+build_thumbnails.py
+───────────────────
+Pre-generate map thumbnails and responsive width variants so `/thumb` and the
+past-answers / status pages never have to decode a full-size scan per request.
+
+Sources: every `Map` referenced by a question in `v1:datasets:<ds>:<uid>`
+plus the `filename` column of data/Map-IDs.csv, resolved under maps/.
+
+For each source image the worker pool writes
+
+    thumbs/<h[:2]>/<h>-thumb.jpg      200×200 fit-inside (what /thumb served)
+    thumbs/<h[:2]>/<h>-w<W>.webp      width variants, WebP
+    thumbs/<h[:2]>/<h>-w<W>.jpg       width variants, JPEG
+
+where <h> is the SHA-256 of the source file, so identical scans share output
+and a changed scan never serves stale pixels. `thumbs/manifest.json` maps each
+`Map` filename to its hash and variant paths; the server serves the directory
+statically with immutable caching.
+
+Runs are incremental: a source whose size and mtime match the manifest is
+skipped without reading it; a touched file is re-hashed and only re-rendered
+if its content changed.
+
+Run:
+    python py/build_thumbnails.py [--maps-dir maps] [--out-dir thumbs] [--workers N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import redis
+from PIL import Image
+from tqdm import tqdm
+
+REDIS_URL   = "redis://localhost:6397/0"
+ROOT        = Path(__file__).resolve().parent.parent
+MAPS_DIR    = ROOT / "maps"
+OUT_DIR     = ROOT / "thumbs"
+MAP_IDS_CSV = ROOT / "data" / "Map-IDs.csv"
+MANIFEST    = "manifest.json"
+BATCH_SIZE  = 5_000
+
+THUMB_SIZE  = (200, 200)
+WIDTHS      = (480, 960, 1920)
+FORMATS     = (("webp", "WEBP", {"quality": 80, "method": 4}),
+               ("jpg",  "JPEG", {"quality": 82, "optimize": True, "progressive": True}))
+PIPELINE_VERSION = 1
+
+# Map scans are trusted input and routinely exceed Pillow's bomb guard.
+Image.MAX_IMAGE_PIXELS = None
+
+
+# ── source discovery ─────────────────────────────────────────────────────────
+def maps_from_redis(r: redis.Redis) -> Set[str]:
+    names: Set[str] = set()
+    datasets = [d.decode() if isinstance(d, bytes) else d for d in r.smembers("v1:datasets")]
+    for ds in datasets:
+        uids = [u.decode() if isinstance(u, bytes) else u for u in r.smembers(f"v1:datasets:{ds}")]
+        for start in range(0, len(uids), BATCH_SIZE):
+            chunk = uids[start:start + BATCH_SIZE]
+            for raw in r.mget([f"v1:datasets:{ds}:{uid}" for uid in chunk]):
+                if not raw:
+                    continue
+                try:
+                    q = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                name = (q.get("Map") or q.get("map") or "").strip() if isinstance(q, dict) else ""
+                if name:
+                    names.add(name)
+    return names
+
+
+def maps_from_csv(csv_path: Path) -> Set[str]:
+    if not csv_path.exists():
+        return set()
+    with csv_path.open(newline="", encoding="utf-8") as fh:
+        return {row["filename"].strip() for row in csv.DictReader(fh) if row.get("filename")}
+
+
+# ── hashing / rendering (worker side) ────────────────────────────────────────
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def variant_names(digest: str) -> Dict[str, str]:
+    prefix = f"{digest[:2]}/{digest}"
+    out = {"thumb": f"{prefix}-thumb.jpg"}
+    for width in WIDTHS:
+        for ext, _, _ in FORMATS:
+            out[f"w{width}.{ext}"] = f"{prefix}-w{width}.{ext}"
+    return out
+
+
+def _save(img: Image.Image, path: Path, fmt: str, opts: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    img.save(tmp, fmt, **opts)
+    os.replace(tmp, path)
+
+
+def render(src: str, out_dir: str, digest: str) -> Tuple[int, int]:
+    """Write every variant for one source image; return its (width, height)."""
+    src_path, out_root = Path(src), Path(out_dir)
+    names = variant_names(digest)
+    with Image.open(src_path) as img:
+        width, height = img.size
+        largest = min(max(WIDTHS), width)
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale when that is enough.
+        img.draft("RGB", (largest, max(1, height * largest // width)))
+        base = img.convert("RGB")
+
+    # Downscale from the largest variant to the smallest so every resize
+    # works from the cheapest adequate source.
+    current = base
+    for w in sorted(WIDTHS, reverse=True):
+        target_w = min(w, width)
+        target_h = max(1, round(height * target_w / width))
+        if current.size != (target_w, target_h):
+            current = current.resize((target_w, target_h), Image.LANCZOS)
+        for ext, fmt, opts in FORMATS:
+            _save(current, out_root / names[f"w{w}.{ext}"], fmt, opts)
+
+    thumb = current.copy()
+    thumb.thumbnail(THUMB_SIZE, Image.LANCZOS)
+    _save(thumb, out_root / names["thumb"], "JPEG", {"quality": 85})
+    return width, height
+
+
+def process(src: str, out_dir: str, known_digest: Optional[str]) -> Tuple[str, dict]:
+    path = Path(src)
+    st = path.stat()
+    digest = sha256_file(path)
+    names = variant_names(digest)
+    out_root = Path(out_dir)
+    entry = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+             "variants": names}
+    if digest == known_digest and all((out_root / n).exists() for n in names.values()):
+        entry["rendered"] = False
+        return src, entry
+    entry["width"], entry["height"] = render(src, out_dir, digest)
+    entry["rendered"] = True
+    return src, entry
+
+
+# ── manifest ─────────────────────────────────────────────────────────────────
+def load_manifest(out_dir: Path) -> Dict[str, dict]:
+    try:
+        with (out_dir / MANIFEST).open(encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if data.get("version") != PIPELINE_VERSION:
+        return {}
+    return data.get("maps", {})
+
+
+def save_manifest(out_dir: Path, maps: Dict[str, dict]) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = out_dir / (MANIFEST + ".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump({"version": PIPELINE_VERSION, "thumb": list(THUMB_SIZE),
+                   "widths": list(WIDTHS), "maps": maps}, fh, sort_keys=True)
+    os.replace(tmp, out_dir / MANIFEST)
+
+
+def build(
+    names: Iterable[str],
+    maps_dir: Path,
+    out_dir: Path,
+    workers: Optional[int] = None,
+    force: bool = False,
+) -> Dict[str, int]:
+    manifest = {} if force else load_manifest(out_dir)
+    stats = {"rendered": 0, "unchanged": 0, "missing": 0, "failed": 0}
+
+    todo: List[Tuple[str, Path]] = []
+    for name in sorted(set(names)):
+        src = maps_dir / name
+        try:
+            st = src.stat()
+        except FileNotFoundError:
+            stats["missing"] += 1
+            manifest.pop(name, None)
+            continue
+        prev = manifest.get(name)
+        if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+            stats["unchanged"] += 1
+            continue
+        todo.append((name, src))
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(process, str(src), str(out_dir),
+                            (manifest.get(name) or {}).get("sha256")): name
+                for name, src in todo
+            }
+            for fut in tqdm(as_completed(futures), total=len(futures), unit="map"):
+                name = futures[fut]
+                try:
+                    _, entry = fut.result()
+                except Exception as exc:  # noqa: BLE001
+                    stats["failed"] += 1
+                    print(f"  • {name}: {exc}")
+                    continue
+                prev = manifest.get(name) or {}
+                if not entry.pop("rendered"):
+                    entry.setdefault("width", prev.get("width"))
+                    entry.setdefault("height", prev.get("height"))
+                    stats["unchanged"] += 1
+                else:
+                    stats["rendered"] += 1
+                manifest[name] = entry
+
+    save_manifest(out_dir, manifest)
+    return stats
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Pre-generate map thumbnails and width variants.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--maps-dir", type=Path, default=MAPS_DIR)
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    parser.add_argument("--csv", type=Path, default=MAP_IDS_CSV)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Process pool size (default: CPU count)")
+    parser.add_argument("--no-redis", action="store_true",
+                        help="Only use data/Map-IDs.csv as the source list")
+    parser.add_argument("--force", action="store_true", help="Ignore the manifest and re-render")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    names = maps_from_csv(args.csv)
+    if not args.no_redis:
+        r = redis.Redis.from_url(args.redis_url, decode_responses=False)
+        names |= maps_from_redis(r)
+    stats = build(names, args.maps_dir, args.out_dir, args.workers, args.force)
+    print(f"Done – {len(names)} maps: rendered={stats['rendered']}, "
+          f"unchanged={stats['unchanged']}, missing={stats['missing']}, "
+          f"failed={stats['failed']}")
+
+
+if __name__ == "__main__":
+    main()
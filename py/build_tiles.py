@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+build_tiles.py
+──────────────
+Build DeepZoom tile pyramids for the full-resolution map scans in maps/ so a
+viewer can fetch only the tiles that are on screen instead of the whole image.
+
+Layout (content-addressed by the source SHA-256, like thumbs/):
+
+    tiles/<h[:2]>/<h>/image.dzi                DeepZoom descriptor
+    tiles/<h[:2]>/<h>/image_files/<L>/<c>_<r>.jpg
+    tiles/<h[:2]>/<h>/index.json               per-map tile index
+    tiles/index.json                           `Map` filename → pyramid
+
+Level L has ceil(W / 2^(max-L)) × ceil(H / 2^(max-L)) pixels, max =
+ceil(log2(max(W, H))), tiles are TILE_SIZE px with OVERLAP px of overlap –
+the layout OpenSeadragon and other DeepZoom viewers expect. The same tiles
+are addressable XYZ-style as level/col/row.
+
+Maps are tiled in parallel across a process pool. Runs are incremental: a
+scan whose size and mtime match tiles/index.json is skipped, and a touched
+scan is only re-tiled if its content hash changed.
+
+Run:
+    python py/build_tiles.py [--maps-dir maps] [--out-dir tiles] [--workers N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from PIL import Image
+from tqdm import tqdm
+
+ROOT        = Path(__file__).resolve().parent.parent
+MAPS_DIR    = ROOT / "maps"
+OUT_DIR     = ROOT / "tiles"
+INDEX       = "index.json"
+IMAGE_EXTS  = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".webp"}
+
+TILE_SIZE   = 254
+OVERLAP     = 1
+TILE_FORMAT = "jpg"
+QUALITY     = 85
+PYRAMID_VERSION = 1
+
+# Map scans are trusted input and routinely exceed Pillow's bomb guard.
+Image.MAX_IMAGE_PIXELS = None
+
+
+def sha256_file(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def pyramid_dir(digest: str) -> str:
+    return f"{digest[:2]}/{digest}"
+
+
+def level_dims(width: int, height: int) -> List[Tuple[int, int]]:
+    """(width, height) for levels 0 … max."""
+    max_level = math.ceil(math.log2(max(width, height, 1)))
+    return [
+        (math.ceil(width / 2 ** (max_level - lvl)), math.ceil(height / 2 ** (max_level - lvl)))
+        for lvl in range(max_level + 1)
+    ]
+
+
+def dzi_xml(width: int, height: int) -> str:
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<Image xmlns="http://schemas.microsoft.com/deepzoom/2008" '
+        f'Format="{TILE_FORMAT}" Overlap="{OVERLAP}" TileSize="{TILE_SIZE}">\n'
+        f'  <Size Width="{width}" Height="{height}"/>\n'
+        "</Image>\n"
+    )
+
+
+def write_level(img: Image.Image, level_dir: Path) -> Tuple[int, int]:
+    """Cut one level into tiles; return (cols, rows)."""
+    level_dir.mkdir(parents=True, exist_ok=True)
+    w, h = img.size
+    cols, rows = math.ceil(w / TILE_SIZE), math.ceil(h / TILE_SIZE)
+    for col in range(cols):
+        x0 = max(col * TILE_SIZE - OVERLAP, 0)
+        x1 = min((col + 1) * TILE_SIZE + OVERLAP, w)
+        for row in range(rows):
+            y0 = max(row * TILE_SIZE - OVERLAP, 0)
+            y1 = min((row + 1) * TILE_SIZE + OVERLAP, h)
+            img.crop((x0, y0, x1, y1)).save(
+                level_dir / f"{col}_{row}.{TILE_FORMAT}", "JPEG", quality=QUALITY
+            )
+    return cols, rows
+
+
+def decode_rgb(path: Path) -> Image.Image:
+    """Decode a scan once, straight into RGB.
+
+    JPEG scans (most of maps/) are asked to decode as RGB with draft(), so
+    there is no second full-size copy from convert(). Pillow cannot decode a
+    window of a JPEG – crop() loads the whole image first – so the full decode
+    itself is unavoidable; the point is to make it the only one.
+    """
+    img = Image.open(path)
+    if img.format == "JPEG":
+        img.draft("RGB", img.size)           # same scale, RGB colour conversion in libjpeg
+    img.load()
+    if img.mode == "RGB":
+        return img
+    with img:
+        return img.convert("RGB")
+
+
+def tile_map(src: str, out_dir: str, known_digest: Optional[str]) -> dict:
+    """Build (or confirm) the pyramid for one scan; runs in a worker process."""
+    path = Path(src)
+    st = path.stat()
+    digest = sha256_file(path)
+    rel = pyramid_dir(digest)
+    root = Path(out_dir) / rel
+    entry = {"sha256": digest, "size": st.st_size, "mtime_ns": st.st_mtime_ns,
+             "dir": rel, "dzi": f"{rel}/image.dzi"}
+
+    if digest == known_digest and (root / INDEX).exists():
+        with (root / INDEX).open(encoding="utf-8") as fh:
+            idx = json.load(fh)
+        entry.update(width=idx["width"], height=idx["height"], levels=len(idx["levels"]))
+        entry["tiled"] = False
+        return entry
+
+    current = decode_rgb(path)
+    width, height = current.size
+    dims = level_dims(width, height)
+
+    tiles_root = root / "image_files"
+    levels: List[dict] = []
+    # Walk from the top level down, halving the previous level each time so
+    # no level is resampled from the full-resolution scan more than once; the
+    # previous level is dropped as soon as the next one exists, so only the
+    # full-resolution decode and its half-size successor are ever in memory.
+    for lvl in range(len(dims) - 1, -1, -1):
+        if current.size != dims[lvl]:
+            current = current.resize(dims[lvl], Image.LANCZOS)
+        cols, rows = write_level(current, tiles_root / str(lvl))
+        levels.append({"level": lvl, "width": dims[lvl][0], "height": dims[lvl][1],
+                       "cols": cols, "rows": rows})
+    levels.reverse()
+
+    (root / "image.dzi").write_text(dzi_xml(width, height), encoding="utf-8")
+    index = {"version": PYRAMID_VERSION, "source": path.name, "sha256": digest,
+             "width": width, "height": height, "tileSize": TILE_SIZE,
+             "overlap": OVERLAP, "format": TILE_FORMAT, "levels": levels}
+    tmp = root / (INDEX + ".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump(index, fh)
+    os.replace(tmp, root / INDEX)
+
+    entry.update(width=width, height=height, levels=len(levels))
+    entry["tiled"] = True
+    return entry
+
+
+def load_index(out_dir: Path) -> Dict[str, dict]:
+    try:
+        with (out_dir / INDEX).open(encoding="utf-8") as fh:
+            data = json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    if data.get("version") != PYRAMID_VERSION:
+        return {}
+    return data.get("maps", {})
+
+
+def save_index(out_dir: Path, maps: Dict[str, dict]) -> None:
+    out_dir.mkdir(parents=True, exist_ok=True)
+    tmp = out_dir / (INDEX + ".tmp")
+    with tmp.open("w", encoding="utf-8") as fh:
+        json.dump({"version": PYRAMID_VERSION, "tileSize": TILE_SIZE,
+                   "overlap": OVERLAP, "format": TILE_FORMAT, "maps": maps},
+                  fh, sort_keys=True)
+    os.replace(tmp, out_dir / INDEX)
+
+
+def build(
+    maps_dir: Path,
+    out_dir: Path,
+    workers: Optional[int] = None,
+    force: bool = False,
+    only: Sequence[str] = (),
+) -> Dict[str, int]:
+    index = {} if force else load_index(out_dir)
+    stats = {"tiled": 0, "unchanged": 0, "failed": 0, "removed": 0}
+
+    sources = {p.name: p for p in maps_dir.iterdir()
+               if p.is_file() and p.suffix.lower() in IMAGE_EXTS} if maps_dir.is_dir() else {}
+    if only:
+        wanted = set(only)
+        sources = {name: p for name, p in sources.items() if name in wanted}
+    else:
+        for gone in set(index) - set(sources):
+            index.pop(gone)
+            stats["removed"] += 1
+
+    todo: List[Tuple[str, Path]] = []
+    for name, src in sorted(sources.items()):
+        st = src.stat()
+        prev = index.get(name)
+        if prev and prev.get("size") == st.st_size and prev.get("mtime_ns") == st.st_mtime_ns:
+            stats["unchanged"] += 1
+            continue
+        todo.append((name, src))
+
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {
+                pool.submit(tile_map, str(src), str(out_dir),
+                            (index.get(name) or {}).get("sha256")): name
+                for name, src in todo
+            }
+            for fut in tqdm(as_completed(futures), total=len(futures), unit="map"):
+                name = futures[fut]
+                try:
+                    entry = fut.result()
+                except Exception as exc:  # noqa: BLE001
+                    stats["failed"] += 1
+                    print(f"  • {name}: {exc}")
+                    continue
+                stats["tiled" if entry.pop("tiled") else "unchanged"] += 1
+                index[name] = entry
+
+    save_index(out_dir, index)
+    return stats
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build DeepZoom tile pyramids for map scans.")
+    parser.add_argument("maps", nargs="*", help="Only tile these Map filenames")
+    parser.add_argument("--maps-dir", type=Path, default=MAPS_DIR)
+    parser.add_argument("--out-dir", type=Path, default=OUT_DIR)
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Process pool size (default: CPU count)")
+    parser.add_argument("--force", action="store_true", help="Ignore the index and re-tile")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    stats = build(args.maps_dir, args.out_dir, args.workers, args.force, args.maps)
+    print(f"Done – tiled={stats['tiled']}, unchanged={stats['unchanged']}, "
+          f"removed={stats['removed']}, failed={stats['failed']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+bulk_load.py
+────────────
+Cold-load the dataset catalogue (data/datasets.jsonl + its per-dataset
+files) as a raw RESP stream instead of redis-py pipeline calls, so filling a
+fresh or test Redis with thousands of datasets takes seconds.
+
+The dataset files are parsed and encoded in parallel worker processes. Each
+dataset becomes one block of commands:
+
+    SADD v1:datasets:<ds> <uid …>           (≤ SADD_CHUNK uids per command)
+    SET  v1:datasets:<ds>:<uid> <question>
+    SET  v1:datasets:<ds>:meta {label,description,topic} NX
+    SADD v1:datasets <ds>
+    SADD v1:campaigns:<topic> <ds>          + SET …:meta {curIndex,numImages} NX
+
+Dataset ids are renamed like migrate_to_v1.py; questions without a uid are
+skipped (and counted) like its ingest_questions(). The blocks either go to a
+file / stdout for `redis-cli --pipe`, or straight down one connection, one
+dataset at a time with its replies read back before the next. Datasets that
+are already in `v1:datasets` are left alone in socket mode.
+
+After a socket load every dataset's SCARD and a sample of its question keys
+are checked against what was sent, the derived keys are filled in
+(ground truth, `v1:versions` + a "created" event, availability index) and an
+integrity summary is printed. Question bundles are not built – run
+py/build_question_bundles.py afterwards if the server should serve them.
+
+Run:
+    python py/bulk_load.py [--catalogue data/datasets.jsonl] [--workers 8]
+    python py/bulk_load.py --out - | redis-cli -p 6397 --pipe
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple
+
+import redis
+
+from availability import rebuild as rebuild_availability
+from ground_truth import store as store_ground_truth
+from invalidation import publish
+from migrate_to_v1 import RENAME
+
+REDIS_URL     = "redis://localhost:6397/0"
+ROOT          = Path(__file__).resolve().parent.parent
+CATALOGUE     = ROOT / "data" / "datasets.jsonl"
+SADD_CHUNK    = 1_000
+CHECK_SAMPLE  = 100
+
+
+def resp(*parts) -> bytes:
+    """One command in RESP (array of bulk strings)."""
+    out = [b"*%d\r\n" % len(parts)]
+    for part in parts:
+        data = part if isinstance(part, bytes) else str(part).encode()
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+@dataclass
+class Block:
+    dataset: str
+    file: str
+    lines: int = 0
+    questions: int = 0
+    bad_json: int = 0
+    missing_uid: int = 0
+    duplicates: int = 0
+    commands: int = 0
+    bytes: int = 0
+    sha256: str = ""
+    error: str = ""
+    payload: bytes = field(default=b"", repr=False)
+    sample: List[str] = field(default_factory=list, repr=False)
+
+    def summary(self) -> dict:
+        out = asdict(self)
+        out.pop("payload")
+        out.pop("sample")
+        return out
+
+
+def read_catalogue(path: Path) -> List[dict]:
+    entries = []
+    with path.open(encoding="utf-8") as fh:
+        for ln, line in enumerate(fh, 1):
+            if not line.strip():
+                continue
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError as e:
+                sys.exit(f"{path}:{ln} – bad JSON ({e})")
+    return entries
+
+
+def encode_dataset(entry: dict, data_dir: str, default_topic: str) -> Block:
+    """Worker: parse one dataset file and encode its RESP block."""
+    ds = RENAME.get(entry["id"], entry["id"])
+    block = Block(dataset=ds, file=entry.get("file", ""))
+    path = Path(data_dir) / block.file
+    if not block.file or not path.exists():
+        block.error = "file missing"
+        return block
+
+    uids: List[str] = []
+    seen = set()
+    commands: List[bytes] = []
+    with path.open(encoding="utf-8") as fh:
+        for line in fh:
+            if not line.strip():
+                continue
+            block.lines += 1
+            try:
+                q = json.loads(line)
+            except json.JSONDecodeError:
+                block.bad_json += 1
+                continue
+            uid = q.get("uid") if isinstance(q, dict) else None
+            if not uid:
+                block.missing_uid += 1
+                continue
+            uid = str(uid)
+            if uid in seen:
+                block.duplicates += 1          # last one wins, like repeated SETs
+            else:
+                seen.add(uid)
+                uids.append(uid)
+            commands.append(resp("SET", f"v1:datasets:{ds}:{uid}", json.dumps(q)))
+
+    for start in range(0, len(uids), SADD_CHUNK):
+        commands.append(resp("SADD", f"v1:datasets:{ds}", *uids[start:start + SADD_CHUNK]))
+    topic = (entry.get("topic") or default_topic or "").strip()
+    meta = {"label": entry.get("label") or ds, "description": entry.get("description", ""),
+            "topic": topic}
+    commands.append(resp("SET", f"v1:datasets:{ds}:meta", json.dumps(meta), "NX"))
+    commands.append(resp("SADD", "v1:datasets", ds))
+    if topic:
+        commands.append(resp("SADD", f"v1:campaigns:{topic}", ds))
+        commands.append(resp("SET", f"v1:campaigns:{topic}:meta",
+                             json.dumps({"curIndex": 0, "numImages": 0}), "NX"))
+
+    block.payload = b"".join(commands)
+    block.questions = len(uids)
+    block.commands = len(commands)
+    block.bytes = len(block.payload)
+    block.sha256 = hashlib.sha256(block.payload).hexdigest()
+    block.sample = random.sample(uids, min(CHECK_SAMPLE, len(uids)))
+    return block
+
+
+def encode_all(entries: Sequence[dict], data_dir: Path, topic: str,
+               workers: int) -> Iterator[Block]:
+    """Blocks in catalogue order, encoded by *workers* processes."""
+    if workers <= 1:
+        for entry in entries:
+            yield encode_dataset(entry, str(data_dir), topic)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(encode_dataset, entries, [str(data_dir)] * len(entries),
+                            [topic] * len(entries), chunksize=4)
+
+
+# ── sinks ────────────────────────────────────────────────────────────────────
+def send_block(conn, block: Block) -> int:
+    """Write one block down a raw connection, read its replies; return error replies."""
+    conn.send_packed_command([block.payload], check_health=False)
+    errors = 0
+    for _ in range(block.commands):
+        try:
+            conn.read_response()
+        except redis.ResponseError:
+            errors += 1
+    return errors
+
+
+def verify(r: redis.Redis, blocks: Sequence[Block]) -> List[Tuple[str, str]]:
+    """(ds, problem) for every dataset whose stored keys disagree with what was sent."""
+    pipe = r.pipeline(transaction=False)
+    for block in blocks:
+        pipe.scard(f"v1:datasets:{block.dataset}")
+        pipe.exists(*[f"v1:datasets:{block.dataset}:{uid}" for uid in block.sample] or ["-"])
+    replies = pipe.execute()
+    problems = []
+    for i, block in enumerate(blocks):
+        scard, present = replies[2 * i], replies[2 * i + 1]
+        if scard != block.questions:
+            problems.append((block.dataset, f"SCARD {scard} ≠ {block.questions} sent"))
+        if block.sample and present != len(block.sample):
+            problems.append((block.dataset, f"{len(block.sample) - present} sampled question key(s) missing"))
+    return problems
+
+
+def derive(r: redis.Redis, datasets: Sequence[str]) -> None:
+    for ds in datasets:
+        store_ground_truth(r, ds)
+        publish(r, ds, "created")
+    rebuild_availability(r)
+
+
+def print_summary(blocks: Sequence[Block], seconds: float) -> None:
+    print(f"{'dataset':<32} {'questions':>9} {'bad':>5} {'no uid':>6} {'dup':>5} {'bytes':>11}  sha256")
+    for b in blocks:
+        note = f"  ({b.error})" if b.error else ""
+        print(f"{b.dataset:<32} {b.questions:>9,} {b.bad_json:>5} {b.missing_uid:>6} "
+              f"{b.duplicates:>5} {b.bytes:>11,}  {b.sha256[:12]}{note}")
+    total = sum(b.bytes for b in blocks)
+    print(f"  • {len(blocks)} dataset(s), {sum(b.questions for b in blocks):,} questions, "
+          f"{sum(b.commands for b in blocks):,} commands, {total / 1e6:.1f} MB "
+          f"in {seconds:.1f}s ({total / 1e6 / max(seconds, 1e-9):.1f} MB/s)")
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Bulk-load the dataset catalogue as a RESP stream.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--catalogue", type=Path, default=CATALOGUE)
+    parser.add_argument("--data-dir", type=Path, help="Dataset files (default: the catalogue's directory)")
+    parser.add_argument("--topic", default="", help="Campaign for catalogue entries without a topic")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--out", help="Write the RESP stream here ('-' = stdout) instead of loading it")
+    parser.add_argument("--no-derive", action="store_true",
+                        help="Skip ground truth / version events / availability after loading")
+    parser.add_argument("--summary", type=Path, help="Also write the integrity summary as JSON")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    entries = read_catalogue(args.catalogue)
+    data_dir = args.data_dir or args.catalogue.parent
+    started = time.monotonic()
+    blocks: List[Block] = []
+
+    if args.out:
+        sink: BinaryIO = sys.stdout.buffer if args.out == "-" else open(args.out, "wb")
+        try:
+            for block in encode_all(entries, data_dir, args.topic, args.workers):
+                sink.write(block.payload)
+                block.payload = b""
+                blocks.append(block)
+        finally:
+            if sink is not sys.stdout.buffer:
+                sink.close()
+        if args.out != "-":
+            print_summary(blocks, time.monotonic() - started)
+            print(f"Done – RESP stream written to {args.out}; load it with redis-cli --pipe.")
+        return
+
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    existing = r.smembers("v1:datasets")
+    wanted = []
+    for entry in entries:
+        ds = RENAME.get(entry["id"], entry["id"])
+        if ds in existing:
+            print(f"  • {ds}: already loaded – skipped")
+        else:
+            wanted.append(entry)
+
+    conn = r.connection_pool.make_connection()          # raw socket, same auth / db
+    errors = 0
+    try:
+        for block in encode_all(wanted, data_dir, args.topic, args.workers):
+            if block.payload:
+                errors += send_block(conn, block)
+            block.payload = b""
+            blocks.append(block)
+    finally:
+        conn.disconnect()
+    seconds = time.monotonic() - started
+
+    loaded = [b for b in blocks if not b.error]
+    problems = verify(r, loaded) if loaded else []
+    print_summary(blocks, seconds)
+    for ds, problem in problems:
+        print(f"  ✗ {ds}: {problem}")
+    if args.summary:
+        args.summary.write_text(json.dumps({
+            "seconds": round(seconds, 2), "errorReplies": errors, "problems": problems,
+            "datasets": [b.summary() for b in blocks]}, indent=2), encoding="utf-8")
+    if errors or problems:
+        sys.exit(f"{errors} error repl(y/ies), {len(problems)} count mismatch(es) – not deriving.")
+    if not args.no_derive:
+        derive(r, [b.dataset for b in loaded])
+    print(f"Done – {len(loaded)} dataset(s) loaded, counts verified.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,23 @@
+-- Record a settled campaign index in the meta's curIndex, never moving it back.
+-- Loaded by server.js commitCampaignIndex() and py/pregenerate_datasets.py.
+--
+-- KEYS[1] = v1:campaigns:<topic>:meta   JSON {curIndex, numImages, …}
+-- ARGV[1] = the index whose dataset was inserted (or skipped by the generator)
+--
+-- Only the curIndex member is rewritten; the rest of the JSON stays byte for
+-- byte (cjson.encode would turn empty arrays into {}), so a concurrent
+-- numImages change is never overwritten either. Returns 1 when curIndex moved.
+local raw = redis.call('GET', KEYS[1])
+if not raw then return 0 end
+local idx = tonumber(ARGV[1])
+local meta = cjson.decode(raw)
+if (tonumber(meta['curIndex']) or 0) > idx then return 0 end
+
+local member = '"curIndex":' .. (idx + 1)
+local updated, n = string.gsub(raw, '"curIndex"%s*:%s*[^,}]*', member, 1)
+if n == 0 then
+  local sep = next(meta) == nil and '' or ','
+  updated = string.gsub(raw, '^%s*{', '{' .. member .. sep, 1)
+end
+redis.call('SET', KEYS[1], updated)
+return 1
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+consistency_audit.py
+────────────────────
+Check the v1 invariants that drift over time and write a repair plan that
+can be reviewed and applied in batches.
+
+    questions    every uid in v1:datasets:<ds> has v1:datasets:<ds>:<uid>,
+                 and no question key exists for a uid outside the set
+    assignments  v1:assignments:<pid> ∋ ds  ⇔  v1:assignments:<ds> ∋ pid,
+                 and both only name known datasets (active or archived)
+    answers      v1:<pid>:<ds>:<uid> only for uids still in v1:datasets:<ds>
+                 (del_questions.py leftovers) and datasets that exist
+    campaigns    v1:campaigns:<topic> ⊆ v1:datasets ∪ v1:archived, and every
+                 dataset is in the campaign its meta names
+
+Membership is tested with SMISMEMBER pipelines and a Lua helper that checks
+existence for a chunk of question keys (passed as KEYS) in one call; the only SCAN (answers and
+orphan question keys) is one paced pass over `v1:*` (latency_scan).
+
+The plan is JSON Lines, one idempotent operation per line:
+
+    {"check": "answers", "op": "unlink_answer", "key": "v1:p:ds:u", "set": "v1:datasets:ds",
+     "member": "u", "dataset": "ds", "uid": "u", "reason": "uid not in dataset"}
+    {"check": "assignments", "op": "sadd", "key": "v1:assignments:p", "members": ["ds"], …}
+
+`unlink_unless_member` and `unlink_answer` run as Lua guards, so an answer
+whose uid was re-added after the audit survives; `unlink_answer` also takes
+the answer out of v1:rcount:<ds> and v1:progress:<ds> in the same call.
+Applying publishes invalidation events, refreshes the availability index for
+the datasets it touched and rebuilds the adjudication view rows of removed
+answers.
+
+Run:
+    python py/consistency_audit.py [--plan repair.jsonl]
+    python py/consistency_audit.py --apply repair.jsonl [--batch 500] [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+import redis
+
+from adjudication_view import refresh_dataset as refresh_adjudications
+from availability import refresh_users, track
+from invalidation import publish
+from latency_scan import AdaptiveScanner
+from progress import progress_key
+from redis_memory import classify
+from response_counts import rcount_key
+
+REDIS_URL  = "redis://localhost:6397/0"
+CHUNK      = 1_000
+BATCH_SIZE = 500
+
+# KEYS = keys to check → the ones that do not exist
+MISSING_KEYS_LUA = """
+local missing = {}
+for i = 1, #KEYS do
+  if redis.call('EXISTS', KEYS[i]) == 0 then
+    missing[#missing + 1] = KEYS[i]
+  end
+end
+return missing
+"""
+
+# KEYS[1] = key to drop, KEYS[2] = set; drop only while ARGV[1] is not a member
+UNLINK_UNLESS_MEMBER_LUA = """
+if redis.call('SISMEMBER', KEYS[2], ARGV[1]) == 1 then
+  return 0
+end
+return redis.call('UNLINK', KEYS[1])
+"""
+
+# KEYS[1] = answer, KEYS[2] = set, KEYS[3] = v1:rcount:<ds>, KEYS[4] = v1:progress:<ds>
+# ARGV[1] = member, ARGV[2] = uid, ARGV[3] = pid
+# like UNLINK_UNLESS_MEMBER_LUA, and takes the answer out of the counters with it
+UNLINK_ANSWER_LUA = """
+if redis.call('SISMEMBER', KEYS[2], ARGV[1]) == 1 then
+  return 0
+end
+if redis.call('UNLINK', KEYS[1]) == 0 then
+  return 0
+end
+if redis.call('HINCRBY', KEYS[3], ARGV[2], -1) <= 0 then
+  redis.call('HDEL', KEYS[3], ARGV[2])
+end
+local field = ARGV[3] .. ':answered'
+if redis.call('HEXISTS', KEYS[4], field) == 1 and redis.call('HINCRBY', KEYS[4], field, -1) < 0 then
+  redis.call('HSET', KEYS[4], field, 0)
+end
+return 1
+"""
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def op(check: str, name: str, key: str, reason: str, **extra) -> dict:
+    return {"check": check, "op": name, "key": key, **extra, "reason": reason}
+
+
+def _chunks(items: Sequence, size: int = CHUNK) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _smembers_all(r: redis.Redis, keys: Sequence[str]) -> List[Set[str]]:
+    out: List[Set[str]] = []
+    for chunk in _chunks(keys):
+        pipe = r.pipeline(transaction=False)
+        for key in chunk:
+            pipe.smembers(key)
+        out.extend({to_str(m) for m in members} for members in pipe.execute())
+    return out
+
+
+def _not_members(r: redis.Redis, key: str, candidates: Sequence[str]) -> List[str]:
+    """Candidates that are not in set *key*, via SMISMEMBER in chunks."""
+    missing: List[str] = []
+    for chunk in _chunks(list(candidates)):
+        missing.extend(c for c, hit in zip(chunk, r.smismember(key, chunk)) if not hit)
+    return missing
+
+
+# ── checks ───────────────────────────────────────────────────────────────────
+def check_questions(r: redis.Redis, datasets: Sequence[str],
+                    question_keys: Dict[str, List[str]]) -> List[dict]:
+    missing_keys = r.register_script(MISSING_KEYS_LUA)
+    plan: List[dict] = []
+    for ds, uids in zip(datasets, _smembers_all(r, [f"v1:datasets:{ds}" for ds in datasets])):
+        prefix = f"v1:datasets:{ds}:"
+        for chunk in _chunks(sorted(uids)):
+            gone = missing_keys(keys=[prefix + uid for uid in chunk])
+            if gone:
+                plan.append(op("questions", "srem", f"v1:datasets:{ds}", "uid without question key",
+                               members=sorted(to_str(k)[len(prefix):] for k in gone), dataset=ds))
+        for uid in _not_members(r, f"v1:datasets:{ds}", question_keys.get(ds, [])):
+            plan.append(op("questions", "unlink_unless_member", f"v1:datasets:{ds}:{uid}",
+                           "question key for a uid outside the set",
+                           set=f"v1:datasets:{ds}", member=uid, dataset=ds))
+    return plan
+
+
+def check_assignments(r: redis.Redis, known: Set[str], pids: Sequence[str]) -> List[dict]:
+    plan: List[dict] = []
+    datasets = sorted(known)
+    by_ds = dict(zip(datasets, _smembers_all(r, [f"v1:assignments:{ds}" for ds in datasets])))
+    pids = sorted(set(pids) | {pid for members in by_ds.values() for pid in members})
+    by_pid = dict(zip(pids, _smembers_all(r, [f"v1:assignments:{pid}" for pid in pids])))
+
+    for pid, assigned in by_pid.items():
+        stale = sorted(assigned - known)
+        if stale:
+            plan.append(op("assignments", "srem", f"v1:assignments:{pid}",
+                           "assigned dataset does not exist", members=stale))
+        one_sided = sorted(ds for ds in assigned & known if pid not in by_ds[ds])
+        for ds in one_sided:
+            plan.append(op("assignments", "sadd", f"v1:assignments:{ds}",
+                           f"v1:assignments:{pid} lists {ds}", members=[pid], dataset=ds))
+    for ds, members in by_ds.items():
+        for pid in sorted(members):
+            if ds not in by_pid.get(pid, set()):
+                plan.append(op("assignments", "sadd", f"v1:assignments:{pid}",
+                               f"v1:assignments:{ds} lists {pid}", members=[ds], dataset=ds))
+    return plan
+
+
+def check_answers(r: redis.Redis, active: Set[str], archived: Set[str],
+                  answers: Dict[str, List[Tuple[str, str]]]) -> List[dict]:
+    plan: List[dict] = []
+    for ds, entries in sorted(answers.items()):
+        if ds in archived:
+            continue                                # cold tier keeps its own copy
+        if ds not in active:
+            plan += [op("answers", "unlink_answer", key, "answer to a dataset that does not exist",
+                        set="v1:datasets", member=ds, dataset=ds, uid=uid)
+                     for key, uid in entries]
+            continue
+        keys_by_uid: Dict[str, List[str]] = defaultdict(list)
+        for key, uid in entries:
+            keys_by_uid[uid].append(key)
+        for uid in _not_members(r, f"v1:datasets:{ds}", sorted(keys_by_uid)):
+            plan += [op("answers", "unlink_answer", key, "uid not in dataset",
+                        set=f"v1:datasets:{ds}", member=uid, dataset=ds, uid=uid)
+                     for key in keys_by_uid[uid]]
+    return plan
+
+
+def check_campaigns(r: redis.Redis, known: Set[str], active: Sequence[str]) -> List[dict]:
+    plan: List[dict] = []
+    topics = sorted({to_str(k)[len("v1:campaigns:"):-len(":meta")]
+                     for k in r.scan_iter(match="v1:campaigns:*:meta", count=CHUNK)})
+    members = dict(zip(topics, _smembers_all(r, [f"v1:campaigns:{t}" for t in topics])))
+    for topic, datasets in members.items():
+        stale = sorted(datasets - known)
+        if stale:
+            plan.append(op("campaigns", "srem", f"v1:campaigns:{topic}",
+                           "campaign lists a dataset that does not exist", members=stale))
+
+    metas = []
+    for chunk in _chunks(list(active)):
+        metas.extend(r.mget([f"v1:datasets:{ds}:meta" for ds in chunk]))
+    for ds, raw in zip(active, metas):
+        try:
+            topic = (json.loads(raw).get("topic") or "").strip() if raw else ""
+        except (json.JSONDecodeError, AttributeError):
+            topic = ""
+        if topic and ds not in members.get(topic, set()):
+            plan.append(op("campaigns", "sadd", f"v1:campaigns:{topic}",
+                           f"meta of {ds} names this campaign", members=[ds], dataset=ds))
+    return plan
+
+
+def scan_keys(r: redis.Redis, known: frozenset) -> Tuple[Dict[str, List[str]],
+                                                         Dict[str, List[Tuple[str, str]]], str]:
+    """One paced pass: question key uids and answer keys, per dataset."""
+    scanner = AdaptiveScanner(r)
+    questions: Dict[str, List[str]] = defaultdict(list)
+    answers: Dict[str, List[Tuple[str, str]]] = defaultdict(list)
+    for raw in scanner.scan_iter(match="v1:*"):
+        key = to_str(raw)
+        family, ds, _ = classify(key, known)
+        if family == "question":
+            questions[ds].append(key.split(":", 3)[3])
+        elif family == "answer":
+            answers[ds].append((key, key.split(":", 3)[3]))
+    return questions, answers, scanner.report()
+
+
+def audit(r: redis.Redis) -> Tuple[List[dict], str]:
+    active = sorted(to_str(d) for d in r.smembers("v1:datasets"))
+    archived = {to_str(d) for d in r.smembers("v1:archived")}
+    known = set(active) | archived
+    pids = [to_str(p) for p in r.smembers("v1:usernames")]
+    question_keys, answers, scan_report = scan_keys(r, frozenset(known))
+    plan = (check_questions(r, active, question_keys)
+            + check_assignments(r, known, pids)
+            + check_answers(r, set(active), archived, answers)
+            + check_campaigns(r, known, active))
+    return plan, scan_report
+
+
+# ── repair ───────────────────────────────────────────────────────────────────
+# check → invalidation event published for every dataset its operations changed
+EVENTS = {"questions": "questions", "assignments": "assignments"}
+
+
+def apply_plan(r: redis.Redis, entries: Iterable[dict], batch: int = BATCH_SIZE,
+               dry_run: bool = False) -> Counter:
+    guarded = r.register_script(UNLINK_UNLESS_MEMBER_LUA)
+    unlink_answer = r.register_script(UNLINK_ANSWER_LUA)
+    scanner = AdaptiveScanner(r)
+    done: Counter = Counter()
+    touched: Dict[str, Set[str]] = defaultdict(set)
+    removed_uids: Dict[str, Set[str]] = defaultdict(set)   # ds → uids whose answers went
+    pending: List[dict] = []
+
+    def flush() -> None:
+        if dry_run:
+            for entry in pending:
+                done[f"{entry['check']}:{entry['op']}"] += 1
+            pending.clear()
+            return
+        pipe = r.pipeline(transaction=False)
+        for entry in pending:
+            if entry["op"] == "srem":
+                pipe.srem(entry["key"], *entry["members"])
+            elif entry["op"] == "sadd":
+                pipe.sadd(entry["key"], *entry["members"])
+            elif entry["op"] == "unlink_unless_member":
+                guarded(keys=[entry["key"], entry["set"]], args=[entry["member"]], client=pipe)
+            elif entry["op"] == "unlink_answer":
+                ds = entry["dataset"]
+                unlink_answer(keys=[entry["key"], entry["set"], rcount_key(ds), progress_key(ds)],
+                              args=[entry["member"], entry["uid"], entry["key"].split(":", 2)[1]],
+                              client=pipe)
+            else:
+                raise ValueError(f"unknown op {entry['op']!r}")
+        for entry, result in zip(pending, scanner.execute(pipe)):
+            done[f"{entry['check']}:{entry['op']}"] += int(bool(result))
+            if result and entry.get("dataset"):
+                touched[entry["check"]].add(entry["dataset"])
+            if result and entry["op"] == "unlink_answer":
+                removed_uids[entry["dataset"]].add(entry["uid"])
+        pending.clear()
+
+    for entry in entries:
+        pending.append(entry)
+        if len(pending) >= batch:
+            flush()
+    if pending:
+        flush()
+
+    for check, datasets in touched.items():
+        for ds in sorted(datasets):
+            if check in EVENTS:
+                publish(r, ds, EVENTS[check])
+            if check in ("assignments", "campaigns"):
+                track(r, ds)
+            if check == "assignments":
+                refresh_users(r, ds)
+    for ds, uids in sorted(removed_uids.items()):
+        refresh_adjudications(r, ds, uids)      # rows showing a removed answer
+    return done
+
+
+def read_plan(path: Path) -> Iterator[dict]:
+    with path.open(encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Audit v1 invariants and apply repair plans.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--plan", type=Path, help="Write the repair plan (JSON Lines) here")
+    parser.add_argument("--apply", type=Path, metavar="PLAN", help="Apply a repair plan")
+    parser.add_argument("--batch", type=int, default=BATCH_SIZE, help="Operations per pipeline")
+    parser.add_argument("--dry-run", action="store_true", help="With --apply: only count operations")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+
+    if args.apply:
+        done = apply_plan(r, read_plan(args.apply), args.batch, args.dry_run)
+        for name, n in sorted(done.items()):
+            print(f"  • {name}: {n}")
+        verb = "would apply" if args.dry_run else "applied"
+        print(f"Done – {verb} {sum(done.values())} operation(s) from {args.apply}.")
+        return
+
+    plan, scan_report = audit(r)
+    by_check = Counter(entry["check"] for entry in plan)
+    for check in ("questions", "assignments", "answers", "campaigns"):
+        print(f"  • {check:<12} {by_check.get(check, 0):>7} repair(s)")
+    print(f"  • {scan_report}")
+    if args.plan:
+        with args.plan.open("w", encoding="utf-8") as fh:
+            for entry in plan:
+                fh.write(json.dumps(entry) + "\n")
+        print(f"Done – {len(plan)} operation(s) written to {args.plan}.")
+    else:
+        for entry in plan[:20]:
+            print(json.dumps(entry))
+        more = " (first 20 shown; use --plan to save all)" if len(plan) > 20 else ""
+        print(f"Done – {len(plan)} operation(s){more}.")
+    if plan:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
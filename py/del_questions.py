@@ -1,9 +1,9 @@
 #!/usr/bin/env python3
 """
-delete_dataset.py  –  wipe a whole dataset *and* every user response to it.
+del_questions.py  –  remove questions from a dataset *and* every user response to them.
 
 Usage:
-    python delete_dataset.py <dataset-id>
+    python py/survey.py del-questions <dataset-id> <uid> [<uid> …] [--yes]
 
 Safety nets
 -----------
@@ -11,7 +11,7 @@ Safety nets
 * Uses SCAN + pipeline so it can handle millions of keys without blocking Redis.
 """
 
-import sys, redis, json, requests
+import sys, redis, json
 from tqdm import tqdm                     # pip install tqdm (nice progress bar)
 
 REDIS_URL   = "redis://localhost:6397/0"
@@ -22,7 +22,15 @@ BATCH_SIZE  = 5_000                       # pipeline flush size
 # delete uids from v1:<user_name>:<ds>:<uid>
 # delete uids from v1:datasets:<ds>:<uid>
 
-def main(ds: str, uids: list) -> None:
+def main(ds: str, uids: list, confirm: bool = True) -> dict:
+    from adjudication_view import refresh_dataset
+    from answered_bitmaps import rebuild
+    from build_question_bundles import build_bundle
+    from ground_truth import gt_key
+    from invalidation import publish
+    from progress import refresh
+    from response_counts import rcount_key
+
     r = redis.Redis.from_url(REDIS_URL, decode_responses=False)
 
     # ── gather auxiliary info (topic, assigned users) ─────────────────
@@ -53,9 +61,9 @@ def main(ds: str, uids: list) -> None:
     print(f"Users    : {len(assigned_users)}")
     print(assigned_users)
     print(f"Redis keys to delete: {len(keys_to_del):,}")
-    if input("Proceed? [y/N] ").strip().lower() != "y":
+    if confirm and input("Proceed? [y/N] ").strip().lower() != "y":
         print("Aborted.")
-        return
+        return {"dataset": ds, "aborted": True}
 
     # ── delete keys in batches ----------------------------------------
     with r.pipeline() as pipe:
@@ -72,21 +80,18 @@ def main(ds: str, uids: list) -> None:
     pipe = r.pipeline()
     for uid in uids:
         pipe.srem(f"v1:datasets:{ds}", uid)
+        pipe.hdel(rcount_key(ds), uid)
+        pipe.hdel(gt_key(ds), uid)
     pipe.execute()
 
+    refresh(r, ds)
+    rebuild(r, ds)                      # question positions have moved
+    refresh_dataset(r, ds, uids)
+    publish(r, ds, "questions", uids)
+    build_bundle(r, ds)
     print("Finished – uids and all responses removed.")
+    return {"dataset": ds, "questions": len(uids), "deletedKeys": len(keys_to_del)}
 
 if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        ds_id = "UrbanAccuracy"
-        uids = ['f1568c56-3fac-4aaf-bd9f-5804f990f472',
- 'd87462e1-8dcd-4293-9074-0084eee7467b',
- 'e662cff1-8b21-439f-b540-2919ee72a3d5',
- '60800084-f808-4876-b086-b73df98afe2a',
- '3b6440fd-da92-4f08-b0a6-46565f3eb2d9']
-
-    elif len(sys.argv) != 3:
-        sys.exit("usage: delete_dataset.py <dataset-id> <uids>")
-    else:
-        ds_id = sys.argv[1]
-    main(ds_id, uids)
+    from survey import main as survey
+    sys.exit(survey(["del-questions", *sys.argv[1:]]))
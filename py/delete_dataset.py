@@ -3,7 +3,7 @@
 delete_dataset.py  –  wipe a whole dataset *and* every user response to it.
 
 Usage:
-    python delete_dataset.py <dataset-id>
+    python py/survey.py delete-dataset <dataset-id> [--yes]
 
 Safety nets
 -----------
@@ -11,7 +11,7 @@ Safety nets
 * Uses SCAN + pipeline so it can handle millions of keys without blocking Redis.
 """
 
-import sys, redis, json, requests
+import sys, redis, json
 from tqdm import tqdm                     # pip install tqdm (nice progress bar)
 
 REDIS_URL   = "redis://localhost:6397/0"
@@ -20,6 +20,7 @@ BATCH_SIZE  = 5_000                       # pipeline flush size
 
 def notify_server_delete(ds_id: str) -> None:
     """Call DELETE /admin/dataset/:id so server globals stay in sync."""
+    import requests                     # only needed here; keeps CLI start-up fast
     try:
         r = requests.delete(f"{SERVER_URL}/admin/dataset/{ds_id}", timeout=5)
         if r.status_code in (200, 404):
@@ -30,7 +31,15 @@ def notify_server_delete(ds_id: str) -> None:
     except requests.RequestException as e:
         print(f"Could not reach the server at {SERVER_URL}: {e}")
 
-def main(ds: str) -> None:
+def main(ds: str, confirm: bool = True) -> dict:
+    from adjudication_view import refresh_dataset
+    from availability import untrack
+    from build_question_bundles import remove_bundle
+    from ground_truth import gt_key
+    from invalidation import publish
+    from progress import progress_key
+    from response_counts import rcount_key
+
     r = redis.Redis.from_url(REDIS_URL, decode_responses=False)
 
     # ── gather auxiliary info (topic, assigned users) ─────────────────
@@ -50,6 +59,9 @@ def main(ds: str) -> None:
         f"v1:datasets:{ds}",
         f"v1:datasets:{ds}:meta",
         f"v1:assignments:{ds}",           # user list for this ds
+        progress_key(ds),                 # materialized status counters
+        rcount_key(ds),                   # per-question response counters
+        gt_key(ds),                       # extracted ground truth
     ])
     # question objects
     for uid in r.smembers(f"v1:datasets:{ds}"):
@@ -84,9 +96,9 @@ def main(ds: str) -> None:
     print(assigned_users)
     print(f"Redis keys to delete: {len(keys_to_del):,}")
     print(keys_to_del)
-    if input("Proceed? [y/N] ").strip().lower() != "y":
+    if confirm and input("Proceed? [y/N] ").strip().lower() != "y":
         print("Aborted.")
-        return
+        return {"dataset": ds, "aborted": True}
 
     # ── delete keys in batches ----------------------------------------
     with r.pipeline() as pipe:
@@ -108,15 +120,15 @@ def main(ds: str) -> None:
     if topic:                                  # campaign’s dataset list
         pipe.srem(f"v1:campaigns:{topic}", ds)
     pipe.execute()
+    untrack(r, ds, topic, assigned_users)
 
-    notify_server_delete(ds_id)
+    refresh_dataset(r, ds)                 # rows swept above; re-derive what the sets still list
+    publish(r, ds, "deleted")
+    remove_bundle(ds)
+    notify_server_delete(ds)
     print("Finished – dataset and all responses removed.")
+    return {"dataset": ds, "deletedKeys": len(keys_to_del)}
 
 if __name__ == "__main__":
-    if len(sys.argv) == 1:
-        ds_id = "Urban_1"
-    elif len(sys.argv) != 2:
-        sys.exit("usage: delete_dataset.py <dataset-id>")
-    else:
-        ds_id = sys.argv[1]
-    main(ds_id)
+    from survey import main as survey
+    sys.exit(survey(["delete-dataset", *sys.argv[1:]]))
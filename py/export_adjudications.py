@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+export_adjudications.py
+───────────────────────
+Incrementally export resolved adjudications (`v1:past_adjudications`) into a
+persistent git worktree of the annotations repository.
+
+Each run
+  • reads the ids already exported from `<out-dir>/exported_ids.txt`,
+  • fetches only the *new* answers with one pipelined MGET, plus question
+    objects and dataset meta with one MGET per dataset (cached per run),
+  • writes them to `<out-dir>/<timestamp>.jsonl` in the same shape
+    exportAdjudication.js produced (answer + question/label/map/questionData
+    + datasetMeta),
+  • commits the new file together with the updated id list and pushes.
+
+The worktree is cloned once and then only fast-forwarded, so nothing is
+re-cloned or re-exported. Any git remote works, including a local bare repo:
+
+    git init --bare /tmp/mapqa.git
+    python py/export_adjudications.py --remote /tmp/mapqa.git --worktree /tmp/mapqa
+
+Run:
+    python py/export_adjudications.py [--no-push] [--dry-run]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import redis
+
+from archive_datasets import read_entry
+
+REDIS_URL    = "redis://localhost:6397/0"
+REMOTE_URL   = "https://github.com/Scuwr/mapqa.git"
+WORKTREE     = Path("/storage/cmarnold/projects/maps/mapqa-export")
+EXPORT_SUBDIR = "survey-responses/annotations/adjudicated"
+IDS_FILE     = "exported_ids.txt"
+BATCH_SIZE   = 5_000
+
+
+def to_str(value) -> str:
+    if value is None:
+        return ""
+    if isinstance(value, bytes):
+        return value.decode("utf-8", "replace")
+    return str(value)
+
+
+def parse_json(raw) -> Optional[dict]:
+    if not raw:
+        return None
+    try:
+        obj = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+# ── git worktree ─────────────────────────────────────────────────────────────
+def git(worktree: Path, *args: str) -> str:
+    result = subprocess.run(
+        ["git", "-C", str(worktree), *args],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or f"git {args[0]} failed")
+    return result.stdout
+
+
+def has_commits(worktree: Path) -> bool:
+    return subprocess.run(
+        ["git", "-C", str(worktree), "rev-parse", "--verify", "-q", "HEAD"],
+        capture_output=True,
+    ).returncode == 0
+
+
+def prepare_worktree(worktree: Path, remote: str, pull: bool = True) -> None:
+    """Clone on first use; afterwards just fast-forward to the remote."""
+    if not (worktree / ".git").exists():
+        worktree.parent.mkdir(parents=True, exist_ok=True)
+        git(worktree.parent, "clone", "--quiet", remote, str(worktree))
+        return
+    if pull and has_commits(worktree) and git(worktree, "remote").strip():
+        git(worktree, "pull", "--ff-only", "--quiet")
+
+
+def commit_export(worktree: Path, paths: Sequence[Path], message: str, push: bool) -> None:
+    git(worktree, "add", "--", *(str(p.relative_to(worktree)) for p in paths))
+    git(worktree, "commit", "--quiet", "-m", message)
+    if push and git(worktree, "remote").strip():
+        git(worktree, "push", "--quiet", "-u", "origin", "HEAD")
+
+
+def load_exported_ids(path: Path) -> Set[str]:
+    if not path.exists():
+        return set()
+    with path.open(encoding="utf-8") as fh:
+        return {line.strip() for line in fh if line.strip()}
+
+
+# ── redis ────────────────────────────────────────────────────────────────────
+def fetch_records(r: redis.Redis, ids: List[str]) -> List[dict]:
+    """Answer + question + dataset meta for every id, all via MGET."""
+    parsed: List[Tuple[str, str, str, str]] = []
+    for adj_id in ids:
+        parts = adj_id.split(":")
+        if len(parts) < 3:
+            continue
+        pid, dataset, uid = parts[0], parts[1], ":".join(parts[2:])
+        parsed.append((adj_id, pid, dataset, uid))
+
+    answers: Dict[str, Optional[dict]] = {}
+    for start in range(0, len(parsed), BATCH_SIZE):
+        chunk = parsed[start:start + BATCH_SIZE]
+        values = r.mget([f"v1:{pid}:{ds}:{uid}" for _, pid, ds, uid in chunk])
+        for (adj_id, *_), raw in zip(chunk, values):
+            answers[adj_id] = parse_json(raw)
+
+    uids_by_ds: Dict[str, Set[str]] = defaultdict(set)
+    for _, _, ds, uid in parsed:
+        uids_by_ds[ds].add(uid)
+
+    question_cache: Dict[Tuple[str, str], Optional[dict]] = {}
+    for ds, uids in uids_by_ds.items():
+        ordered = sorted(uids)
+        for start in range(0, len(ordered), BATCH_SIZE):
+            chunk = ordered[start:start + BATCH_SIZE]
+            values = r.mget([f"v1:datasets:{ds}:{uid}" for uid in chunk])
+            for uid, raw in zip(chunk, values):
+                question_cache[(ds, uid)] = parse_json(raw)
+
+    datasets = sorted(uids_by_ds)
+    meta_cache: Dict[str, Optional[dict]] = {}
+    if datasets:
+        values = r.mget([f"v1:datasets:{ds}:meta" for ds in datasets])
+        meta_cache = {ds: parse_json(raw) for ds, raw in zip(datasets, values)}
+
+    # archived datasets (py/archive_datasets.py): read through the meta stub
+    for ds in datasets:
+        entry = (meta_cache.get(ds) or {}).pop("archived", None)
+        if entry is None:
+            continue
+        doc = read_entry(entry)
+        for adj_id, pid, dataset, uid in parsed:
+            if dataset != ds:
+                continue
+            if answers.get(adj_id) is None:
+                answers[adj_id] = parse_json(doc["answers"].get(pid, {}).get(uid))
+            if question_cache.get((ds, uid)) is None:
+                question_cache[(ds, uid)] = parse_json(doc["questions"].get(uid))
+
+    records: List[dict] = []
+    for adj_id, pid, dataset, uid in parsed:
+        obj = answers.get(adj_id)
+        if obj is None:
+            continue
+        obj["prolificID"] = pid
+        obj["dataset"] = dataset
+        obj["uid"] = uid
+        q = question_cache.get((dataset, uid))
+        if q is not None:
+            obj["question"] = q.get("Question") or q.get("question") or ""
+            obj["label"] = q.get("Label") or ""
+            obj["map"] = q.get("Map") or q.get("map") or ""
+            obj["questionData"] = q
+        meta = meta_cache.get(dataset)
+        if meta is not None:
+            obj["datasetMeta"] = meta
+        records.append(obj)
+    return records
+
+
+def export(
+    r: redis.Redis,
+    worktree: Path,
+    remote: str,
+    push: bool = True,
+    dry_run: bool = False,
+) -> Tuple[int, Optional[Path]]:
+    """Export new adjudications; return (count, written file or None)."""
+    prepare_worktree(worktree, remote, pull=not dry_run)
+    out_dir = worktree / EXPORT_SUBDIR
+    ids_path = out_dir / IDS_FILE
+    exported = load_exported_ids(ids_path)
+
+    all_ids = {to_str(i) for i in r.smembers("v1:past_adjudications")}
+    new_ids = sorted(all_ids - exported)
+    if not new_ids:
+        return 0, None
+
+    records = fetch_records(r, new_ids)
+    if dry_run:
+        return len(records), None
+
+    stamp = datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    stamp = stamp.replace(":", "-").replace(".", "-")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out_path: Optional[Path] = None
+    if records:
+        out_path = out_dir / f"{stamp}.jsonl"
+        with out_path.open("w", encoding="utf-8") as fh:
+            for obj in records:
+                fh.write(json.dumps(obj) + "\n")
+
+    # ids whose answer vanished are recorded too, so they are not retried forever
+    tmp_path = ids_path.with_suffix(".tmp")
+    with tmp_path.open("w", encoding="utf-8") as fh:
+        fh.writelines(f"{i}\n" for i in sorted(exported | set(new_ids)))
+    tmp_path.replace(ids_path)
+
+    changed = [ids_path] if out_path is None else [out_path, ids_path]
+    commit_export(worktree, changed, f"Export adjudicated questions {stamp}", push)
+    return len(records), out_path
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Export new adjudications into a persistent annotations worktree."
+    )
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--remote", default=REMOTE_URL,
+                        help=f"Git remote to clone on first run (default: {REMOTE_URL})")
+    parser.add_argument("--worktree", type=Path, default=WORKTREE,
+                        help=f"Persistent local clone (default: {WORKTREE})")
+    parser.add_argument("--no-push", action="store_true", help="Commit locally only")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Report how many adjudications would be exported")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=False)
+    count, path = export(r, args.worktree, args.remote,
+                         push=not args.no_push, dry_run=args.dry_run)
+    if not count:
+        print("No new adjudications to export.")
+    elif path is None:
+        print(f"{count} new adjudications would be exported.")
+    else:
+        print(f"Exported {count} adjudications to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -30,6 +30,11 @@ import json, time, sys, redis
 from tqdm import tqdm
 from typing import Any, Dict
 
+from adjudication_view import refresh_dataset
+from ground_truth import BASELINE_PID, store as store_ground_truth
+from latency_scan import AdaptiveScanner
+from progress import refresh
+
 # ──────────────────────────────────────────────────────────────────────────
 REDIS_URL   = "redis://localhost:6397/0"
 BATCH_SIZE  = 5_000
@@ -80,6 +85,7 @@ def transform(old: Dict[str, Any]) -> Dict[str, Any]:
 
 def main() -> None:
     r = redis.Redis.from_url(REDIS_URL, decode_responses=False)
+    scanner = AdaptiveScanner(r)                 # paced to stay out of annotators' way
 
     # 1. Grab every known user
     pids = r.smembers(USER_SET)
@@ -87,6 +93,8 @@ def main() -> None:
         print("No pids found in v1:usernames."); return
 
     total_processed = 0
+    touched: set[str] = set()                    # datasets whose timestamps may change
+    baselines: set[str] = set()                  # datasets whose ground-truth baseline changed
 
     with r.pipeline() as pipe:
         pending = 0
@@ -94,34 +102,43 @@ def main() -> None:
             pid = pid_b.decode() if isinstance(pid_b, bytes) else pid_b
             pattern = f"v1:{pid}:*:*"            # answers + markers
 
-            for key in r.scan_iter(match=pattern, count=10_000):
+            for batch in scanner.scan_batches(match=pattern):
                 # Skip submission markers
-                if key.endswith(META_SUFFIX):
-                    continue
-
-                raw = r.get(key)
-                if not raw:
-                    continue
-
-                try:
-                    obj       = json.loads(raw)
-                    upgraded  = transform(obj)   # may raise ValueError
-                except ValueError as ve:
-                    print(f"\n❌  {key.decode()}: {ve}", file=sys.stderr)
-                    sys.exit(1)
-                except Exception as exc:
-                    print(f"\n⚠️  Bad JSON in {key!r}: {exc}", file=sys.stderr)
-                    continue
-
-                pipe.set(key, json.dumps(upgraded))
-                pending += 1; total_processed += 1
-
-                if pending >= BATCH_SIZE:
-                    pipe.execute(); pending = 0
+                keys = [k for k in batch if not k.endswith(META_SUFFIX)]
+                for key, raw in zip(keys, scanner.mget(keys)):
+                    if not raw:
+                        continue
+
+                    try:
+                        obj       = json.loads(raw)
+                        upgraded  = transform(obj)   # may raise ValueError
+                    except ValueError as ve:
+                        print(f"\n❌  {key.decode()}: {ve}", file=sys.stderr)
+                        sys.exit(1)
+                    except Exception as exc:
+                        print(f"\n⚠️  Bad JSON in {key!r}: {exc}", file=sys.stderr)
+                        continue
+
+                    pipe.set(key, json.dumps(upgraded))
+                    pending += 1; total_processed += 1
+                    ds = key.decode().split(":")[2]
+                    touched.add(ds)
+                    if pid == BASELINE_PID:
+                        baselines.add(ds)
+
+                    if pending >= BATCH_SIZE:
+                        scanner.execute(pipe)
+                        pending = 0
 
         if pending:
-            pipe.execute()
-
+            scanner.execute(pipe)
+
+    for ds in tqdm(sorted(touched), desc="Progress"):
+        refresh(r, ds)
+        refresh_dataset(r, ds)
+    for ds in sorted(baselines):
+        store_ground_truth(r, ds)
+    print(f"  • {scanner.report()}")
     print(f"Done – normalised {total_processed:,} answers.")
 
 
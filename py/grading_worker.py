@@ -0,0 +1,392 @@
+#!/usr/bin/env python3
+"""
+grading_worker.py
+─────────────────
+Grading daemon fed by a Redis Stream, so dataset submissions no longer fork
+grade_dataset.py / add_eval.py inside the HTTP request.
+
+Jobs are appended by server.js (or `--enqueue-urban`) to
+
+    v1:grading:jobs       XADD  pid, dataset, enqueued (epoch ms)[, notify=1]
+
+and consumed through the `graders` consumer group. Each daemon runs at most
+--workers jobs at a time and only reads as many entries as it has free slots,
+so a burst of submissions queues in Redis instead of spawning interpreters.
+
+A job is
+  1. graded with grade_dataset.py (last stdout line: {"accuracy", "eval_file"}),
+  2. applied with `survey.py add-eval` when an eval file is returned,
+  3. stored in `v1:<pid>:<ds>:meta`,
+  4. for jobs with notify=1 (the ones /run-python enqueues for a submission),
+     reported to the server (POST /admin/graded), which hands out the next
+     dataset only on a pass (Training, or accuracy ≥ 0.85) – regrades queued
+     with --enqueue-urban never notify,
+and only then XACKed (and XDELed). Step 3 records the accuracy in
+`v1:grading:graded` for the job, so a retry after a failed notification only
+repeats the notification, not the grader and add-eval. A job that fails stays pending; every
+--claim-interval seconds entries idle for longer than --min-idle are taken over
+with XAUTOCLAIM and retried. After MAX_DELIVERIES attempts the job is moved
+to `v1:grading:dead` together with its last error. Losing Redis does not stop
+the daemon: reads back off and reconnect, and a job whose bookkeeping fails
+stays pending until it is reclaimed.
+
+Metrics live in `v1:grading:metrics` (counters) and `v1:grading:latency`
+(last LATENCY_SAMPLES enqueue→meta latencies, ms); `--stats` prints queue
+depth, pending count, oldest job age and latency percentiles as JSON.
+
+Run:
+    python py/grading_worker.py --workers 4           # daemon
+    python py/grading_worker.py --enqueue-urban [--force]
+    python py/grading_worker.py --stats
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import socket
+import subprocess
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import redis
+import requests
+
+from availability import open_key
+
+REDIS_URL       = "redis://localhost:6397/0"
+SERVER_URL      = "http://localhost:3000"
+PYTHON_BIN      = "/storage/cmarnold/shared/conda/envs/ml/bin/python"
+PYTHON_ROOT     = "/storage/cmarnold/projects/maps"
+GRADE_DATASET   = "/storage/cmarnold/projects/maps/SurveyBridge/grade_dataset.py"
+SURVEY_PYTHON   = "/storage/cmarnold/shared/conda/envs/map-survey/bin/python"
+SURVEY_ROOT     = "/storage/cmarnold/projects/map-survey"
+SURVEY_CLI      = "/storage/cmarnold/projects/map-survey/py/survey.py"
+
+STREAM          = "v1:grading:jobs"
+GROUP           = "graders"
+DEAD_STREAM     = "v1:grading:dead"
+METRICS_KEY     = "v1:grading:metrics"
+LATENCY_KEY     = "v1:grading:latency"
+ERRORS_KEY      = "v1:grading:errors"
+GRADED_KEY      = "v1:grading:graded"       # job id → accuracy, until the job is acked
+LATENCY_SAMPLES = 1_000
+MAX_DELIVERIES  = 5
+BLOCK_MS        = 5_000
+MAX_BACKOFF_S   = 30.0
+
+
+# ── jobs ─────────────────────────────────────────────────────────────────────
+def enqueue(r: redis.Redis, pid: str, dataset: str, notify: bool = False) -> str:
+    fields = {"pid": pid, "dataset": dataset, "enqueued": str(int(time.time() * 1000))}
+    if notify:
+        fields["notify"] = "1"
+    return r.xadd(STREAM, fields)
+
+
+def enqueue_urban(r: redis.Redis, force: bool = False) -> int:
+    """Queue every assigned Urban (pid, dataset) that has no meta yet."""
+    datasets = sorted(d for d in r.smembers("v1:datasets") if d.lower().startswith("urban"))
+    queued = 0
+    for dataset in datasets:
+        for pid in sorted(r.smembers(f"v1:assignments:{dataset}")):
+            if not force and r.exists(f"v1:{pid}:{dataset}:meta"):
+                continue
+            enqueue(r, pid, dataset)
+            queued += 1
+    return queued
+
+
+def ensure_group(r: redis.Redis) -> None:
+    try:
+        r.xgroup_create(STREAM, GROUP, id="0", mkstream=True)
+    except redis.ResponseError as exc:
+        if "BUSYGROUP" not in str(exc):
+            raise
+
+
+# ── grading ──────────────────────────────────────────────────────────────────
+def run_grade(pid: str, dataset: str) -> dict:
+    result = subprocess.run(
+        [PYTHON_BIN, GRADE_DATASET, pid, dataset],
+        cwd=PYTHON_ROOT,
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "grade_dataset failed")
+    lines = [line for line in result.stdout.splitlines() if line.strip()]
+    last_line = lines[-1] if lines else "{}"
+    try:
+        return json.loads(last_line)
+    except json.JSONDecodeError as exc:
+        raise RuntimeError(f"Invalid grader output: {last_line}") from exc
+
+
+def run_add_eval(pid: str, dataset: str, eval_file: str) -> None:
+    result = subprocess.run(
+        [SURVEY_PYTHON, SURVEY_CLI, "add-eval", pid, dataset, eval_file, "--json"],
+        cwd=SURVEY_ROOT,
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        try:
+            error = json.loads(result.stdout or "{}").get("error")
+        except json.JSONDecodeError:
+            error = None
+        raise RuntimeError(error or result.stderr.strip() or "add-eval failed")
+
+
+def grade_job(r: redis.Redis, entry_id: str, fields: Dict[str, str]) -> object:
+    pid, dataset = fields["pid"], fields["dataset"]
+    accuracy = r.hget(GRADED_KEY, entry_id)     # graded on an earlier delivery
+    if accuracy is None:
+        result = run_grade(pid, dataset)
+        accuracy = result.get("accuracy")
+        if not isinstance(accuracy, (int, float, str)):
+            raise RuntimeError("grader output missing accuracy")
+        if result.get("eval_file"):
+            run_add_eval(pid, dataset, result["eval_file"])
+        pipe = r.pipeline(transaction=True)
+        pipe.set(f"v1:{pid}:{dataset}:meta", accuracy)
+        pipe.srem(open_key(pid), dataset)       # submitted – no longer open
+        pipe.hset(GRADED_KEY, entry_id, accuracy)
+        pipe.execute()
+    if fields.get("notify") == "1":
+        report_grade(pid, dataset, accuracy)
+    return accuracy
+
+
+def report_grade(pid: str, dataset: str, accuracy: object) -> None:
+    """POST /admin/graded; raises so an unreachable server means a retry."""
+    try:
+        accuracy = float(accuracy)              # v1:grading:graded hands back a string
+    except (TypeError, ValueError):
+        pass
+    resp = requests.post(f"{SERVER_URL}/admin/graded", timeout=30,
+                         json={"pid": pid, "dataset": dataset, "accuracy": accuracy})
+    if not resp.ok:
+        raise RuntimeError(f"/admin/graded returned {resp.status_code}: {resp.text[:200]}")
+
+
+# ── bookkeeping ──────────────────────────────────────────────────────────────
+def finish(r: redis.Redis, entry_id: str, fields: Dict[str, str]) -> float:
+    latency = max(0.0, time.time() * 1000 - float(fields.get("enqueued") or 0))
+    pipe = r.pipeline(transaction=True)
+    pipe.xack(STREAM, GROUP, entry_id)
+    pipe.xdel(STREAM, entry_id)
+    pipe.hdel(ERRORS_KEY, entry_id)
+    pipe.hdel(GRADED_KEY, entry_id)
+    pipe.hincrby(METRICS_KEY, "graded", 1)
+    pipe.hincrbyfloat(METRICS_KEY, "latency_ms_total", latency)
+    pipe.lpush(LATENCY_KEY, round(latency))
+    pipe.ltrim(LATENCY_KEY, 0, LATENCY_SAMPLES - 1)
+    pipe.execute()
+    return latency
+
+
+def fail(r: redis.Redis, entry_id: str, exc: Exception) -> None:
+    pipe = r.pipeline(transaction=False)
+    pipe.hset(ERRORS_KEY, entry_id, str(exc)[:2_000])
+    pipe.hincrby(METRICS_KEY, "failed", 1)
+    pipe.execute()
+
+
+def bury(r: redis.Redis, entry_id: str, fields: Dict[str, str], deliveries: int) -> None:
+    error = r.hget(ERRORS_KEY, entry_id) or ""
+    pipe = r.pipeline(transaction=True)
+    pipe.xadd(DEAD_STREAM, {**fields, "job": entry_id, "deliveries": str(deliveries),
+                            "error": error})
+    pipe.xack(STREAM, GROUP, entry_id)
+    pipe.xdel(STREAM, entry_id)
+    pipe.hdel(ERRORS_KEY, entry_id)
+    pipe.hdel(GRADED_KEY, entry_id)
+    pipe.hincrby(METRICS_KEY, "dead", 1)
+    pipe.execute()
+
+
+def process(r: redis.Redis, entry_id: str, fields: Dict[str, str]) -> None:
+    """Grade one job; on any failure the entry stays pending for XAUTOCLAIM."""
+    job = f"{fields.get('pid')}/{fields.get('dataset')} ({entry_id})"
+    try:
+        accuracy = grade_job(r, entry_id, fields)
+    except Exception as exc:  # noqa: BLE001
+        print(f"Failed {job}: {exc}")
+        try:
+            fail(r, entry_id, exc)
+        except redis.RedisError as err:
+            print(f"  could not record the failure of {job}: {err}")
+        return
+    try:
+        latency = finish(r, entry_id, fields)
+    except redis.RedisError as exc:
+        print(f"Graded {job}: {accuracy}, but could not acknowledge it ({exc}) – left pending")
+        return
+    print(f"Graded {fields['pid']}/{fields['dataset']}: {accuracy} ({latency:.0f} ms)")
+
+
+def claim_stale(r: redis.Redis, consumer: str, min_idle_ms: int,
+                count: int) -> List[Tuple[str, Dict[str, str]]]:
+    """XAUTOCLAIM idle pending jobs; dead-letter the ones retried too often."""
+    if count <= 0:
+        return []
+    _, claimed, *_ = r.xautoclaim(STREAM, GROUP, consumer, min_idle_ms,
+                                  start_id="0-0", count=count)
+    if not claimed:
+        return []
+    ids = sorted((entry_id for entry_id, _ in claimed),
+                 key=lambda i: tuple(int(part) for part in i.split("-")))
+    deliveries = {
+        p["message_id"]: p["times_delivered"]
+        for p in r.xpending_range(STREAM, GROUP, min=ids[0], max=ids[-1],
+                                  count=len(ids) * 4, consumername=consumer)
+    }
+    jobs = []
+    for entry_id, fields in claimed:
+        if not fields:                          # deleted while pending
+            r.xack(STREAM, GROUP, entry_id)
+            continue
+        n = deliveries.get(entry_id, 1)
+        if n > MAX_DELIVERIES:
+            bury(r, entry_id, fields, n)
+            print(f"Gave up on {fields.get('pid')}/{fields.get('dataset')} after {n - 1} attempts")
+            continue
+        r.hincrby(METRICS_KEY, "retried", 1)
+        jobs.append((entry_id, fields))
+    return jobs
+
+
+# ── metrics ──────────────────────────────────────────────────────────────────
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+def queue_stats(r: redis.Redis) -> dict:
+    now_ms = time.time() * 1000
+    stats: dict = {"depth": r.xlen(STREAM), "dead": r.xlen(DEAD_STREAM)}
+    try:
+        pending = r.xpending(STREAM, GROUP)
+        stats["pending"] = pending["pending"]
+        stats["consumers"] = {c["name"]: int(c["pending"]) for c in pending["consumers"]}
+    except redis.ResponseError:                 # group not created yet
+        stats["pending"], stats["consumers"] = 0, {}
+    stats["waiting"] = stats["depth"] - stats["pending"]
+
+    oldest = r.xrange(STREAM, count=1)
+    stats["oldest_age_ms"] = (
+        round(now_ms - float(oldest[0][1].get("enqueued") or now_ms)) if oldest else 0
+    )
+
+    counters = r.hgetall(METRICS_KEY)
+    for name in ("graded", "failed", "retried", "dead"):
+        stats[f"{name}_total"] = int(counters.get(name, 0))
+    graded = stats["graded_total"]
+    stats["latency_ms_avg"] = (
+        round(float(counters.get("latency_ms_total", 0)) / graded) if graded else None
+    )
+    samples = sorted(float(v) for v in r.lrange(LATENCY_KEY, 0, -1))
+    stats["latency_ms_p50"] = percentile(samples, 0.50)
+    stats["latency_ms_p95"] = percentile(samples, 0.95)
+    return stats
+
+
+# ── daemon ───────────────────────────────────────────────────────────────────
+def serve(r: redis.Redis, consumer: str, workers: int, min_idle_ms: int,
+          claim_interval: float) -> None:
+    ensure_group(r)
+    stopping = False
+
+    def stop(*_):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    inflight: Dict[Future, str] = {}
+    next_claim = 0.0
+    backoff = 0.0
+    print(f"{consumer}: consuming {STREAM} with {workers} workers")
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        while not stopping:
+            done = [f for f in inflight if f.done()]
+            for fut in done:
+                entry_id = inflight.pop(fut)
+                try:
+                    fut.result()
+                except Exception as exc:  # noqa: BLE001 – never let one job kill the daemon
+                    print(f"Job {entry_id} crashed: {exc} – left pending for retry")
+
+            free = workers - len(inflight)
+            if free <= 0:
+                wait(list(inflight), timeout=1.0, return_when=FIRST_COMPLETED)
+                continue
+
+            jobs: List[Tuple[str, Dict[str, str]]] = []
+            try:
+                if time.monotonic() >= next_claim:
+                    jobs = claim_stale(r, consumer, min_idle_ms, free)
+                    next_claim = time.monotonic() + claim_interval
+                if not jobs:
+                    block = BLOCK_MS if not inflight else 200
+                    resp = r.xreadgroup(GROUP, consumer, {STREAM: ">"}, count=free, block=block)
+                    jobs = [(entry_id, fields) for _, entries in resp or []
+                            for entry_id, fields in entries]
+            except redis.RedisError as exc:
+                backoff = min(MAX_BACKOFF_S, backoff * 2 or 1.0)
+                print(f"{consumer}: reading {STREAM} failed ({exc}); retrying in {backoff:g}s")
+                time.sleep(backoff)
+                if "NOGROUP" in str(exc):       # Redis came back without the stream
+                    try:
+                        ensure_group(r)
+                    except redis.RedisError:
+                        pass
+                continue
+            backoff = 0.0
+
+            for entry_id, fields in jobs:
+                inflight[pool.submit(process, r, entry_id, fields)] = entry_id
+
+        print(f"{consumer}: stopping, waiting for {len(inflight)} job(s)")
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Consume grading jobs from a Redis Stream.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--workers", type=int, default=2, help="Concurrent grading jobs")
+    parser.add_argument("--consumer", default=f"{socket.gethostname()}-{os.getpid()}")
+    parser.add_argument("--min-idle", type=float, default=600.0,
+                        help="Seconds a pending job may idle before it is retried")
+    parser.add_argument("--claim-interval", type=float, default=30.0,
+                        help="Seconds between pending-entry claim sweeps")
+    parser.add_argument("--enqueue-urban", action="store_true",
+                        help="Queue every ungraded Urban submission and exit")
+    parser.add_argument("--force", action="store_true",
+                        help="With --enqueue-urban: also queue already graded pairs")
+    parser.add_argument("--stats", action="store_true", help="Print queue metrics as JSON and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    if args.stats:
+        print(json.dumps(queue_stats(r), indent=2))
+        return
+    if args.enqueue_urban:
+        print(f"Queued {enqueue_urban(r, args.force)} Urban grading job(s)")
+        return
+    serve(r, args.consumer, max(1, args.workers), int(args.min_idle * 1000), args.claim_interval)
+
+
+if __name__ == "__main__":
+    main()
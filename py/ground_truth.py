@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+ground_truth.py
+───────────────
+Extract each question's ground truth once, at ingest, so `/qresponses/:pid`
+reads it with one HMGET instead of deep-walking every question and issuing a
+GET per answer for the `jkdewitt` baseline.
+
+    v1:gt:<ds>    HASH  <uid> → {"baseline": …, "question": …}   (JSON)
+
+`baseline` is the answer of BASELINE_PID (`v1:jkdewitt:<ds>:<uid>`, only for
+*Accuracy / *Training datasets); `question` is what `extract()` finds in the
+question object (ground-truth keys first, then Label / Answer). Either field
+is omitted when there is nothing to report, so `{}` means "looked, found
+nothing". The server falls back to computing (and storing) missing entries.
+
+Scripts that add or change questions – or rewrite the baseline's answers –
+call the hook afterwards:
+
+    from ground_truth import store
+    store(r, ds)                   # whole dataset
+    store(r, ds, ["uid1", …])      # just these questions
+
+Run:
+    python py/ground_truth.py [datasets...] [--workers N]     # backfill
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+import redis
+
+REDIS_URL    = "redis://localhost:6397/0"
+GT_PREFIX    = "v1:gt:"
+BASELINE_PID = "jkdewitt"
+BATCH_SIZE   = 5_000
+
+# keep in step with server.js GROUND_TRUTH_KEYS
+TRUTH_KEYS = (
+    "groundTruth", "ground_truth", "GroundTruth", "groundtruth",
+    "groundTruthAnswer", "ground_truth_answer", "groundtruth_answer",
+    "groundTruthResponse", "ground_truth_response",
+    "answer_key", "answerKey", "gold_answer", "goldAnswer", "gold",
+    "correct_answer", "correctAnswer", "expected_answer", "expectedAnswer",
+)
+LABEL_KEYS    = ("Label", "label", "Answer", "answer")
+BASELINE_KEYS = ("answer", "Answer", "response", "Response", "llm_response", "label", "Label")
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def gt_key(ds: str) -> str:
+    return f"{GT_PREFIX}{ds}"
+
+
+def has_ground_truth_suffix(ds: str) -> bool:
+    """Python twin of server.js hasGroundTruthSuffix()."""
+    lowered = ds.lower()
+    return lowered.endswith("accuracy") or lowered.endswith("training")
+
+
+def extract(value: Any, allow_label_fallback: bool = False) -> Any:
+    """Python twin of server.js extractGroundTruth()."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        try:
+            parsed = json.loads(value)
+        except ValueError:
+            return None
+        return extract(parsed, allow_label_fallback) if isinstance(parsed, (dict, list)) else None
+    if isinstance(value, list):
+        for item in value:
+            found = extract(item, allow_label_fallback)
+            if found is not None:
+                return found
+        return None
+    if not isinstance(value, dict):
+        return None
+
+    for key in TRUTH_KEYS:
+        if value.get(key) is not None:
+            return value[key]
+    if allow_label_fallback:
+        for key in LABEL_KEYS:
+            if value.get(key) is not None:
+                return value[key]
+    for key, child in value.items():
+        if "groundtruth" in re.sub(r"[_\s-]", "", key).lower() and child is not None:
+            return child
+        found = extract(child, allow_label_fallback)
+        if found is not None:
+            return found
+    return None
+
+
+def baseline_answer(raw) -> Any:
+    if raw is None:
+        return None
+    try:
+        obj = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    if not isinstance(obj, dict):
+        return None
+    return next((obj[k] for k in BASELINE_KEYS if obj.get(k) is not None), None)
+
+
+def _mget(r: redis.Redis, keys: List[str]) -> List[Any]:
+    out: List[Any] = []
+    for start in range(0, len(keys), BATCH_SIZE):
+        out.extend(r.mget(keys[start:start + BATCH_SIZE]))
+    return out
+
+
+def compute(r: redis.Redis, ds: str, uids: Iterable[str]) -> Dict[str, dict]:
+    """uid → {"baseline"?, "question"?} for the uids whose question exists."""
+    uids = sorted({to_str(u) for u in uids})
+    questions = _mget(r, [f"v1:datasets:{ds}:{uid}" for uid in uids])
+    baselines = (_mget(r, [f"v1:{BASELINE_PID}:{ds}:{uid}" for uid in uids])
+                 if has_ground_truth_suffix(ds) else [None] * len(uids))
+
+    out: Dict[str, dict] = {}
+    for uid, raw_q, raw_b in zip(uids, questions, baselines):
+        if raw_q is None:
+            continue
+        entry = {}
+        base = baseline_answer(raw_b)
+        if base is not None:
+            entry["baseline"] = base
+        try:
+            question = extract(json.loads(raw_q), allow_label_fallback=True)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            question = None
+        if question is not None:
+            entry["question"] = question
+        out[uid] = entry
+    return out
+
+
+def store(r: redis.Redis, ds: str, uids: Optional[Iterable[str]] = None) -> int:
+    """Hook: (re)extract ground truth for <ds>; return how many entries were written."""
+    whole = uids is None
+    if whole:
+        uids = r.smembers(f"v1:datasets:{ds}")
+    uids = {to_str(u) for u in uids}
+    entries = compute(r, ds, uids)
+
+    pipe = r.pipeline(transaction=True)
+    if whole:
+        pipe.delete(gt_key(ds))
+    else:
+        gone = sorted(uids - set(entries))
+        if gone:
+            pipe.hdel(gt_key(ds), *gone)
+    if entries:
+        pipe.hset(gt_key(ds), mapping={uid: json.dumps(e) for uid, e in entries.items()})
+    pipe.execute()
+    return len(entries)
+
+
+def backfill(redis_url: str, datasets: Sequence[str], workers: int) -> int:
+    def one(ds: str) -> int:
+        return store(redis.Redis.from_url(redis_url, decode_responses=True), ds)
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return sum(pool.map(one, datasets))
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backfill v1:gt:<ds> ground-truth hashes.")
+    parser.add_argument("datasets", nargs="*", help="Datasets (default: every v1:datasets member)")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--workers", type=int, default=8, help="Datasets processed in parallel")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    datasets = args.datasets or sorted(r.smembers("v1:datasets"))
+    n = backfill(args.redis_url, datasets, args.workers)
+    print(f"Done – ground truth stored for {n:,} question(s) across {len(datasets)} dataset(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+invalidation.py
+───────────────
+Dataset change events, so server.js (and Python readers) can cache
+questions, metas and assignments and refresh only what changed.
+
+Every mutation tool calls
+
+    from invalidation import publish
+    publish(r, ds, "questions", uids)      # questions added/changed/removed
+    publish(r, ds, "meta")                 # v1:datasets:<ds>:meta rewritten
+    publish(r, ds, "assignments")          # v1:assignments:<ds> changed
+    publish(r, ds, "created")              # new dataset registered
+    publish(r, ds, "deleted")              # dataset removed
+    publish(r, ds, "archived")             # moved to the cold tier (archive_datasets.py)
+
+which bumps the dataset's counter in `v1:versions` (HASH ds → version) and
+PUBLISHes one JSON event on `v1:events:datasets`:
+
+    {"dataset": ds, "kind": kind, "uids": [...] | null, "version": n, "ts": ms}
+
+`uids: null` means "anything in the dataset may have changed". Subscribers
+that were disconnected compare `v1:versions` with the versions they cached
+and drop whatever moved; `VersionedCache` does exactly that for Python code.
+
+Run:
+    python py/invalidation.py --listen                     # tail events
+    python py/invalidation.py <dataset> [--kind questions] [--uids a b …]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple
+
+import redis
+
+REDIS_URL    = "redis://localhost:6397/0"
+CHANNEL      = "v1:events:datasets"
+VERSIONS_KEY = "v1:versions"
+KINDS        = ("questions", "meta", "assignments", "created", "deleted", "archived")
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def publish(r: redis.Redis, dataset: str, kind: str,
+            uids: Optional[Iterable[str]] = None) -> int:
+    """Bump <dataset>'s version and announce the change; return the new version."""
+    if kind not in KINDS:
+        raise ValueError(f"unknown event kind {kind!r}")
+    version = r.hincrby(VERSIONS_KEY, dataset, 1)
+    event = {
+        "dataset": dataset,
+        "kind": kind,
+        "uids": sorted({to_str(u) for u in uids}) if uids is not None else None,
+        "version": version,
+        "ts": int(time.time() * 1000),
+    }
+    r.publish(CHANNEL, json.dumps(event))
+    return version
+
+
+def versions(r: redis.Redis) -> Dict[str, int]:
+    return {to_str(k): int(v) for k, v in r.hgetall(VERSIONS_KEY).items()}
+
+
+def listen(r: redis.Redis) -> Iterator[dict]:
+    pubsub = r.pubsub(ignore_subscribe_messages=True)
+    pubsub.subscribe(CHANNEL)
+    for message in pubsub.listen():
+        try:
+            yield json.loads(message["data"])
+        except (TypeError, json.JSONDecodeError):
+            continue
+
+
+class VersionedCache:
+    """Per-dataset cache that reloads an entry once `v1:versions` moves on.
+
+    Checking costs one HGET per lookup, which is far cheaper than re-reading
+    a dataset's questions:
+
+        questions = VersionedCache(r, lambda ds: load_questions(r, ds))
+        qs = questions.get("Urban_3")
+    """
+
+    def __init__(self, r: redis.Redis, loader: Callable[[str], Any]):
+        self.r = r
+        self.loader = loader
+        self.entries: Dict[str, Tuple[int, Any]] = {}
+
+    def get(self, dataset: str) -> Any:
+        current = int(self.r.hget(VERSIONS_KEY, dataset) or 0)
+        cached = self.entries.get(dataset)
+        if cached is None or cached[0] != current:
+            cached = (current, self.loader(dataset))
+            self.entries[dataset] = cached
+        return cached[1]
+
+    def invalidate(self, dataset: Optional[str] = None) -> None:
+        if dataset is None:
+            self.entries.clear()
+        else:
+            self.entries.pop(dataset, None)
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Publish or tail dataset invalidation events.")
+    parser.add_argument("dataset", nargs="?", help="Dataset to announce a change for")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--kind", choices=KINDS, default="questions")
+    parser.add_argument("--uids", nargs="*", default=None, help="Changed uids (default: all)")
+    parser.add_argument("--listen", action="store_true", help="Print events as they arrive")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    if args.listen:
+        for event in listen(r):
+            print(json.dumps(event))
+        return
+    if not args.dataset:
+        raise SystemExit("dataset required unless --listen is given")
+    version = publish(r, args.dataset, args.kind, args.uids)
+    print(f"{args.dataset}: {args.kind} → version {version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+latency_scan.py
+───────────────
+Latency-aware SCAN for maintenance scripts, so exports and rewrites can run
+while annotators are working.
+
+A SCAN with a large COUNT (and the GET / MGET / pipeline that follows it)
+keeps Redis busy for the whole round trip, and every live request queues
+behind it. `AdaptiveScanner` times each of its read round trips and keeps
+the p99 of the last WINDOW of them under a budget:
+
+  • p99 above the budget   → halve COUNT, double the pause between commands
+  • p99 below half of it   → grow COUNT by 25 %, halve the pause
+
+Nothing is decided before MIN_SAMPLES round trips have been seen, and the
+window starts over after every change, so one slow reply costs one
+back-off, not one per command until it ages out. Write pipelines
+(`execute`) honour the pause but are not timed against the read budget – a
+5 000-command write batch is always slower than a SCAN reply.
+
+When the server has `latency-monitor-threshold` set, LATENCY LATEST is
+sampled every few seconds and any new event above the budget counts as a
+breach too (a spike caused by somebody else is still a reason to back off).
+
+    from latency_scan import AdaptiveScanner
+
+    scanner = AdaptiveScanner(r, budget_ms=5)
+    for keys in scanner.scan_batches(match="v1:*:*:*"):
+        values = scanner.mget(keys)
+    print(scanner.report())
+
+The exporters in the repo root put py/ on sys.path to import it; the module
+imports nothing from its siblings.
+
+Run (dry scan, reports throughput only):
+    python py/latency_scan.py --match 'v1:*' [--budget-ms 5]
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from collections import deque
+from typing import Any, Callable, Iterator, List, Optional, Sequence
+
+import redis
+
+REDIS_URL         = "redis://localhost:6397/0"
+LATENCY_BUDGET_MS = 5.0
+START_COUNT       = 1_000
+MIN_COUNT         = 50
+MAX_COUNT         = 10_000
+MAX_PAUSE_S       = 0.5
+WINDOW            = 512      # round trips the p99 is taken over
+MIN_SAMPLES       = 32       # fresh round trips needed before adapting
+MONITOR_EVERY_S   = 5.0
+
+
+class AdaptiveScanner:
+    """SCAN / MGET / pipeline wrapper that paces itself to a p99 latency budget."""
+
+    def __init__(self, r: redis.Redis, budget_ms: float = LATENCY_BUDGET_MS,
+                 count: int = START_COUNT, min_count: int = MIN_COUNT,
+                 max_count: int = MAX_COUNT, use_latency_monitor: bool = True) -> None:
+        self.r = r
+        self.budget = budget_ms / 1000
+        self.count = max(min_count, min(count, max_count))
+        self.min_count, self.max_count = min_count, max_count
+        self.pause = 0.0
+        self.samples: deque = deque(maxlen=WINDOW)
+        self.monitor = use_latency_monitor
+        self.monitor_at = 0.0
+        self.monitor_seen = int(time.time())
+
+        self.started = time.monotonic()
+        self.keys = 0
+        self.commands = 0
+        self.paused = 0.0
+        self.breaches = 0
+
+    # ── measuring ───────────────────────────────────────────────────────────
+    def p99(self) -> float:
+        """Nearest-rank 99th percentile of the window."""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[max(0, math.ceil(len(ordered) * 0.99) - 1)]
+
+    def _server_breach(self) -> bool:
+        """New LATENCY LATEST events above the budget since the last look."""
+        now = time.monotonic()
+        if not self.monitor or now < self.monitor_at:
+            return False
+        self.monitor_at = now + MONITOR_EVERY_S
+        try:
+            events = self.r.execute_command("LATENCY", "LATEST")
+        except redis.ResponseError:           # disabled / not permitted
+            self.monitor = False
+            return False
+        breach, seen = False, self.monitor_seen
+        for event in events or []:
+            stamp, latest_ms = int(event[1]), int(event[2])
+            if stamp > self.monitor_seen and latest_ms > self.budget * 1000:
+                breach = True
+            seen = max(seen, stamp)
+        self.monitor_seen = seen
+        return breach
+
+    def _adapt(self) -> None:
+        breach = self._server_breach()
+        if len(self.samples) >= MIN_SAMPLES:
+            p99 = self.p99()
+            breach = breach or p99 > self.budget
+            if not breach and p99 < self.budget / 2:
+                self.count = min(self.max_count, int(self.count * 1.25) + 1)
+                self.pause = self.pause / 2 if self.pause > 0.001 else 0.0
+                self.samples.clear()
+        if breach:
+            self.breaches += 1
+            self.count = max(self.min_count, self.count // 2)
+            self.pause = min(MAX_PAUSE_S, max(self.pause * 2, 0.005))
+            self.samples.clear()              # judge the new setting on fresh samples
+
+    def _wait(self) -> None:
+        if self.pause:
+            time.sleep(self.pause)
+            self.paused += self.pause
+
+    def timed(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Run one Redis round trip, record its latency and pace the next one."""
+        self._wait()
+        t0 = time.perf_counter()
+        result = fn(*args, **kwargs)
+        self.samples.append(time.perf_counter() - t0)
+        self.commands += 1
+        self._adapt()
+        return result
+
+    # ── commands ────────────────────────────────────────────────────────────
+    def scan_batches(self, match: Optional[str] = None,
+                     _type: Optional[str] = None) -> Iterator[List]:
+        """One list per SCAN reply (possibly empty), COUNT adjusted as it goes."""
+        cursor = 0
+        while True:
+            cursor, keys = self.timed(self.r.scan, cursor=cursor, match=match,
+                                      count=self.count, _type=_type)
+            self.keys += len(keys)
+            yield keys
+            if int(cursor) == 0:
+                return
+
+    def scan_iter(self, match: Optional[str] = None, _type: Optional[str] = None) -> Iterator:
+        for keys in self.scan_batches(match, _type):
+            yield from keys
+
+    def mget(self, keys: Sequence, chunk: Optional[int] = None) -> List:
+        """MGET in chunks of the current COUNT, so value reads are paced too."""
+        out: List = []
+        start = 0
+        while start < len(keys):
+            size = chunk or self.count
+            out.extend(self.timed(self.r.mget, list(keys[start:start + size])))
+            start += size
+        return out
+
+    def execute(self, pipe: redis.client.Pipeline) -> List:
+        """Run a write pipeline at the current pace, outside the read budget."""
+        self._wait()
+        self.commands += 1
+        return pipe.execute()
+
+    # ── reporting ───────────────────────────────────────────────────────────
+    def stats(self) -> dict:
+        seconds = max(time.monotonic() - self.started, 1e-9)
+        return {"keys": self.keys, "commands": self.commands, "seconds": round(seconds, 1),
+                "keysPerSecond": round(self.keys / seconds),
+                "p99Ms": round(self.p99() * 1000, 2), "budgetMs": self.budget * 1000,
+                "count": self.count, "pausedSeconds": round(self.paused, 1),
+                "breaches": self.breaches}
+
+    def report(self) -> str:
+        s = self.stats()
+        return (f"scan: {s['keys']:,} keys / {s['commands']:,} commands in {s['seconds']}s "
+                f"({s['keysPerSecond']:,} keys/s), p99 {s['p99Ms']} ms of {s['budgetMs']:g} ms, "
+                f"COUNT {s['count']:,}, paused {s['pausedSeconds']}s, {s['breaches']} back-off(s)")
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Dry-run a latency-aware SCAN and report throughput.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--match", default="v1:*")
+    parser.add_argument("--budget-ms", type=float, default=LATENCY_BUDGET_MS)
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    scanner = AdaptiveScanner(redis.Redis.from_url(args.redis_url), args.budget_ms)
+    for _ in scanner.scan_iter(match=args.match):
+        pass
+    print(f"Done – {scanner.report()}")
+
+
+if __name__ == "__main__":
+    main()
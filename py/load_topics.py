@@ -48,6 +48,8 @@ def reset_meta(topic: str, target_images: int):
     key = f"v1:campaigns:{topic}:meta"
     meta = {"curIndex": 0, "numImages": target_images}
     r.set(key, json.dumps(meta))
+    # reserve_index.lua reseeds its counter from curIndex
+    r.delete(f"v1:campaigns:{topic}:index", f"v1:campaigns:{topic}:retry")
 
     return meta
 
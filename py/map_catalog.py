@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""
+map_catalog.py
+──────────────
+Build a SQLite catalog of every map image so tools can look up dimensions,
+size, format and hashes in O(1) instead of opening the file, and check that
+every referenced `Map` actually exists.
+
+Tables (map_catalog.sqlite by default):
+
+    maps(name PK, width, height, bytes, format, sha256, phash, mtime_ns)
+    refs(name, source)          -- who references a Map filename:
+                                   data/<file>.jsonl, Map-IDs.csv, redis:<ds>
+
+`phash` is a 64-bit difference hash (hex) of the grey-scale 9×8 thumbnail;
+equal or near-equal values flag re-encoded / resized copies of one scan.
+
+The maps directory is scanned in a process pool; files whose size and mtime
+match the catalog are not reopened. A file that cannot be stat'ed or read
+mid-scan is reported and counted as failed; it keeps its previous row.
+
+Run:
+    python py/map_catalog.py                    # scan + report
+    python py/map_catalog.py --no-redis --near 4
+    python py/map_catalog.py --lookup 18740.png
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import hashlib
+import json
+import sqlite3
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from PIL import Image
+from tqdm import tqdm
+
+REDIS_URL   = "redis://localhost:6397/0"
+ROOT        = Path(__file__).resolve().parent.parent
+MAPS_DIR    = ROOT / "maps"
+DATA_DIR    = ROOT / "data"
+CATALOG     = ROOT / "map_catalog.sqlite"
+MAP_IDS_CSV = "Map-IDs.csv"
+IMAGE_EXTS  = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".webp", ".gif"}
+BATCH_SIZE  = 5_000
+
+# Map scans are trusted input and routinely exceed Pillow's bomb guard.
+Image.MAX_IMAGE_PIXELS = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS maps (
+    name     TEXT PRIMARY KEY,
+    width    INTEGER,
+    height   INTEGER,
+    bytes    INTEGER NOT NULL,
+    format   TEXT,
+    sha256   TEXT NOT NULL,
+    phash    TEXT,
+    mtime_ns INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS maps_sha256 ON maps(sha256);
+CREATE INDEX IF NOT EXISTS maps_phash  ON maps(phash);
+CREATE TABLE IF NOT EXISTS refs (
+    name   TEXT NOT NULL,
+    source TEXT NOT NULL,
+    PRIMARY KEY (name, source)
+) WITHOUT ROWID;
+"""
+
+
+# ── worker side ──────────────────────────────────────────────────────────────
+def dhash(img: Image.Image) -> str:
+    small = img.convert("L").resize((9, 8), Image.BILINEAR)
+    px = small.tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return f"{bits:016x}"
+
+
+def inspect(src: str) -> Tuple[str, dict]:
+    path = Path(src)
+    st = path.stat()
+    h = hashlib.sha256()
+    with path.open("rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    row = {"name": path.name, "bytes": st.st_size, "mtime_ns": st.st_mtime_ns,
+           "sha256": h.hexdigest(), "width": None, "height": None,
+           "format": None, "phash": None}
+    try:
+        with Image.open(path) as img:
+            row["width"], row["height"] = img.size
+            row["format"] = img.format
+            img.draft("RGB", (64, 64))     # JPEG: decode at 1/8 scale
+            row["phash"] = dhash(img)
+    except Exception:  # noqa: BLE001 – unreadable image still gets a row
+        pass
+    return src, row
+
+
+# ── catalog ──────────────────────────────────────────────────────────────────
+class MapCatalog:
+    """Thin read/write wrapper around the SQLite catalog."""
+
+    def __init__(self, path: Path = CATALOG):
+        self.path = path
+        self.db = sqlite3.connect(str(path))
+        self.db.row_factory = sqlite3.Row
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def get(self, name: str) -> Optional[dict]:
+        row = self.db.execute("SELECT * FROM maps WHERE name = ?", (name,)).fetchone()
+        return dict(row) if row else None
+
+    def stamps(self) -> Dict[str, Tuple[int, int]]:
+        return {r["name"]: (r["bytes"], r["mtime_ns"])
+                for r in self.db.execute("SELECT name, bytes, mtime_ns FROM maps")}
+
+    def upsert(self, rows: Iterable[dict]) -> None:
+        self.db.executemany(
+            "INSERT OR REPLACE INTO maps(name, width, height, bytes, format, sha256, phash, mtime_ns) "
+            "VALUES (:name, :width, :height, :bytes, :format, :sha256, :phash, :mtime_ns)",
+            list(rows),
+        )
+        self.db.commit()
+
+    def remove(self, names: Iterable[str]) -> None:
+        self.db.executemany("DELETE FROM maps WHERE name = ?", [(n,) for n in names])
+        self.db.commit()
+
+    def replace_refs(self, refs: Dict[str, Set[str]]) -> None:
+        self.db.execute("DELETE FROM refs")
+        self.db.executemany(
+            "INSERT OR IGNORE INTO refs(name, source) VALUES (?, ?)",
+            [(name, src) for name, sources in refs.items() for src in sources],
+        )
+        self.db.commit()
+
+    # ── integrity ──
+    def missing(self) -> List[Tuple[str, List[str]]]:
+        rows = self.db.execute(
+            "SELECT refs.name, group_concat(refs.source, ', ') AS sources FROM refs "
+            "LEFT JOIN maps ON maps.name = refs.name WHERE maps.name IS NULL "
+            "GROUP BY refs.name ORDER BY refs.name"
+        )
+        return [(r["name"], r["sources"].split(", ")) for r in rows]
+
+    def unreferenced(self) -> List[str]:
+        rows = self.db.execute(
+            "SELECT name FROM maps WHERE name NOT IN (SELECT name FROM refs) ORDER BY name"
+        )
+        return [r["name"] for r in rows]
+
+    def duplicates(self) -> List[List[str]]:
+        rows = self.db.execute(
+            "SELECT group_concat(name, '\n') AS names FROM maps GROUP BY sha256 "
+            "HAVING count(*) > 1"
+        )
+        return [sorted(r["names"].split("\n")) for r in rows]
+
+    def near_duplicates(self, max_distance: int) -> List[Tuple[str, str, int]]:
+        rows = [(r["name"], int(r["phash"], 16), r["sha256"]) for r in
+                self.db.execute("SELECT name, phash, sha256 FROM maps WHERE phash IS NOT NULL")]
+        out = []
+        for i, (a, ha, sa) in enumerate(rows):
+            for b, hb, sb in rows[i + 1:]:
+                if sa == sb:
+                    continue                       # exact duplicates reported separately
+                dist = bin(ha ^ hb).count("1")
+                if dist <= max_distance:
+                    out.append((a, b, dist))
+        return sorted(out, key=lambda t: (t[2], t[0], t[1]))
+
+
+# ── reference discovery ──────────────────────────────────────────────────────
+def map_name(q: object) -> str:
+    """The map a question row points at ("Map", or legacy "map"); "" if none."""
+    if not isinstance(q, dict):
+        return ""
+    return (q.get("Map") or q.get("map") or "").strip()
+
+
+def refs_from_data(data_dir: Path) -> Dict[str, Set[str]]:
+    refs: Dict[str, Set[str]] = defaultdict(set)
+    csv_path = data_dir / MAP_IDS_CSV
+    if csv_path.exists():
+        with csv_path.open(newline="", encoding="utf-8") as fh:
+            for row in csv.DictReader(fh):
+                if row.get("filename"):
+                    refs[row["filename"].strip()].add(MAP_IDS_CSV)
+    for jsonl in sorted(data_dir.glob("*.jsonl")):
+        with jsonl.open(encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    q = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                name = map_name(q)
+                if name:
+                    refs[name].add(f"data/{jsonl.name}")
+    return refs
+
+
+def refs_from_redis(redis_url: str) -> Dict[str, Set[str]]:
+    import redis
+
+    r = redis.Redis.from_url(redis_url, decode_responses=True)
+    refs: Dict[str, Set[str]] = defaultdict(set)
+    for ds in sorted(r.smembers("v1:datasets")):
+        uids = sorted(r.smembers(f"v1:datasets:{ds}"))
+        for start in range(0, len(uids), BATCH_SIZE):
+            chunk = uids[start:start + BATCH_SIZE]
+            for raw in r.mget([f"v1:datasets:{ds}:{uid}" for uid in chunk]):
+                try:
+                    q = json.loads(raw) if raw else None
+                except json.JSONDecodeError:
+                    continue
+                name = map_name(q)
+                if name:
+                    refs[name].add(f"redis:{ds}")
+    return refs
+
+
+# ── build ────────────────────────────────────────────────────────────────────
+def scan(catalog: MapCatalog, maps_dir: Path, workers: Optional[int] = None) -> Dict[str, int]:
+    stamps = catalog.stamps()
+    on_disk = {p.name: p for p in maps_dir.iterdir()
+               if p.is_file() and p.suffix.lower() in IMAGE_EXTS} if maps_dir.is_dir() else {}
+
+    gone = set(stamps) - set(on_disk)
+    catalog.remove(gone)
+
+    stats = {"scanned": 0, "unchanged": 0, "removed": len(gone), "failed": 0}
+    todo = []
+    for name, path in on_disk.items():
+        try:
+            st = path.stat()
+        except OSError as exc:
+            stats["failed"] += 1
+            print(f"  • {name}: {exc}")
+            continue
+        if stamps.get(name) != (st.st_size, st.st_mtime_ns):
+            todo.append(path)
+        else:
+            stats["unchanged"] += 1
+
+    rows: List[dict] = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(inspect, str(p)): p.name for p in todo}
+            for fut in tqdm(as_completed(futures), total=len(futures), unit="map"):
+                try:
+                    _, row = fut.result()
+                except Exception as exc:  # noqa: BLE001
+                    stats["failed"] += 1
+                    print(f"  • {futures[fut]}: {exc}")
+                    continue
+                stats["scanned"] += 1
+                rows.append(row)
+                if len(rows) >= BATCH_SIZE:
+                    catalog.upsert(rows); rows = []
+    if rows:
+        catalog.upsert(rows)
+    return stats
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build and check the map asset catalog.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--maps-dir", type=Path, default=MAPS_DIR)
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--catalog", type=Path, default=CATALOG)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--no-redis", action="store_true",
+                        help="Only check references in data/ (no v1:datasets lookup)")
+    parser.add_argument("--near", type=int, default=0, metavar="BITS",
+                        help="Also report perceptual near-duplicates within BITS (0 = off)")
+    parser.add_argument("--lookup", metavar="MAP", help="Print the catalog row for MAP and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    catalog = MapCatalog(args.catalog)
+    try:
+        if args.lookup:
+            print(json.dumps(catalog.get(args.lookup)))
+            return
+
+        stats = scan(catalog, args.maps_dir, args.workers)
+        refs = refs_from_data(args.data_dir)
+        if not args.no_redis:
+            for name, sources in refs_from_redis(args.redis_url).items():
+                refs.setdefault(name, set()).update(sources)
+        catalog.replace_refs(refs)
+
+        missing = catalog.missing()
+        duplicates = catalog.duplicates()
+        print(f"Catalog {args.catalog}: scanned={stats['scanned']}, "
+              f"unchanged={stats['unchanged']}, removed={stats['removed']}, "
+              f"failed={stats['failed']}")
+        print(f"Missing maps: {len(missing)}")
+        for name, sources in missing:
+            print(f"  • {name}  ← {', '.join(sources)}")
+        print(f"Duplicate content: {len(duplicates)} group(s)")
+        for group in duplicates:
+            print(f"  • {' = '.join(group)}")
+        if args.near:
+            near = catalog.near_duplicates(args.near)
+            print(f"Near-duplicates (≤{args.near} bits): {len(near)}")
+            for a, b, dist in near:
+                print(f"  • {a} ~ {b} ({dist})")
+        print(f"Unreferenced maps: {len(catalog.unreferenced())}")
+    finally:
+        catalog.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+metrics_exporter.py
+───────────────────
+Prometheus text-format metrics for Redis and the survey keyspace, served on
+a local `/metrics` endpoint.
+
+    redis_*                      INFO: memory, ops/sec, keyspace hits/misses,
+                                 clients (connected / blocked), evictions, keys
+    survey_datasets              SCARD v1:datasets      (+ survey_archived_datasets)
+    survey_users                 SCARD v1:usernames
+    survey_adjudications{state}  SCARD v1:adjudications / v1:past_adjudications
+    survey_campaign_*{topic}     curIndex / numImages of v1:campaigns:<topic>:meta,
+                                 datasets per campaign
+    survey_grading_*             grading_worker.queue_stats(): depth, pending,
+                                 dead, oldest job age, totals, latency p50/p95
+
+A background thread refreshes one snapshot every --interval seconds (one
+pipeline plus the grading queue reads) and scrapes are answered from it, so
+any number of Prometheus servers cost Redis nothing extra. A failed refresh
+(of any kind) is logged and published as survey_exporter_up 0; the age of
+survey_exporter_last_success_timestamp_seconds tells how stale the rest is. Campaign topics
+come from a SCAN that only reruns every TOPICS_EVERY_S.
+
+Run:
+    python py/metrics_exporter.py [--port 9121] [--interval 15]
+    curl -s localhost:9121/metrics
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import redis
+
+from grading_worker import queue_stats
+
+REDIS_URL      = "redis://localhost:6397/0"
+PORT           = 9121
+INTERVAL_S     = 15.0
+TOPICS_EVERY_S = 600.0
+SCAN_COUNT     = 1_000
+
+# INFO field → (metric, type, help)
+INFO_METRICS = {
+    "used_memory":                ("redis_memory_used_bytes", "gauge", "Memory allocated by Redis"),
+    "used_memory_rss":            ("redis_memory_rss_bytes", "gauge", "Resident set size"),
+    "used_memory_peak":           ("redis_memory_peak_bytes", "gauge", "Peak allocated memory"),
+    "maxmemory":                  ("redis_memory_max_bytes", "gauge", "maxmemory setting (0 = none)"),
+    "mem_fragmentation_ratio":    ("redis_memory_fragmentation_ratio", "gauge", "RSS / used memory"),
+    "instantaneous_ops_per_sec":  ("redis_ops_per_second", "gauge", "Commands per second (INFO sample)"),
+    "total_commands_processed":   ("redis_commands_processed_total", "counter", "Commands processed"),
+    "keyspace_hits":              ("redis_keyspace_hits_total", "counter", "Successful key lookups"),
+    "keyspace_misses":            ("redis_keyspace_misses_total", "counter", "Failed key lookups"),
+    "connected_clients":          ("redis_connected_clients", "gauge", "Client connections"),
+    "blocked_clients":            ("redis_blocked_clients", "gauge", "Clients in a blocking call"),
+    "evicted_keys":               ("redis_evicted_keys_total", "counter", "Keys evicted by maxmemory"),
+    "expired_keys":               ("redis_expired_keys_total", "counter", "Keys expired"),
+    "uptime_in_seconds":          ("redis_uptime_seconds", "gauge", "Server uptime"),
+}
+
+Sample = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]   # name, type, help, values
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def _label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(samples: Sequence[Sample]) -> bytes:
+    out: List[str] = []
+    for name, kind, help_text, values in samples:
+        out.append(f"# HELP {name} {help_text}")
+        out.append(f"# TYPE {name} {kind}")
+        for labels, value in values:
+            tags = ",".join(f'{k}="{_label(v)}"' for k, v in sorted(labels.items()))
+            out.append(f"{name}{{{tags}}} {_number(value)}" if tags else f"{name} {_number(value)}")
+    return ("\n".join(out) + "\n").encode()
+
+
+def _meta(raw) -> dict:
+    try:
+        obj = json.loads(raw) if raw else {}
+    except (json.JSONDecodeError, TypeError):
+        return {}
+    return obj if isinstance(obj, dict) else {}
+
+
+class Collector:
+    """Builds the metrics snapshot; `body` is what every scrape gets."""
+
+    def __init__(self, r: redis.Redis):
+        self.r = r
+        self.topics: List[str] = []
+        self.topics_at = 0.0
+        self.lock = threading.Lock()
+        self.succeeded_at: Optional[float] = None
+        self.body = render([("survey_exporter_up", "gauge", "1 if the last refresh succeeded",
+                             [({}, 0)])])
+
+    def campaign_topics(self) -> List[str]:
+        now = time.monotonic()
+        if now - self.topics_at >= TOPICS_EVERY_S or not self.topics_at:
+            topics = {to_str(k)[len("v1:campaigns:"):-len(":meta")]
+                      for k in self.r.scan_iter(match="v1:campaigns:*:meta", count=SCAN_COUNT)}
+            self.topics, self.topics_at = sorted(topics), now
+        return self.topics
+
+    def collect(self) -> List[Sample]:
+        topics = self.campaign_topics()
+        pipe = self.r.pipeline(transaction=False)
+        pipe.info()
+        for key in ("v1:datasets", "v1:archived", "v1:usernames",
+                    "v1:adjudications", "v1:past_adjudications"):
+            pipe.scard(key)
+        for topic in topics:
+            pipe.get(f"v1:campaigns:{topic}:meta")
+            pipe.scard(f"v1:campaigns:{topic}")
+        info, datasets, archived, users, pending, past, *campaigns = pipe.execute()
+
+        samples: List[Sample] = []
+        for field, (name, kind, help_text) in INFO_METRICS.items():
+            if field in info:
+                samples.append((name, kind, help_text, [({}, float(info[field]))]))
+        samples.append(("redis_db_keys", "gauge", "Keys per database",
+                        [({"db": db}, float(v["keys"])) for db, v in sorted(info.items())
+                         if db.startswith("db") and isinstance(v, dict)]))
+
+        samples += [
+            ("survey_datasets", "gauge", "Active datasets (v1:datasets)", [({}, datasets)]),
+            ("survey_archived_datasets", "gauge", "Archived datasets (v1:archived)", [({}, archived)]),
+            ("survey_users", "gauge", "Registered users (v1:usernames)", [({}, users)]),
+            ("survey_adjudications", "gauge", "Adjudication requests by state",
+             [({"state": "pending"}, pending), ({"state": "past"}, past)]),
+        ]
+        cur, num, size = [], [], []
+        for topic, raw, count in zip(topics, campaigns[0::2], campaigns[1::2]):
+            meta = _meta(raw)
+            labels = {"topic": topic}
+            cur.append((labels, float(meta.get("curIndex") or 0)))
+            num.append((labels, float(meta.get("numImages") or 0)))
+            size.append((labels, float(count)))
+        samples += [
+            ("survey_campaign_cur_index", "gauge", "curIndex of v1:campaigns:<topic>:meta", cur),
+            ("survey_campaign_num_images", "gauge", "numImages of v1:campaigns:<topic>:meta", num),
+            ("survey_campaign_datasets", "gauge", "Datasets per campaign", size),
+        ]
+
+        q = queue_stats(self.r)
+        grading = [
+            ("survey_grading_queue_depth", "gauge", "Jobs in v1:grading:jobs", q["depth"]),
+            ("survey_grading_pending", "gauge", "Jobs delivered but not acknowledged", q["pending"]),
+            ("survey_grading_waiting", "gauge", "Jobs not yet delivered", q["waiting"]),
+            ("survey_grading_dead", "gauge", "Jobs in v1:grading:dead", q["dead"]),
+            ("survey_grading_oldest_age_seconds", "gauge", "Age of the oldest queued job",
+             q["oldest_age_ms"] / 1000),
+        ]
+        for name in ("graded", "failed", "retried", "dead"):
+            grading.append((f"survey_grading_{name}_total", "counter", f"Jobs {name}",
+                            q[f"{name}_total"]))
+        samples += [(name, kind, help_text, [({}, float(value))])
+                    for name, kind, help_text, value in grading]
+        samples.append(("survey_grading_latency_seconds", "gauge",
+                        "Enqueue → meta latency over the last samples",
+                        [({"quantile": qn}, q[f"latency_ms_p{p}"] / 1000)
+                         for qn, p in (("0.5", "50"), ("0.95", "95"))
+                         if q[f"latency_ms_p{p}"] is not None]))
+        return samples
+
+    def refresh(self) -> None:
+        started = time.monotonic()
+        try:
+            samples = self.collect()
+            up = 1
+        except Exception as exc:           # a bad key or reply must not kill the loop
+            print(f"  ⚠ refresh failed: {type(exc).__name__}: {exc}")
+            samples, up = [], 0
+        if up:
+            self.succeeded_at = time.time()
+        samples += [
+            ("survey_exporter_up", "gauge", "1 if the last refresh succeeded", [({}, up)]),
+            ("survey_exporter_last_success_timestamp_seconds", "gauge",
+             "When a refresh last succeeded (0: never)", [({}, self.succeeded_at or 0)]),
+            ("survey_exporter_refresh_seconds", "gauge", "Duration of the last refresh",
+             [({}, time.monotonic() - started)]),
+            ("survey_exporter_refreshed_timestamp_seconds", "gauge", "When the last refresh ran",
+             [({}, time.time())]),
+        ]
+        body = render(samples)
+        with self.lock:
+            self.body = body
+
+    def loop(self, interval: float) -> None:
+        while True:
+            self.refresh()
+            time.sleep(interval)
+
+
+def handler_for(collector: Collector):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self) -> None:
+            if self.path.split("?", 1)[0] != "/metrics":
+                self.send_error(404)
+                return
+            with collector.lock:
+                body = collector.body
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args) -> None:     # scrapes every few seconds – keep quiet
+            pass
+
+    return Handler
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Serve Prometheus metrics for Redis and the survey keyspace.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--interval", type=float, default=INTERVAL_S, help="Seconds between refreshes")
+    parser.add_argument("--once", action="store_true", help="Print one snapshot and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    collector = Collector(redis.Redis.from_url(args.redis_url, decode_responses=True))
+    if args.once:
+        collector.refresh()
+        print(collector.body.decode(), end="")
+        return
+    threading.Thread(target=collector.loop, args=(args.interval,), daemon=True).start()
+    server = ThreadingHTTPServer((args.host, args.port), handler_for(collector))
+    print(f"Serving http://{args.host}:{args.port}/metrics (refresh every {args.interval:g}s)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("Done – stopped.")
+
+
+if __name__ == "__main__":
+    main()
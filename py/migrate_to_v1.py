@@ -91,6 +91,8 @@ def migrate_user_responses() -> None:
     If an answer lacks uid/responseID, find the uid by matching
     (mapFileName, question) against the questions previously loaded.
     """
+    from progress import refresh
+
     print("Migrating user responses…")
     patt = "user:*:qresponse:*:*"
     keys = list(r.scan_iter(match=patt, count=5000))
@@ -99,6 +101,8 @@ def migrate_user_responses() -> None:
         print("No old answer keys found; skipping.\n")
         return
 
+    migrated: dict[str, set[str]] = {}          # dataset → pids, for v1:progress
+
     with r.pipeline() as pipe:
         for key in tqdm(keys, desc="Answers migrated"):
             # key = user:<pid>:qresponse:<dataset>:<responseID>
@@ -137,14 +141,24 @@ def migrate_user_responses() -> None:
 
             # store the answer under the correct uid
             pipe.set(f"v1:{pid}:{dataset_id}:{uid}", raw)
+            migrated.setdefault(dataset_id, set()).add(pid)
 
         pipe.execute()
 
+    for dataset_id, pids in migrated.items():
+        refresh(r, dataset_id, pids)
+
     print("User-response migration finished.\n")
 
 
 # ----------------------------------------------------------------------------
-if __name__ == "__main__":
+def main() -> None:
     print(os.getcwd())
     ingest_questions()
     migrate_user_responses()
+
+
+if __name__ == "__main__":
+    import sys
+    from survey import main as survey
+    sys.exit(survey(["migrate", *sys.argv[1:]]))
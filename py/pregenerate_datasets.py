@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+pregenerate_datasets.py
+───────────────────────
+Keep a pool of ready-to-assign `<topic>_<index>` datasets per campaign so the
+`/run-python` request never has to wait for create_dataset.py.
+
+A dataset counts as *ready* when it is in `v1:campaigns:<topic>`, has its
+`v1:datasets:<ds>:meta` and nobody is assigned to it yet. While a campaign has
+fewer than --ready of those and `curIndex < numImages` (numImages is managed
+by py/load_topics.py) the worker
+
+  1. reserves the next index atomically with py/reserve_index.lua – the same
+     script server.js loads – so any number of workers (and the server's own
+     fallback) never share an index. The counter is the `next` field of
+     `v1:campaigns:<topic>:index`; indexes whose generation failed are pushed
+     back on `v1:campaigns:<topic>:retry` and handed out first,
+  2. runs the external create_dataset.py generator for that index,
+  3. inserts the questions with a pipeline, then registers the dataset in
+     `v1:datasets` / `v1:campaigns:<topic>` and writes its meta in one
+     transaction, so a half-written dataset is never visible,
+  4. only then advances `curIndex` in the campaign meta with
+     py/commit_index.lua (atomic, never backwards, the rest of the JSON
+     untouched) – an index the generator skips is settled the same way,
+  5. announces it on `v1:events:datasets` and via POST /admin/dataset.
+
+getNextDataset already prefers an existing campaign dataset with a free slot,
+so with the pool topped up the request path only assigns.
+
+Run:
+    python py/pregenerate_datasets.py                      # all campaigns, once
+    python py/pregenerate_datasets.py Military Urban --ready 3
+    python py/pregenerate_datasets.py --loop --interval 60 --workers 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import redis
+
+from add_dataset import notify_server
+from availability import avail_key
+from invalidation import publish
+
+REDIS_URL      = "redis://localhost:6397/0"
+PYTHON_BIN     = "/storage/cmarnold/shared/conda/envs/ml/bin/python"
+PYTHON_ROOT    = "/storage/cmarnold/projects/maps"
+CREATE_DATASET = "/storage/cmarnold/projects/maps/SurveyBridge/create_dataset.py"
+BATCH_SIZE     = 5_000
+DEFAULT_READY  = 2
+
+# returns the reserved index, -1 when numImages is reached,
+# -2 when the meta key is missing, -3 when numImages is not set
+RESERVE_INDEX_LUA = Path(__file__).with_name("reserve_index.lua").read_text()
+# advances curIndex in the meta without re-encoding it; shared with server.js
+COMMIT_INDEX_LUA = Path(__file__).with_name("commit_index.lua").read_text()
+
+def is_graded_dataset(ds: str) -> bool:
+    lowered = ds.lower()
+    return lowered.endswith("accuracy") or lowered.endswith("training")
+
+
+def list_topics(r: redis.Redis) -> List[str]:
+    topics = set()
+    for key in r.scan_iter(match="v1:campaigns:*:meta", count=1_000):
+        topics.add(key[len("v1:campaigns:"):-len(":meta")])
+    return sorted(topics)
+
+
+def ready_count(r: redis.Redis, topic: str) -> int:
+    datasets = sorted(d for d in r.smembers(f"v1:campaigns:{topic}") if not is_graded_dataset(d))
+    if not datasets:
+        return 0
+    pipe = r.pipeline()
+    for ds in datasets:
+        pipe.exists(f"v1:datasets:{ds}:meta")
+        pipe.scard(f"v1:assignments:{ds}")
+    res = pipe.execute()
+    return sum(1 for has_meta, n in zip(res[0::2], res[1::2]) if has_meta and n == 0)
+
+
+def index_keys(topic: str) -> List[str]:
+    """KEYS of reserve_index.lua: campaign meta, index counter, retry list."""
+    return [f"v1:campaigns:{topic}:meta", f"v1:campaigns:{topic}:index",
+            f"v1:campaigns:{topic}:retry"]
+
+
+def reserve_index(r: redis.Redis, topic: str) -> Optional[int]:
+    idx = r.eval(RESERVE_INDEX_LUA, 3, *index_keys(topic))
+    if idx == -2:
+        raise RuntimeError(f"campaign metadata missing for {topic}")
+    if idx == -3:
+        raise RuntimeError(f"numImages not set in campaign metadata for {topic}")
+    return None if idx < 0 else int(idx)
+
+
+def commit_index(r: redis.Redis, topic: str, index: int) -> None:
+    """Advance curIndex past a settled index (never backwards, atomically)."""
+    r.eval(COMMIT_INDEX_LUA, 1, f"v1:campaigns:{topic}:meta", index)
+
+
+def run_generator(topic: str, index: int) -> Optional[dict]:
+    result = subprocess.run(
+        [PYTHON_BIN, CREATE_DATASET, topic, str(index)],
+        cwd=PYTHON_ROOT,
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip() or "create_dataset failed")
+    if "skipped" in result.stdout:
+        return None
+    try:
+        payload = json.loads(result.stdout)
+    except json.JSONDecodeError as exc:
+        raise RuntimeError("dataset generator returned bad JSON") from exc
+    meta = payload.get("dataset_meta")
+    if not meta or not meta.get("topic") or not isinstance(payload.get("dataset_entries"), list):
+        raise RuntimeError(f"generator payload missing required fields\nreturned: {result.stdout}")
+    return payload
+
+
+def insert_dataset(r: redis.Redis, topic: str, ds_id: str, payload: dict) -> int:
+    ds_set_key = f"v1:datasets:{ds_id}"
+    questions = [q for q in payload["dataset_entries"] if q.get("uid")]
+
+    pipe, pending = r.pipeline(transaction=False), 0
+    for q in questions:
+        pipe.sadd(ds_set_key, q["uid"])
+        pipe.set(f"{ds_set_key}:{q['uid']}", json.dumps(q))
+        pending += 1
+        if pending >= BATCH_SIZE:
+            pipe.execute(); pending = 0
+    if pending:
+        pipe.execute()
+
+    # registration last and atomically: readers only see complete datasets
+    pipe = r.pipeline(transaction=True)
+    pipe.set(f"{ds_set_key}:meta", json.dumps(payload["dataset_meta"]))
+    pipe.sadd("v1:datasets", ds_id)
+    pipe.sadd(f"v1:campaigns:{topic}", ds_id)
+    pipe.zadd(avail_key(topic), {ds_id: 0})      # unassigned – see availability.py
+    pipe.execute()
+    return len(questions)
+
+
+def generate_one(redis_url: str, topic: str) -> Optional[str]:
+    """Reserve, generate and insert one dataset; None when the campaign is full."""
+    r = redis.Redis.from_url(redis_url, decode_responses=True)
+    while True:
+        index = reserve_index(r, topic)
+        if index is None:
+            return None
+        ds_id = f"{topic}_{index}"
+        try:
+            payload = run_generator(topic, index)
+            if payload is None:
+                print(f"  • {ds_id}: generator skipped this index; {index} is used up")
+                commit_index(r, topic, index)
+                continue
+            n = insert_dataset(r, topic, ds_id, payload)
+        except Exception:
+            r.rpush(index_keys(topic)[2], index)    # give the index back
+            raise
+        commit_index(r, topic, index)
+        publish(r, ds_id, "created")
+        notify_server(ds_id, dict(payload["dataset_meta"]))
+        print(f"  • {ds_id}: {n} questions ready")
+        return ds_id
+
+
+def fill_topic(r: redis.Redis, redis_url: str, topic: str, target: int, workers: int) -> int:
+    missing = target - ready_count(r, topic)
+    if missing <= 0:
+        return 0
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, missing))) as pool:
+        results = list(pool.map(lambda _: generate_one(redis_url, topic), range(missing)))
+    return sum(1 for ds in results if ds)
+
+
+def run_once(r: redis.Redis, redis_url: str, topics: Sequence[str], target: int,
+             workers: int) -> Dict[str, int]:
+    made: Dict[str, int] = {}
+    for topic in topics:
+        try:
+            made[topic] = fill_topic(r, redis_url, topic, target, workers)
+        except Exception as exc:  # noqa: BLE001
+            print(f"{topic}: pre-generation failed: {exc}")
+            made[topic] = 0
+    return made
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Keep ready datasets queued for every campaign.")
+    parser.add_argument("topics", nargs="*", help="Campaign topics (default: every v1:campaigns:*:meta)")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--ready", type=int, default=DEFAULT_READY,
+                        help=f"Unassigned datasets to keep per campaign (default: {DEFAULT_READY})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Concurrent generator runs per campaign")
+    parser.add_argument("--loop", action="store_true", help="Keep running")
+    parser.add_argument("--interval", type=float, default=60.0,
+                        help="Seconds between passes with --loop")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    while True:
+        topics = args.topics or list_topics(r)
+        made = run_once(r, args.redis_url, topics, args.ready, args.workers)
+        print("Pre-generated: " + (", ".join(f"{t}={n}" for t, n in made.items()) or "—"))
+        if not args.loop:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+progress.py
+───────────
+Materialized per-user progress for `/admin/campaign_status`, so the status
+page reads one hash per dataset instead of KEYS + GET over every answer.
+
+    v1:progress:<ds>    HASH  <pid>:answered → answers to current questions
+                              <pid>:last     → newest edit/orig timestamp (ms)
+
+The server keeps the hash current on /submit_question and /edit_qresponse.
+Scripts that bulk-write or delete answers call the hook afterwards:
+
+    from progress import refresh
+    refresh(r, ds)                 # every assignee of <ds>
+    refresh(r, ds, {"pid1"})       # just these users
+
+`refresh` recomputes the fields from `v1:datasets:<ds>` and the matching
+answers with chunked MGETs; it is idempotent, so calling it too often only
+costs time.
+
+Run:
+    python py/progress.py [datasets...] [--workers N]     # backfill
+    python py/progress.py --check [datasets...] [--repair]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import redis
+
+REDIS_URL       = "redis://localhost:6397/0"
+PROGRESS_PREFIX = "v1:progress:"
+BATCH_SIZE      = 5_000
+
+Progress = Dict[str, Tuple[int, Optional[int]]]      # pid → (answered, last)
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def progress_key(ds: str) -> str:
+    return f"{PROGRESS_PREFIX}{ds}"
+
+
+def compute(r: redis.Redis, ds: str, pids: Iterable[str]) -> Progress:
+    """Count answers and newest timestamp for each pid from the answer keys."""
+    uids = sorted(to_str(u) for u in r.smembers(f"v1:datasets:{ds}"))
+    out: Progress = {}
+    for pid in sorted(set(pids)):
+        answered, last = 0, None
+        for start in range(0, len(uids), BATCH_SIZE):
+            chunk = uids[start:start + BATCH_SIZE]
+            for raw in r.mget([f"v1:{pid}:{ds}:{uid}" for uid in chunk]):
+                if raw is None:
+                    continue
+                answered += 1
+                try:
+                    obj = json.loads(raw)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                ts = (obj.get("editTimestamp") or obj.get("origTimestamp")) if isinstance(obj, dict) else None
+                if isinstance(ts, (int, float)) and (last is None or ts > last):
+                    last = int(ts)
+        out[pid] = (answered, last)
+    return out
+
+
+def read(r: redis.Redis, ds: str) -> Progress:
+    fields = {to_str(k): to_str(v) for k, v in r.hgetall(progress_key(ds)).items()}
+    out: Progress = {}
+    for field, value in fields.items():
+        pid, _, kind = field.rpartition(":")
+        answered, last = out.get(pid, (0, None))
+        if kind == "answered":
+            answered = int(value)
+        elif kind == "last":
+            last = int(value)
+        out[pid] = (answered, last)
+    return out
+
+
+def write(r: redis.Redis, ds: str, progress: Progress, replace: bool = False) -> None:
+    key = progress_key(ds)
+    pipe = r.pipeline(transaction=True)
+    if replace:
+        pipe.delete(key)
+    for pid, (answered, last) in progress.items():
+        pipe.hset(key, f"{pid}:answered", answered)
+        if last is None:
+            pipe.hdel(key, f"{pid}:last")
+        else:
+            pipe.hset(key, f"{pid}:last", last)
+    pipe.execute()
+
+
+def refresh(r: redis.Redis, ds: str, pids: Optional[Iterable[str]] = None) -> Progress:
+    """Hook for scripts that change answers: recompute and store <ds>'s progress."""
+    if pids is None:
+        known = {to_str(p) for p in r.smembers(f"v1:assignments:{ds}")} | set(read(r, ds))
+        progress = compute(r, ds, known)
+        write(r, ds, progress, replace=True)
+    else:
+        progress = compute(r, ds, pids)
+        write(r, ds, progress)
+    return progress
+
+
+def drop(r: redis.Redis, ds: str) -> None:
+    r.delete(progress_key(ds))
+
+
+# ── backfill / check ─────────────────────────────────────────────────────────
+def all_datasets(r: redis.Redis) -> List[str]:
+    return sorted(to_str(d) for d in r.smembers("v1:datasets"))
+
+
+def backfill(redis_url: str, datasets: Sequence[str], workers: int) -> int:
+    def one(ds: str) -> int:
+        r = redis.Redis.from_url(redis_url, decode_responses=True)
+        return len(refresh(r, ds))
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return sum(pool.map(one, datasets))
+
+
+def check(r: redis.Redis, datasets: Sequence[str],
+          repair: bool = False) -> List[Tuple[str, str, tuple, tuple]]:
+    """Return (ds, pid, stored, actual) for every drifted entry."""
+    drift = []
+    for ds in datasets:
+        stored = read(r, ds)
+        pids = {to_str(p) for p in r.smembers(f"v1:assignments:{ds}")} | set(stored)
+        actual = compute(r, ds, pids)
+        bad = [(ds, pid, stored.get(pid), actual[pid]) for pid in sorted(pids)
+               if stored.get(pid) != actual[pid]]
+        if bad and repair:
+            write(r, ds, actual, replace=True)
+        drift.extend(bad)
+    return drift
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backfill or verify v1:progress:<ds> hashes.")
+    parser.add_argument("datasets", nargs="*", help="Datasets (default: every v1:datasets member)")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--workers", type=int, default=8, help="Datasets processed in parallel")
+    parser.add_argument("--check", action="store_true", help="Compare stored progress with the answers")
+    parser.add_argument("--repair", action="store_true", help="With --check: rewrite drifted hashes")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    datasets = args.datasets or all_datasets(r)
+
+    if not args.check:
+        n = backfill(args.redis_url, datasets, args.workers)
+        print(f"Done – progress rebuilt for {n} user(s) across {len(datasets)} dataset(s).")
+        return
+
+    drift = check(r, datasets, repair=args.repair)
+    for ds, pid, stored, actual in drift:
+        print(f"  • {ds}/{pid}: stored={stored} actual={actual}")
+    verb = "repaired" if args.repair else "found"
+    print(f"{len(drift)} drifted entr{'y' if len(drift) == 1 else 'ies'} {verb} "
+          f"across {len(datasets)} dataset(s).")
+    if drift and not args.repair:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
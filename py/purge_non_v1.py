@@ -1,15 +1,19 @@
 #!/usr/bin/env python3
 """
 purge_non_v1.py  –  delete every key that does **not** start with 'v1:'.
+
+Usage:
+    python py/survey.py purge [--yes]
 """
 
+import sys
 import redis
 from tqdm import tqdm
 
 REDIS_URL  = "redis://localhost:6397/0"   # adjust as needed
 BATCH_SIZE = 5_000                        # pipeline flush size
 
-def main() -> None:
+def main(confirm: bool = True) -> dict:
     r = redis.Redis.from_url(REDIS_URL, decode_responses=False)
 
     keys_to_delete = [k for k in r.scan_iter(match="*", count=10_000)
@@ -18,12 +22,12 @@ def main() -> None:
     total = len(keys_to_delete)
     if not total:
         print("No non-v1 keys found; nothing to remove.")
-        return
+        return {"deletedKeys": 0}
 
     print(f"Found {total:,} keys to delete (everything without the 'v1:' prefix).")
-    if input("Proceed with deletion? [y/N] ").strip().lower() != "y":
+    if confirm and input("Proceed with deletion? [y/N] ").strip().lower() != "y":
         print("Aborted – no keys deleted.")
-        return
+        return {"aborted": True}
 
     print("Deleting keys …")
     with r.pipeline() as pipe:
@@ -38,6 +42,8 @@ def main() -> None:
             pipe.execute()
 
     print("Finished – all non-v1 keys have been purged.")
+    return {"deletedKeys": total}
 
 if __name__ == "__main__":
-    main()
+    from survey import main as survey
+    sys.exit(survey(["purge", *sys.argv[1:]]))
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+questions.py
+────────────
+The one rule for which `v1:datasets:<ds>:<uid>` values count as questions.
+
+A stored value is a question when it exists, decodes as JSON and is an
+object. Everything that derives positions from a dataset's sorted uids –
+server.js `getDatasetQuestions` (its `parseQuestion` mirrors this),
+py/answered_bitmaps.py and py/build_question_bundles.py – must skip exactly
+the same rows, or bit i / `questionIndex` i would name different questions.
+
+    from questions import parse_question
+    q = parse_question(raw)        # dict, or None when not a question
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Optional, Union
+
+
+def parse_question(raw: Optional[Union[str, bytes]]) -> Optional[dict]:
+    """The question object stored in <raw>, or None if <raw> is not one."""
+    if raw is None:
+        return None
+    try:
+        obj = json.loads(raw)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return None
+    return obj if isinstance(obj, dict) else None
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+redis_memory.py
+───────────────
+Sample the keyspace and estimate how much Redis memory each v1 key family
+uses – question blobs, answers, submission markers, assignment sets,
+adjudication sets and the derived indexes – and which datasets and users
+are the largest.
+
+Every key is visited once with SCAN, so the key counts per family are exact
+(or scaled from DBSIZE when --max-keys stops the walk early). `MEMORY USAGE`
+is issued for a Bernoulli sample of --sample-rate of them (plus the first
+key of every family, so small families get a size too); totals are
+count × sampled mean, with a normal-approximation confidence interval
+(finite-population corrected). Answer keys are split exactly like
+export_difficulties.py `extract_ids_from_key` (v1:<pid>:<ds>:<uid…>) after
+the non-answer families of response_counts.py are ruled out.
+
+All commands go through a token bucket (--max-ops per second, SCAN and each
+MEMORY USAGE count as one), so it is safe to point at production.
+
+Run:
+    python py/redis_memory.py [--sample-rate 0.05] [--max-ops 500]
+    python py/redis_memory.py --json report.json --top 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import statistics
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import redis
+
+from response_counts import NON_ANSWER_FAMILIES
+
+REDIS_URL     = "redis://localhost:6397/0"
+SCAN_COUNT    = 1_000
+SAMPLE_RATE   = 0.05
+MAX_OPS       = 500
+PIPELINE_SIZE = 50
+MIN_GROUP_N   = 5        # own mean for a dataset / user only with this many samples
+
+# v1:<name> keys that are a single global structure
+GLOBAL_FAMILIES = {
+    "usernames": "users", "datasets": "dataset_list", "archived": "dataset_list",
+    "adjudications": "adjudications", "past_adjudications": "adjudications",
+    "versions": "versions", "agreement": "agreement",
+}
+
+# v1:adjview:<first>… keys that index the view rather than hold one row:
+# adjview:pending / adjview:past (ZSET) and adjview:skip:pending|past (SET)
+ADJVIEW_INDEXES = {"pending", "past", "skip"}
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def extract_ids_from_key(key: str) -> Optional[Tuple[str, str, str]]:
+    """Same split as export_difficulties.extract_ids_from_key."""
+    parts = key.split(":")
+    if len(parts) < 4:
+        return None
+    return parts[1], parts[2], ":".join(parts[3:])
+
+
+def classify(key: str, datasets: frozenset) -> Tuple[str, Optional[str], Optional[str]]:
+    """key → (family, dataset, pid); dataset / pid are None when not attributable."""
+    parts = key.split(":")
+    if parts[0] != "v1" or len(parts) < 2:
+        return "other", None, None
+    name = parts[1]
+    if len(parts) == 2:
+        return GLOBAL_FAMILIES.get(name, name), None, None
+
+    if name not in NON_ANSWER_FAMILIES:
+        ids = extract_ids_from_key(key)
+        if ids is None:
+            return "other", None, None
+        pid, ds, uid = ids
+        return ("marker" if uid == "meta" else "answer"), ds, pid
+
+    rest = parts[2:]
+    if name == "datasets":
+        if len(rest) == 1:
+            return "dataset_uids", rest[0], None
+        return ("dataset_meta" if rest[-1] == "meta" else "question"), rest[0], None
+    if name == "assignments":
+        return ("assignment", rest[0], None) if rest[0] in datasets else ("assignment", None, rest[0])
+    if name == "campaigns":
+        return "campaign", None, None
+    if name == "adjview" and rest[0] in ADJVIEW_INDEXES:
+        return "adjview_index", None, None
+    if name in ("answered", "adjview"):           # answered:<ds>:<pid>, adjview:<pid>:<ds>:<uid>
+        if len(rest) >= 2:
+            ds, pid = (rest[0], rest[1]) if name == "answered" else (rest[1], rest[0])
+            return name, ds, pid
+        return name, None, None
+    if name == "open":
+        return "open", None, rest[0]
+    if name in ("progress", "rcount", "gt"):
+        return name, rest[0], None
+    return name, None, None
+
+
+# ── rate limiting ────────────────────────────────────────────────────────────
+class TokenBucket:
+    """Blocks so that at most *rate* commands are issued per second."""
+
+    def __init__(self, rate: float) -> None:
+        self.rate = max(rate, 1.0)
+        self.tokens = self.rate
+        self.stamp = time.monotonic()
+
+    def take(self, n: int = 1) -> None:
+        while True:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp = now
+            if self.tokens >= n:
+                self.tokens -= n
+                return
+            time.sleep((n - self.tokens) / self.rate)
+
+
+def throttled_scan(r: redis.Redis, bucket: TokenBucket, count: int = SCAN_COUNT) -> Iterator[str]:
+    cursor = 0
+    while True:
+        bucket.take()
+        cursor, keys = r.scan(cursor=cursor, count=count)
+        for key in keys:
+            yield to_str(key)
+        if int(cursor) == 0:
+            return
+
+
+# ── estimation ───────────────────────────────────────────────────────────────
+@dataclass
+class Family:
+    keys: int = 0
+    samples: List[int] = field(default_factory=list)
+
+    def estimate(self, z: float, scale: float = 1.0) -> dict:
+        n, population = len(self.samples), self.keys * scale
+        if not n:
+            return {"keys": round(population), "sampled": 0, "bytes": None, "ci": None}
+        mean = statistics.fmean(self.samples)
+        sd = statistics.stdev(self.samples) if n > 1 else 0.0
+        fpc = math.sqrt(max(0.0, (self.keys - n) / (self.keys - 1))) if self.keys > 1 else 0.0
+        return {"keys": round(population), "sampled": n, "mean": round(mean, 1),
+                "bytes": round(population * mean),
+                "ci": round(population * z * sd / math.sqrt(n) * fpc)}
+
+
+def profile(r: redis.Redis, sample_rate: float = SAMPLE_RATE, max_ops: float = MAX_OPS,
+            max_keys: Optional[int] = None, confidence: float = 0.95, top: int = 10,
+            seed: Optional[int] = None) -> dict:
+    rng = random.Random(seed)
+    bucket = TokenBucket(max_ops)
+    bucket.take(2)
+    datasets = frozenset(to_str(d) for d in r.smembers("v1:datasets") | r.smembers("v1:archived"))
+    dbsize = r.dbsize()
+
+    families: Dict[str, Family] = defaultdict(Family)
+    # (family, group) → [keys, sampled bytes…] for datasets and users
+    by_ds: Dict[Tuple[str, str], Family] = defaultdict(Family)
+    by_pid: Dict[Tuple[str, str], Family] = defaultdict(Family)
+
+    batch: List[Tuple[str, Optional[str], Optional[str], str]] = []
+
+    def flush() -> None:
+        bucket.take(len(batch))
+        pipe = r.pipeline(transaction=False)
+        for *_, key in batch:
+            pipe.memory_usage(key)
+        for (fam, ds, pid, _), size in zip(batch, pipe.execute()):
+            if size is None:                    # expired between SCAN and MEMORY USAGE
+                continue
+            families[fam].samples.append(size)
+            if ds:
+                by_ds[fam, ds].samples.append(size)
+            if pid:
+                by_pid[fam, pid].samples.append(size)
+        batch.clear()
+
+    scanned = 0
+    started = time.monotonic()
+    for key in throttled_scan(r, bucket):
+        fam, ds, pid = classify(key, datasets)
+        families[fam].keys += 1
+        if ds:
+            by_ds[fam, ds].keys += 1
+        if pid:
+            by_pid[fam, pid].keys += 1
+        if families[fam].keys == 1 or rng.random() < sample_rate:
+            batch.append((fam, ds, pid, key))
+            if len(batch) >= PIPELINE_SIZE:
+                flush()
+        scanned += 1
+        if max_keys and scanned >= max_keys:
+            break
+    if batch:
+        flush()
+
+    scale = dbsize / scanned if max_keys and scanned >= max_keys and scanned else 1.0
+    z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+    fam_est = {name: fam.estimate(z, scale) for name, fam in families.items()}
+    fam_mean = {name: est.get("mean", 0.0) for name, est in fam_est.items()}
+
+    def rank(groups: Dict[Tuple[str, str], Family]) -> List[dict]:
+        totals: Dict[str, Dict[str, float]] = defaultdict(lambda: defaultdict(float))
+        for (name, group), fam in groups.items():
+            mean = (statistics.fmean(fam.samples) if len(fam.samples) >= MIN_GROUP_N
+                    else fam_mean.get(name, 0.0))
+            totals[group][name] += fam.keys * scale * mean
+        rows = [{"name": group, "bytes": round(sum(parts.values())),
+                 "families": {k: round(v) for k, v in sorted(parts.items(), key=lambda kv: -kv[1])}}
+                for group, parts in totals.items()]
+        return sorted(rows, key=lambda row: -row["bytes"])[:top]
+
+    estimated = sum(est["bytes"] or 0 for est in fam_est.values())
+    return {
+        "generatedAt": int(time.time() * 1000),
+        "dbsize": dbsize, "scanned": scanned, "scale": round(scale, 4),
+        "sampleRate": sample_rate, "confidence": confidence,
+        "seconds": round(time.monotonic() - started, 1),
+        "estimatedBytes": estimated,
+        "families": dict(sorted(fam_est.items(), key=lambda kv: -(kv[1]["bytes"] or 0))),
+        "datasets": rank(by_ds), "users": rank(by_pid),
+    }
+
+
+# ── output ───────────────────────────────────────────────────────────────────
+def human(n: Optional[float]) -> str:
+    if n is None:
+        return "–"
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if abs(n) < 1024 or unit == "GiB":
+            return f"{n:,.0f} {unit}" if unit == "B" else f"{n:,.1f} {unit}"
+        n /= 1024
+    return str(n)
+
+
+def print_report(report: dict) -> None:
+    total = report["estimatedBytes"] or 1
+    print(f"{'family':<16} {'keys':>11} {'sampled':>8} {'estimate':>12} "
+          f"{'± ' + format(report['confidence'], '.0%'):>12} {'share':>6}")
+    for name, est in report["families"].items():
+        share = f"{(est['bytes'] or 0) / total:.1%}"
+        print(f"{name:<16} {est['keys']:>11,} {est['sampled']:>8,} {human(est['bytes']):>12} "
+              f"{human(est['ci']):>12} {share:>6}")
+    for title in ("datasets", "users"):
+        if report[title]:
+            print(f"\nLargest {title}:")
+            for row in report[title]:
+                parts = ", ".join(f"{k} {human(v)}" for k, v in list(row["families"].items())[:3])
+                print(f"  • {row['name']:<32} {human(row['bytes']):>12}  ({parts})")
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Estimate Redis memory per v1 key family.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--sample-rate", type=float, default=SAMPLE_RATE,
+                        help="Fraction of keys measured with MEMORY USAGE")
+    parser.add_argument("--max-ops", type=float, default=MAX_OPS, help="Redis commands per second")
+    parser.add_argument("--max-keys", type=int, help="Stop the SCAN after this many keys")
+    parser.add_argument("--confidence", type=float, default=0.95)
+    parser.add_argument("--top", type=int, default=10, help="Datasets / users to list")
+    parser.add_argument("--seed", type=int, help="Sampling seed (reproducible runs)")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON ('-' = stdout only)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    report = profile(r, args.sample_rate, args.max_ops, args.max_keys,
+                     args.confidence, args.top, args.seed)
+    if args.json == "-":
+        json.dump(report, sys.stdout, indent=2)
+        print()
+        return
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(report, fh, indent=2)
+    print(f"\nDone – {report['scanned']:,} keys scanned in {report['seconds']}s, "
+          f"~{human(report['estimatedBytes'])} estimated in total.")
+
+
+if __name__ == "__main__":
+    main()
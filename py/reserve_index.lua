@@ -0,0 +1,27 @@
+-- Reserve the next <topic>_<index> dataset index of a campaign.
+-- Loaded by server.js getNextDataset() and py/pregenerate_datasets.py.
+--
+-- KEYS[1] = v1:campaigns:<topic>:meta   JSON {curIndex, numImages}, read only
+-- KEYS[2] = v1:campaigns:<topic>:index  HASH  next = first index never handed out
+--                                             (seeded from curIndex)
+-- KEYS[3] = v1:campaigns:<topic>:retry  LIST  indexes given back after a failed
+--                                             generation; handed out first
+--
+-- Returns the index, -1 when numImages is reached, -2 when the meta is
+-- missing, -3 when numImages is not set.
+local retry = redis.call('LPOP', KEYS[3])
+if retry then return tonumber(retry) end
+
+local raw = redis.call('GET', KEYS[1])
+if not raw then return -2 end
+local meta = cjson.decode(raw)
+local limit = tonumber(meta['numImages'] or meta['NumImages'])
+if limit == nil then return -3 end
+
+redis.call('HSETNX', KEYS[2], 'next', tonumber(meta['curIndex']) or 0)
+local idx = redis.call('HINCRBY', KEYS[2], 'next', 1) - 1
+if idx >= limit then
+  redis.call('HINCRBY', KEYS[2], 'next', -1)
+  return -1
+end
+return idx
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+response_counts.py
+──────────────────
+Per-question response counters, so `/submit_question` can enforce
+MAX_RESPONSES with one HINCRBY instead of SCANning `v1:*:<ds>:<uid>`.
+
+    v1:rcount:<ds>    HASH  <uid> → number of v1:<pid>:<ds>:<uid> answers
+
+The server increments the counter when a new answer is stored. Scripts that
+delete answers keep it in step:
+
+    from response_counts import uncount
+    uncount(r, ds, keys_to_del)      # call *before* the DEL pipeline runs
+
+Backfill and drift audit both rebuild the counts with one SCAN over `v1:*`
+(answer keys are v1:<pid>:<ds>:<uid>; meta markers and answers to uids no
+longer in `v1:datasets:<ds>` are ignored).
+
+Run:
+    python py/response_counts.py [datasets...]            # backfill
+    python py/response_counts.py --audit [datasets...] [--repair]
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import redis
+
+from latency_scan import AdaptiveScanner
+
+REDIS_URL     = "redis://localhost:6397/0"
+RCOUNT_PREFIX = "v1:rcount:"
+BATCH_SIZE    = 5_000
+
+# v1:<family>:… keys that are not answers
+NON_ANSWER_FAMILIES = {"datasets", "assignments", "campaigns", "progress", "rcount",
+                       "answered", "grading", "agreement", "gt", "adjview",
+                       "avail", "open"}
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def rcount_key(ds: str) -> str:
+    return f"{RCOUNT_PREFIX}{ds}"
+
+
+def answer_uid(key: str, ds: str) -> Optional[str]:
+    """uid of an answer key v1:<pid>:<ds>:<uid>, or None for anything else."""
+    parts = key.split(":", 3)
+    if len(parts) != 4 or parts[0] != "v1" or parts[2] != ds:
+        return None
+    if parts[1] in NON_ANSWER_FAMILIES or parts[3] == "meta":
+        return None
+    return parts[3]
+
+
+def uncount(r: redis.Redis, ds: str, keys: Iterable[str]) -> int:
+    """Decrement v1:rcount:<ds> for the answer keys in *keys* that exist."""
+    candidates = [(k, uid) for k in keys if (uid := answer_uid(to_str(k), ds))]
+    removed: Counter = Counter()
+    for start in range(0, len(candidates), BATCH_SIZE):
+        chunk = candidates[start:start + BATCH_SIZE]
+        pipe = r.pipeline(transaction=False)
+        for key, _ in chunk:
+            pipe.exists(key)
+        for (_, uid), exists in zip(chunk, pipe.execute()):
+            if exists:
+                removed[uid] += 1
+    if removed:
+        pipe = r.pipeline(transaction=False)
+        for uid, n in removed.items():
+            pipe.hincrby(rcount_key(ds), uid, -n)
+        pipe.execute()
+    return sum(removed.values())
+
+
+# ── backfill / audit ─────────────────────────────────────────────────────────
+def count_all(r: redis.Redis, datasets: Sequence[str]) -> Dict[str, Counter]:
+    """One SCAN over the keyspace → {ds: Counter(uid → answers)}."""
+    wanted = set(datasets)
+    uids: Dict[str, Set[str]] = {
+        ds: {to_str(u) for u in r.smembers(f"v1:datasets:{ds}")} for ds in wanted
+    }
+    counts: Dict[str, Counter] = defaultdict(Counter)
+    scanner = AdaptiveScanner(r)
+    for raw in scanner.scan_iter(match="v1:*:*:*"):
+        parts = to_str(raw).split(":", 3)
+        if len(parts) != 4 or parts[2] not in wanted:
+            continue
+        uid = answer_uid(to_str(raw), parts[2])
+        if uid and uid in uids[parts[2]]:
+            counts[parts[2]][uid] += 1
+    return {ds: counts.get(ds, Counter()) for ds in wanted}
+
+
+def read(r: redis.Redis, ds: str) -> Counter:
+    return Counter({to_str(k): int(v) for k, v in r.hgetall(rcount_key(ds)).items()})
+
+
+def write(r: redis.Redis, ds: str, counts: Counter) -> None:
+    pipe = r.pipeline(transaction=True)
+    pipe.delete(rcount_key(ds))
+    nonzero = {uid: n for uid, n in counts.items() if n > 0}
+    if nonzero:
+        pipe.hset(rcount_key(ds), mapping=nonzero)
+    pipe.execute()
+
+
+def audit(r: redis.Redis, datasets: Sequence[str],
+          repair: bool = False) -> List[Tuple[str, str, int, int]]:
+    """Return (ds, uid, stored, actual) for every drifted counter."""
+    drift = []
+    for ds, actual in sorted(count_all(r, datasets).items()):
+        stored = read(r, ds)
+        bad = [(ds, uid, stored.get(uid, 0), actual.get(uid, 0))
+               for uid in sorted(set(stored) | set(actual))
+               if stored.get(uid, 0) != actual.get(uid, 0)]
+        if bad and repair:
+            write(r, ds, actual)
+        drift.extend(bad)
+    return drift
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Backfill or audit v1:rcount:<ds> counters.")
+    parser.add_argument("datasets", nargs="*", help="Datasets (default: every v1:datasets member)")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--audit", action="store_true", help="Report counters that drifted")
+    parser.add_argument("--repair", action="store_true", help="With --audit: rewrite drifted hashes")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    datasets = args.datasets or sorted(r.smembers("v1:datasets"))
+
+    if not args.audit:
+        counts = count_all(r, datasets)
+        for ds, counter in counts.items():
+            write(r, ds, counter)
+        total = sum(sum(c.values()) for c in counts.values())
+        print(f"Done – counted {total:,} responses across {len(datasets)} dataset(s).")
+        return
+
+    drift = audit(r, datasets, repair=args.repair)
+    for ds, uid, stored, actual in drift:
+        print(f"  • {ds}/{uid}: stored={stored} actual={actual}")
+    verb = "repaired" if args.repair else "found"
+    print(f"{len(drift)} drifted counter(s) {verb} across {len(datasets)} dataset(s).")
+    if drift and not args.repair:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+sqlite_mirror.py
+────────────────
+Keep a local, indexed SQLite copy of the survey data, so ad-hoc questions
+("who answered X in dataset Y with difficulty > 3?") are SQL queries instead
+of yet another SCAN-and-GET script against production Redis.
+
+Tables (survey_mirror.sqlite by default):
+
+    answers(pid, dataset, uid, answer, difficulty, difficulty_raw, bad_question,
+            bad_reason, adjudication, orig_ts, edit_ts, raw)
+    questions(dataset, uid, question, label, map, raw)
+    datasets(dataset, label, description, topic, archived, raw)
+    submissions(pid, dataset, marker)           -- v1:<pid>:<ds>:meta
+    assignments(dataset, pid)                   -- v1:assignments:<ds>
+    sync(name, value)                           -- bootstrap / event bookkeeping
+
+`difficulty` is the numeric value when the answer has one (NULL otherwise);
+`raw` is always the stored JSON, so `json_extract(raw, '$.field')` reaches
+anything not broken out into a column.
+
+The daemon subscribes to keyspace notifications for `v1:*` first, then
+bootstraps with one paced SCAN (latency_scan.AdaptiveScanner) in a single
+transaction, then replays what changed meanwhile and keeps following.
+Notified keys are coalesced for --flush-ms and re-read in bulk, so the
+mirror never interprets events, it just copies current values. Keys are
+classified like redis_memory.py. Answers and questions of archived
+datasets (archive_datasets.py) are kept when Redis drops them, and loaded
+from the archive at bootstrap.
+
+The server needs `notify-keyspace-events` with at least `K$sg`; --configure
+adds the missing flags.
+
+Run:
+    python py/sqlite_mirror.py [--configure]           # bootstrap + follow
+    python py/sqlite_mirror.py --once                  # bootstrap only
+    python py/sqlite_mirror.py --query "SELECT pid, uid FROM answers WHERE difficulty > 3"
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+import redis
+
+from archive_datasets import ARCHIVED_SET, read_entry
+from latency_scan import AdaptiveScanner
+from redis_memory import classify
+
+REDIS_URL     = "redis://localhost:6397/0"
+ROOT          = Path(__file__).resolve().parent.parent
+MIRROR        = ROOT / "survey_mirror.sqlite"
+NOTIFY_FLAGS  = "K$sg"
+FLUSH_MS      = 200
+MAX_DIRTY     = 5_000
+
+SCHEMA = """
+PRAGMA journal_mode = WAL;
+CREATE TABLE IF NOT EXISTS answers (
+    pid            TEXT NOT NULL,
+    dataset        TEXT NOT NULL,
+    uid            TEXT NOT NULL,
+    answer         TEXT,
+    difficulty     REAL,
+    difficulty_raw TEXT,
+    bad_question   INTEGER NOT NULL DEFAULT 0,
+    bad_reason     TEXT,
+    adjudication   TEXT,
+    orig_ts        INTEGER,
+    edit_ts        INTEGER,
+    raw            TEXT NOT NULL,
+    PRIMARY KEY (pid, dataset, uid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS answers_question   ON answers(dataset, uid);
+CREATE INDEX IF NOT EXISTS answers_difficulty ON answers(dataset, difficulty);
+CREATE INDEX IF NOT EXISTS answers_orig_ts    ON answers(orig_ts);
+CREATE TABLE IF NOT EXISTS questions (
+    dataset  TEXT NOT NULL,
+    uid      TEXT NOT NULL,
+    question TEXT,
+    label    TEXT,
+    map      TEXT,
+    raw      TEXT NOT NULL,
+    PRIMARY KEY (dataset, uid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS questions_map ON questions(map);
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset     TEXT PRIMARY KEY,
+    label       TEXT,
+    description TEXT,
+    topic       TEXT,
+    archived    INTEGER NOT NULL DEFAULT 0,
+    raw         TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS datasets_topic ON datasets(topic);
+CREATE TABLE IF NOT EXISTS submissions (
+    pid     TEXT NOT NULL,
+    dataset TEXT NOT NULL,
+    marker  TEXT,
+    PRIMARY KEY (pid, dataset)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS assignments (
+    dataset TEXT NOT NULL,
+    pid     TEXT NOT NULL,
+    PRIMARY KEY (dataset, pid)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS assignments_pid ON assignments(pid);
+CREATE TABLE IF NOT EXISTS sync (
+    name  TEXT PRIMARY KEY,
+    value TEXT
+) WITHOUT ROWID;
+"""
+
+STRING_FAMILIES = {"answer", "marker", "question", "dataset_meta"}
+
+
+def to_str(value) -> str:
+    return value.decode("utf-8", "replace") if isinstance(value, bytes) else str(value)
+
+
+def _json(raw: Optional[str]) -> Optional[dict]:
+    try:
+        obj = json.loads(raw) if raw else None
+    except (json.JSONDecodeError, TypeError):
+        return None
+    return obj if isinstance(obj, dict) else None
+
+
+def _text(value) -> Optional[str]:
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value)
+
+
+def _number(value) -> Optional[float]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _int(value) -> Optional[int]:
+    n = _number(value)
+    return int(n) if n is not None else None
+
+
+# ── rows ─────────────────────────────────────────────────────────────────────
+def answer_row(pid: str, ds: str, uid: str, raw: str) -> tuple:
+    obj = _json(raw) or {}
+    difficulty = obj.get("difficulty")
+    return (pid, ds, uid, _text(obj.get("answer")), _number(difficulty), _text(difficulty),
+            int(bool(obj.get("badQuestion"))), obj.get("badReason") or None,
+            _text(obj.get("adjudication")), _int(obj.get("origTimestamp") or obj.get("timestamp")),
+            _int(obj.get("editTimestamp")), raw)
+
+
+def question_row(ds: str, uid: str, raw: str) -> tuple:
+    q = _json(raw) or {}
+    return (ds, uid, _text(q.get("Question") or q.get("question")), _text(q.get("Label")),
+            _text(q.get("Map") or q.get("map")), raw)
+
+
+def dataset_row(ds: str, raw: str) -> tuple:
+    meta = _json(raw) or {}
+    return (ds, meta.get("label"), meta.get("description"), (meta.get("topic") or "").strip(),
+            int("archived" in meta), raw)
+
+
+def key_uid(key: str) -> str:
+    return ":".join(key.split(":")[3:])
+
+
+# ── mirror ───────────────────────────────────────────────────────────────────
+class Mirror:
+    """Write side of the SQLite copy."""
+
+    def __init__(self, path: Path = MIRROR):
+        self.path = path
+        self.db = sqlite3.connect(str(path))
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        self.db.close()
+
+    def archived(self) -> Set[str]:
+        return {row[0] for row in self.db.execute("SELECT dataset FROM datasets WHERE archived = 1")}
+
+    def set_state(self, name: str, value) -> None:
+        self.db.execute("INSERT OR REPLACE INTO sync(name, value) VALUES (?, ?)", (name, str(value)))
+
+    def upsert(self, answers: Iterable[tuple] = (), questions: Iterable[tuple] = (),
+               datasets: Iterable[tuple] = (), submissions: Iterable[tuple] = ()) -> None:
+        db = self.db
+        db.executemany("INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?, ?)", datasets)
+        db.executemany("INSERT OR REPLACE INTO questions VALUES (?, ?, ?, ?, ?, ?)", questions)
+        db.executemany("INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                       answers)
+        db.executemany("INSERT OR REPLACE INTO submissions VALUES (?, ?, ?)", submissions)
+
+    def replace_assignments(self, ds: str, pids: Iterable[str]) -> None:
+        self.db.execute("DELETE FROM assignments WHERE dataset = ?", (ds,))
+        self.db.executemany("INSERT OR IGNORE INTO assignments VALUES (?, ?)",
+                            [(ds, pid) for pid in pids])
+
+    def remove(self, family: str, ds: str, pid: Optional[str], uid: str,
+               archived: Set[str]) -> None:
+        if family == "answer" and ds not in archived:
+            self.db.execute("DELETE FROM answers WHERE pid = ? AND dataset = ? AND uid = ?",
+                            (pid, ds, uid))
+        elif family == "question" and ds not in archived:
+            self.db.execute("DELETE FROM questions WHERE dataset = ? AND uid = ?", (ds, uid))
+        elif family == "marker":
+            self.db.execute("DELETE FROM submissions WHERE pid = ? AND dataset = ?", (pid, ds))
+        elif family == "dataset_meta":
+            for table in ("datasets", "questions", "answers", "assignments"):
+                self.db.execute(f"DELETE FROM {table} WHERE dataset = ?", (ds,))
+
+    def clear(self) -> None:
+        for table in ("answers", "questions", "datasets", "submissions", "assignments"):
+            self.db.execute(f"DELETE FROM {table}")
+
+
+# ── syncing ──────────────────────────────────────────────────────────────────
+def known_datasets(r: redis.Redis) -> frozenset:
+    return frozenset(to_str(d) for d in r.smembers("v1:datasets") | r.smembers(ARCHIVED_SET))
+
+
+def _split(keys: Iterable[str], datasets: frozenset) -> Tuple[list, List[str]]:
+    """Mirrored string keys as (key, family, ds, pid) and the datasets whose assignments to read."""
+    strings, assignment_sets = [], []
+    for key in keys:
+        family, ds, pid = classify(key, datasets)
+        if family in STRING_FAMILIES and ds:
+            strings.append((key, family, ds, pid))
+        elif family == "assignment" and ds:
+            assignment_sets.append(ds)
+    return strings, assignment_sets
+
+
+def _apply(r: redis.Redis, mirror: Mirror, scanner: AdaptiveScanner, strings: list,
+           assignment_sets: List[str], removals: bool = True) -> int:
+    """Read the keys' current values and write them; caller owns the transaction."""
+    values = scanner.mget([key for key, *_ in strings])
+    members: List = []
+    if assignment_sets:
+        pipe = r.pipeline(transaction=False)
+        for ds in assignment_sets:
+            pipe.smembers(f"v1:assignments:{ds}")
+        members = scanner.timed(pipe.execute)      # a read – counts against the budget
+
+    rows: Dict[str, list] = defaultdict(list)
+    gone: List[Tuple[str, str, Optional[str], str]] = []
+    for (key, family, ds, pid), raw in zip(strings, values):
+        uid = key_uid(key)
+        if raw is None:
+            gone.append((family, ds, pid, uid))
+        elif family == "answer":
+            rows["answers"].append(answer_row(pid, ds, uid, to_str(raw)))
+        elif family == "question":
+            rows["questions"].append(question_row(ds, uid, to_str(raw)))
+        elif family == "dataset_meta":
+            rows["datasets"].append(dataset_row(ds, to_str(raw)))
+        else:
+            rows["submissions"].append((pid, ds, to_str(raw)))
+
+    mirror.upsert(**rows)                           # metas first: removals check `archived`
+    for ds, pids in zip(assignment_sets, members):
+        mirror.replace_assignments(ds, sorted(to_str(p) for p in pids))
+    if removals and gone:
+        archived = mirror.archived()
+        for family, ds, pid, uid in gone:
+            mirror.remove(family, ds, pid, uid, archived)
+    return len(strings) + len(assignment_sets)
+
+
+def sync_keys(r: redis.Redis, mirror: Mirror, keys: Iterable[str],
+              scanner: Optional[AdaptiveScanner] = None,
+              datasets: Optional[frozenset] = None) -> int:
+    """Re-read *keys* from Redis and copy their current state; return keys applied."""
+    strings, assignment_sets = _split(keys, datasets if datasets is not None else known_datasets(r))
+    if not strings and not assignment_sets:
+        return 0
+    with mirror.db:
+        n = _apply(r, mirror, scanner or AdaptiveScanner(r), strings, assignment_sets)
+        mirror.set_state("last_sync", int(time.time() * 1000))
+    return n
+
+
+def load_archived(mirror: Mirror, ds: str, raw_meta: str) -> int:
+    entry = (_json(raw_meta) or {}).get("archived")
+    if not entry:
+        return 0
+    try:
+        doc = read_entry(entry)
+    except (OSError, ValueError) as exc:
+        print(f"  ⚠ {ds}: archive unreadable ({exc})", file=sys.stderr)
+        return 0
+    mirror.upsert(
+        questions=[question_row(ds, uid, raw) for uid, raw in doc["questions"].items()],
+        answers=[answer_row(pid, ds, uid, raw)
+                 for pid, by_uid in doc["answers"].items() for uid, raw in by_uid.items()])
+    return sum(len(a) for a in doc["answers"].values())
+
+
+def bootstrap(r: redis.Redis, mirror: Mirror, scanner: AdaptiveScanner,
+              with_archive: bool = True) -> Dict[str, int]:
+    """Replace the mirror's contents with one paced pass over v1:*."""
+    datasets = known_datasets(r)
+    counts = {"keys": 0, "archived_answers": 0}
+    with mirror.db:                                  # readers keep the old snapshot until commit
+        mirror.clear()
+        for batch in scanner.scan_batches(match="v1:*"):
+            strings, assignment_sets = _split((to_str(k) for k in batch), datasets)
+            if strings or assignment_sets:
+                counts["keys"] += _apply(r, mirror, scanner, strings, assignment_sets,
+                                         removals=False)
+        if with_archive:
+            for ds, raw in mirror.db.execute(
+                    "SELECT dataset, raw FROM datasets WHERE archived = 1").fetchall():
+                counts["archived_answers"] += load_archived(mirror, ds, raw)
+        mirror.set_state("bootstrapped_at", int(time.time() * 1000))
+    return counts
+
+
+# ── following ────────────────────────────────────────────────────────────────
+def ensure_notifications(r: redis.Redis, configure: bool) -> None:
+    current = to_str(r.config_get("notify-keyspace-events").get("notify-keyspace-events", ""))
+    have = set(current.replace("A", "g$lshzxe"))
+    missing = [f for f in NOTIFY_FLAGS if f not in have]
+    if not missing:
+        return
+    if not configure:
+        sys.exit(f"notify-keyspace-events is {current!r}; needs {NOTIFY_FLAGS!r} "
+                 f"(rerun with --configure to add it)")
+    r.config_set("notify-keyspace-events", current + "".join(missing))
+    print(f"  • notify-keyspace-events: {current!r} → {current + ''.join(missing)!r}")
+
+
+def follow(r: redis.Redis, mirror: Mirror, flush_ms: int = FLUSH_MS,
+           with_archive: bool = True) -> None:
+    db = r.connection_pool.connection_kwargs.get("db", 0)
+    prefix = f"__keyspace@{db}__:"
+    while True:
+        pubsub = r.pubsub(ignore_subscribe_messages=True)
+        try:
+            pubsub.psubscribe(f"{prefix}v1:*")       # before the scan: nothing slips through
+            scanner = AdaptiveScanner(r)
+            counts = bootstrap(r, mirror, scanner, with_archive)
+            print(f"  • bootstrap: {counts['keys']:,} keys, "
+                  f"{counts['archived_answers']:,} archived answers; {scanner.report()}")
+
+            dirty: Set[str] = set()
+            datasets = known_datasets(r)
+            scanner = AdaptiveScanner(r)
+            deadline = time.monotonic() + flush_ms / 1000
+            while True:
+                message = pubsub.get_message(timeout=flush_ms / 1000)
+                if message and message.get("type") == "pmessage":
+                    key = to_str(message["channel"])[len(prefix):]
+                    dirty.add(key)
+                    if key in ("v1:datasets", ARCHIVED_SET):
+                        datasets = known_datasets(r)
+                if dirty and (time.monotonic() >= deadline or len(dirty) >= MAX_DIRTY):
+                    sync_keys(r, mirror, sorted(dirty), scanner, datasets)
+                    dirty.clear()
+                if time.monotonic() >= deadline:
+                    deadline = time.monotonic() + flush_ms / 1000
+        except redis.ConnectionError as exc:
+            print(f"  ⚠ lost Redis ({exc}); re-bootstrapping in 5s", file=sys.stderr)
+            time.sleep(5)
+        finally:
+            pubsub.close()
+
+
+def run_query(path: Path, sql: str) -> None:
+    db = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    cur = db.execute(sql)
+    print("\t".join(col[0] for col in cur.description or ()))
+    for row in cur:
+        print("\t".join("" if v is None else str(v) for v in row))
+    db.close()
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Mirror v1 survey data into SQLite.")
+    parser.add_argument("--redis-url", default=REDIS_URL)
+    parser.add_argument("--db", type=Path, default=MIRROR, help="SQLite file")
+    parser.add_argument("--once", action="store_true", help="Bootstrap and exit")
+    parser.add_argument("--configure", action="store_true",
+                        help="Enable the keyspace notifications the daemon needs")
+    parser.add_argument("--flush-ms", type=int, default=FLUSH_MS,
+                        help="Coalesce notified keys for this long before re-reading them")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="Do not load archived datasets from archive/")
+    parser.add_argument("--query", metavar="SQL", help="Run a read-only query against the mirror")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    args = parse_args(argv)
+    if args.query:
+        run_query(args.db, args.query)
+        return
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    mirror = Mirror(args.db)
+    try:
+        if args.once:
+            scanner = AdaptiveScanner(r)
+            counts = bootstrap(r, mirror, scanner, not args.no_archive)
+            print(f"Done – mirrored {counts['keys']:,} keys into {args.db} "
+                  f"({counts['archived_answers']:,} archived answers); {scanner.report()}")
+            return
+        ensure_notifications(r, args.configure)
+        follow(r, mirror, args.flush_ms, not args.no_archive)
+    except KeyboardInterrupt:
+        print("Done – stopped.")
+    finally:
+        mirror.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+survey.py
+─────────
+One entry point for the dataset maintenance scripts in py/.
+
+    add-dataset       <ds> <topic> <jsonl>                  add_dataset.py
+    update-questions  <ds> <jsonl> [--keep-responses]       update_questions.py
+    del-questions     <ds> <uid …>                          del_questions.py
+    delete-dataset    <ds>                                  delete_dataset.py
+    add-eval          <pid> <ds> <jsonl>                    add_eval.py
+    add-unmatched     <pid1> <pid2> <ds> <json | ->         add_unmatched_response.py
+    export            difficulties | adjudications [opts]   export_difficulties.py /
+                                                            export_adjudications.py
+    purge                                                   purge_non_v1.py
+    migrate                                                 migrate_to_v1.py
+
+Each subcommand imports its module only when it runs, so `--help` and the
+commands the server spawns per submission don't pay for redis / tqdm /
+requests imports of commands they don't use; this file itself imports only
+the standard library. The mutating modules import their sibling helpers
+(adjudication view, bundles, progress, …) inside the function that runs
+the command for the same reason. The old `python py/<script>.py …` invocations still
+work – their `__main__` blocks forward here.
+
+Every subcommand takes --redis-url and --json. With --json the scripts'
+progress output goes to stderr and stdout carries exactly one object:
+
+    {"command": "add-eval", "ok": true, "result": {...}, "error": null,
+     "ms": {"startupCpu": 31.2, "import": 48.0, "run": 12.5}}
+
+`startupCpu` is the CPU time the process spent before the subcommand's
+module was imported (interpreter start-up plus argument parsing); `import`
+is that module's import time. Use `python -X importtime py/survey.py --help`
+to see where start-up time goes. Destructive commands ask for confirmation
+unless --yes is given, and require --yes with --json.
+
+Run:
+    python py/survey.py add-eval <pid> <ds> evals.jsonl --json
+    python py/survey.py delete-dataset Urban_1 --yes
+    python py/survey.py export adjudications --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import importlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# export_adjudications is a py/ sibling; export_difficulties lives in the repo
+# root (it imports its py/ helpers itself), so `export` also puts ROOT on sys.path
+EXPORTS = {"difficulties": "export_difficulties", "adjudications": "export_adjudications"}
+
+
+def _existing(path: Path) -> Path:
+    if not path.exists():
+        sys.exit(f"{path} not found")
+    return path
+
+
+def _unmatched(raw: str) -> list:
+    text = sys.stdin.read() if raw == "-" else raw
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as e:
+        sys.exit(f"unmatched responses are not valid JSON ({e})")
+
+
+def _confirm(args: argparse.Namespace) -> bool:
+    return not args.yes
+
+
+# name → (module, runner); runners get the imported module and the parsed args
+COMMANDS: Dict[str, Tuple[str, Callable[[Any, argparse.Namespace], Any]]] = {
+    "add-dataset": ("add_dataset",
+                    lambda m, a: m.main(a.dataset, a.topic, _existing(a.jsonl))),
+    "update-questions": ("update_questions",
+                         lambda m, a: m.main(a.dataset, _existing(a.jsonl),
+                                             delete=not a.keep_responses, confirm=_confirm(a))),
+    "del-questions": ("del_questions",
+                      lambda m, a: m.main(a.dataset, a.uids, confirm=_confirm(a))),
+    "delete-dataset": ("delete_dataset",
+                       lambda m, a: m.main(a.dataset, confirm=_confirm(a))),
+    "add-eval": ("add_eval",
+                 lambda m, a: m.main(a.pid, a.dataset, _existing(a.jsonl))),
+    "add-unmatched": ("add_unmatched_response",
+                      lambda m, a: m.main(a.pid1, a.pid2, a.dataset, _unmatched(a.responses))),
+    "export": ("", lambda m, a: m.main([*(["--redis-url", a.redis_url] if a.redis_url else []),
+                                        *a.options])),
+    "purge": ("purge_non_v1", lambda m, a: m.main(confirm=_confirm(a))),
+    "migrate": ("migrate_to_v1", lambda m, a: m.main()),
+}
+DESTRUCTIVE = {"update-questions", "del-questions", "delete-dataset", "purge"}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--redis-url", help="Override the script's REDIS_URL")
+    common.add_argument("--json", action="store_true",
+                        help="Print one JSON result object on stdout; progress goes to stderr")
+    confirm = argparse.ArgumentParser(add_help=False)
+    confirm.add_argument("--yes", action="store_true", help="Do not ask for confirmation")
+
+    parser = argparse.ArgumentParser(prog="survey", description="Survey dataset maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    p = sub.add_parser("add-dataset", parents=[common], help="Load a JSONL file as a new dataset")
+    p.add_argument("dataset")
+    p.add_argument("topic")
+    p.add_argument("jsonl", type=Path)
+
+    p = sub.add_parser("update-questions", parents=[common, confirm],
+                       help="Overwrite questions of a dataset from a JSONL file")
+    p.add_argument("dataset")
+    p.add_argument("jsonl", type=Path)
+    p.add_argument("--keep-responses", action="store_true",
+                   help="Keep existing answers to the updated questions")
+
+    p = sub.add_parser("del-questions", parents=[common, confirm],
+                       help="Remove questions and their answers from a dataset")
+    p.add_argument("dataset")
+    p.add_argument("uids", nargs="+")
+
+    p = sub.add_parser("delete-dataset", parents=[common, confirm],
+                       help="Remove a dataset and every answer to it")
+    p.add_argument("dataset")
+
+    p = sub.add_parser("add-eval", parents=[common], help="Set llm_eval on one user's answers")
+    p.add_argument("pid")
+    p.add_argument("dataset")
+    p.add_argument("jsonl", type=Path)
+
+    p = sub.add_parser("add-unmatched", parents=[common],
+                       help="Record disagreements between two annotators")
+    p.add_argument("pid1")
+    p.add_argument("pid2")
+    p.add_argument("dataset")
+    p.add_argument("responses", help="JSON array, or - to read it from stdin")
+
+    p = sub.add_parser("export", parents=[common], help="Run one of the exporters")
+    p.add_argument("kind", choices=sorted(EXPORTS))   # further options go to the exporter
+
+    sub.add_parser("purge", parents=[common, confirm], help="Delete every key outside v1:")
+    sub.add_parser("migrate", parents=[common], help="Build the v1 layout from the legacy keys")
+    return parser
+
+
+def load(args: argparse.Namespace):
+    """Import the subcommand's module and point it at --redis-url."""
+    name = COMMANDS[args.command][0] or EXPORTS[args.kind]
+    if args.command == "export" and str(ROOT) not in sys.path:
+        sys.path.insert(0, str(ROOT))
+    module = importlib.import_module(name)
+    if args.redis_url and args.command != "export":
+        module.REDIS_URL = args.redis_url
+        if hasattr(module, "r"):               # migrate_to_v1 connects at import time
+            module.r = module.redis.Redis.from_url(args.redis_url, decode_responses=True)
+    return module
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command != "export":
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    args.options = extra
+    if args.json and args.command in DESTRUCTIVE and not args.yes:
+        sys.exit(f"survey {args.command} --json needs --yes (there is no one to confirm)")
+
+    startup = time.process_time()
+    if not args.json:
+        module = load(args)
+        result = COMMANDS[args.command][1](module, args)
+        return 1 if isinstance(result, dict) and result.get("aborted") else 0
+
+    out: Dict[str, Any] = {"command": args.command, "ok": False, "result": None, "error": None}
+    ms = {"startupCpu": round(startup * 1000, 1)}
+    with contextlib.redirect_stdout(sys.stderr):
+        t0 = time.perf_counter()
+        try:
+            module = load(args)
+            ms["import"] = round((time.perf_counter() - t0) * 1000, 1)
+            t0 = time.perf_counter()
+            out["result"] = COMMANDS[args.command][1](module, args)
+            out["ok"] = not (isinstance(out["result"], dict) and out["result"].get("aborted"))
+        except SystemExit as exc:              # the scripts sys.exit("message") on bad input
+            out["ok"] = exc.code in (None, 0)
+            out["error"] = None if out["ok"] else str(exc.code)
+        except Exception as exc:
+            out["error"] = f"{type(exc).__name__}: {exc}"
+        ms["run"] = round((time.perf_counter() - t0) * 1000, 1)
+    out["ms"] = ms
+    print(json.dumps(out, default=str))
+    return 0 if out["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
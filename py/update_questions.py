@@ -13,12 +13,13 @@ everything directly in Redis using the schema:
     v1:campaigns:<topic>:meta     JSON({curIndex,numImages})
 
 Run:
-    python add_dataset_to_redis.py <topic> <index:int> <jsonl_path>
+    python py/survey.py update-questions <ds_id> <jsonl_path> [--keep-responses] [--yes]
 
-If the dataset already exists nothing is inserted.
+Existing answers to the updated uids are deleted unless --keep-responses is
+given; every assignee's submission marker is always cleared.
 """
 
-import sys, json, uuid, redis, requests
+import sys, json, uuid, redis
 from pathlib import Path
 from tqdm import tqdm               # purely for a nice progress bar
 
@@ -26,7 +27,16 @@ REDIS_URL  = "redis://localhost:6397/0"
 SERVER_URL = "http://localhost:3000"
 BATCH_SIZE = 5_000
 
-def main(ds_id: str, jsonl_file: Path, delete=True) -> None:
+def main(ds_id: str, jsonl_file: Path, delete=True, confirm: bool = True) -> dict:
+    from adjudication_view import refresh_dataset
+    from answered_bitmaps import rebuild
+    from availability import refresh_users
+    from build_question_bundles import build_bundle
+    from ground_truth import store as store_ground_truth
+    from invalidation import publish
+    from progress import refresh
+    from response_counts import uncount
+
     ds_set_key   = f"v1:datasets:{ds_id}"
 
     r = redis.Redis.from_url(REDIS_URL, decode_responses=False)
@@ -71,10 +81,11 @@ def main(ds_id: str, jsonl_file: Path, delete=True) -> None:
     print(f"Users    : {len(assigned_users)}")
     print(f"Questions to update: {len(questions):,}")
     print(f"Existing responses to delete: {(len(keys_to_del)-len(assigned_users)):,}")
-    if input("Proceed? [y/N] ").strip().lower() != "y":
+    if confirm and input("Proceed? [y/N] ").strip().lower() != "y":
         print("Aborted.")
-        return
+        return {"dataset": ds_id, "aborted": True}
 
+    uncount(r, ds_id, keys_to_del)      # before the answers disappear
     with r.pipeline() as pipe:
         pending = 0
         for k, obj in tqdm(questions, unit="key"):
@@ -90,19 +101,17 @@ def main(ds_id: str, jsonl_file: Path, delete=True) -> None:
         if pending:
             pipe.execute()
 
+    refresh(r, ds_id)
+    refresh_users(r, ds_id)             # submission markers were deleted
+    rebuild(r, ds_id)                   # question positions may have moved
+    store_ground_truth(r, ds_id, uids)
+    refresh_dataset(r, ds_id, uids)
+    publish(r, ds_id, "questions", uids)
+    build_bundle(r, ds_id)
     print(f"Done – {ds_id} updated with {len(entries)} questions.")
+    return {"dataset": ds_id, "questions": len(entries),
+            "deletedKeys": len(keys_to_del)}
 
 if __name__ == "__main__":
-    delete = True
-    if len(sys.argv) == 1:
-        ds_id = "UrbanAccuracy"
-        jsonl = Path("/storage/cmarnold/projects/maps/Urban_del_updates.jsonl")
-    elif len(sys.argv) != 4:
-        sys.exit("usage: add_dataset_to_redis.py <topic> <index:int> <jsonl_path>")
-    else:
-        ds_id  = sys.argv[1]
-        topic  = sys.argv[2]
-        jsonl  = Path(sys.argv[3])
-    if not jsonl.exists():
-        sys.exit(f"{jsonl} not found")
-    main(ds_id, jsonl, delete)
+    from survey import main as survey
+    sys.exit(survey(["update-questions", *sys.argv[1:]]))
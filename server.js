@@ -14,12 +14,13 @@ const express = require('express');
 const { promisify } = require('util');
 const fs            = require('fs');
 const path          = require('path');
+const zlib          = require('zlib');
 const bodyParser    = require('body-parser');
-const { createClient } = require('redis');
+const { createClient, commandOptions } = require('redis');
 const sharp         = require('sharp');
 const { execFile }  = require('child_process');
 const { randomUUID } = require('crypto');
-const { pythonBin, pythonRoot, gradeDataset, createDataset, compareResponses, addEval, addUnmatchedResponse, surveyPython, surveyRoot} = require('./public/config/paths');
+const { pythonBin, pythonRoot, gradeDataset, createDataset, compareResponses, surveyCli, surveyPython, surveyRoot, availabilityIndex } = require('./public/config/paths');
 const { get } = require('http');
 
 const ADJUDICATION_PASSCODE = 'letmein';
@@ -30,8 +31,10 @@ let DATASET_IDS   = [];           // [id, id, …]
 // let DATASETS_MAP  = {};           // id → {id,label}
 
 const MAX_RESPONSES = 10;
+const MAX_ASSIGNEES = 2;          // annotators per (non-accuracy) campaign dataset
 
 const execFileAsync = promisify(execFile);
+const gunzipAsync   = promisify(zlib.gunzip);
 
 /**
  * Redis Schema
@@ -63,6 +66,17 @@ const app = express();
 app.use(bodyParser.json());
 app.use(express.static(path.join(__dirname, 'public')));
 app.use('/maps', express.static(path.join(__dirname, 'maps')));
+// content-addressed variants from py/build_thumbnails.py – safe to cache forever
+app.use('/thumbs', express.static(path.join(__dirname, 'thumbs'), { maxAge: '365d', immutable: true }));
+// DeepZoom pyramids from py/build_tiles.py; tiles/index.json maps Map → .dzi
+app.use('/tiles', express.static(path.join(__dirname, 'tiles'), {
+  maxAge: '365d',
+  immutable: true,
+  setHeaders: (res, fp) => {
+    if (path.basename(fp) === 'index.json' && path.dirname(fp) === path.join(__dirname, 'tiles'))
+      res.setHeader('Cache-Control', 'no-cache');
+  }
+}));
 
 const redis = createClient({ url: `redis://localhost:${REDIS_PORT}` });
 
@@ -72,6 +86,13 @@ const v1Users       = v1('usernames');                // set of pids
 const v1AssignUser  = pid => v1(`assignments:${pid}`);// set of datasets for a pid
 const v1AssignDb    = ds => v1(`assignments:${ds}`);
 const v1AnswerKey   = (pid, ds, uid) => v1(`${pid}:${ds}:${uid}`);
+const v1ProgressKey = ds => v1(`progress:${ds}`);
+const v1RcountKey   = ds => v1(`rcount:${ds}`);
+const v1AnsweredKey = (ds, pid) => v1(`answered:${ds}:${pid}`);
+const v1GtKey       = ds => v1(`gt:${ds}`);
+const v1AvailKey    = topic => v1(`avail:${topic}`);          // ZSET ds → assignees
+const v1AvailAccKey = topic => v1(`avail:${topic}:accuracy`); // SET of *Accuracy datasets
+const v1OpenKey     = pid => v1(`open:${pid}`);               // SET of unsubmitted assignments
 const isUrbanDataset = dataset =>
   typeof dataset === 'string' && dataset.toLowerCase().startsWith('urban');
 const isAccuracyDataset = dataset =>
@@ -81,32 +102,25 @@ const isTrainingDataset = dataset =>
 const hasGroundTruthSuffix = dataset =>
   isAccuracyDataset(dataset) || isTrainingDataset(dataset);
 
-async function gradeAndEvaluateDataset(pid, dataset) {
-  const gradeOut = await execFileAsync(
-    pythonBin,
-    [gradeDataset, pid, dataset],
-    { cwd: pythonRoot }
-  );
-  const lastLine = gradeOut.stdout.split('\n').filter(Boolean).pop() || '{}';
-  const parsed = JSON.parse(lastLine);
-  const accuracy = parsed.accuracy;
-  const evalFile = parsed.eval_file;
-  if (typeof accuracy !== 'number' && typeof accuracy !== 'string') {
-    throw new Error('missing accuracy field');
-  }
+/* grading jobs are consumed by py/grading_worker.py (consumer group `graders`) */
+const GRADING_STREAM = 'v1:grading:jobs';
 
-  if (evalFile) {
-    await execFileAsync(
-      surveyPython,
-      [addEval, pid, dataset, evalFile],
-      { cwd: surveyRoot }
-    );
-  }
+/* this user's answers are the ground-truth baseline of *Accuracy / *Training sets */
+const BASELINE_PID = 'jkdewitt';
 
-  await redis.set(`v1:${pid}:${dataset}:meta`, accuracy);
-  return accuracy;
+/* notify: the worker reports the grade to /admin/graded (submissions only –
+   regrades must not hand out datasets) */
+async function enqueueGrading(pid, dataset, { notify = false } = {}) {
+  const fields = { pid, dataset, enqueued: String(Date.now()) };
+  if (notify) fields.notify = '1';
+  return redis.xAdd(GRADING_STREAM, '*', fields);
 }
 
+/* only a passed test (or a Training set) unlocks the next dataset */
+const PASS_ACCURACY = 0.85;
+const passesGate = (dataset, accuracy) =>
+  typeof accuracy === 'number' && (dataset.endsWith('Training') || accuracy >= PASS_ACCURACY);
+
 async function gradeAllUrbanDatasets({ force = false } = {}) {
   const datasets = await redis.sMembers('v1:datasets');
   const urbanDatasets = datasets.filter(ds => isUrbanDataset(ds));
@@ -118,11 +132,7 @@ async function gradeAllUrbanDatasets({ force = false } = {}) {
       if (!force && await redis.exists(metaKey)) {
         continue;
       }
-      try {
-        await gradeAndEvaluateDataset(pid, dataset);
-      } catch (err) {
-        console.error(`Urban grading failed for ${pid}/${dataset}:`, err);
-      }
+      await enqueueGrading(pid, dataset);
     }
   }
 }
@@ -144,9 +154,10 @@ async function loadDatasetsFromRedis() {
 }
 
 async function getDatasetMeta(dsID) {
+  if (metaCache[dsID]) return metaCache[dsID];
   const raw = await redis.get(`v1:datasets:${dsID}:meta`);
   if (!raw) return { label: dsID, description: '', topic: ''};   // sensible defaults
-  try   { return JSON.parse(raw); }
+  try   { return (metaCache[dsID] = JSON.parse(raw)); }
   catch  { return { label: dsID, description: '', topic: ''}; }
 }
 
@@ -166,73 +177,130 @@ function normalise(q) {
   return q;
 }
 
+/* a stored value is a question when it parses to a JSON object – the same
+   rule as py/questions.py, so positions agree with the answered bitmaps */
+function parseQuestion(raw) {
+  let obj;
+  try { obj = JSON.parse(raw); } catch { return null; }
+  return obj && typeof obj === 'object' && !Array.isArray(obj) ? obj : null;
+}
+
 /* ───────────────  3. QUESTIONS CACHE  ───────── */
 const questionsCache = {};
+const metaCache      = {};      // ds → parsed v1:datasets:<ds>:meta
+const assignedCache  = {};      // ds → members of v1:assignments:<ds>
+
+/* ───────────────  3a. CACHE INVALIDATION  ────
+   Mutation tools (py/invalidation.py, and this server) bump v1:versions[ds]
+   and publish { dataset, kind, uids, version } on v1:events:datasets.    */
+const EVENTS_CHANNEL = 'v1:events:datasets';
+const VERSIONS_KEY   = 'v1:versions';
+const cacheVersions  = {};      // ds → last version applied
+
+function dropDatasetCaches(ds) {
+  delete questionsCache[ds];
+  delete metaCache[ds];
+  delete assignedCache[ds];
+}
 
-async function fetchUserQuestions(dsIDs, membersByDs){
-  // 1) Build the multi (pipeline)
-  const multi = redis.multi();
-  const patterns = [];
-
-  // queue a KEYS command for every (ds, pid) pattern
-  for (const ds of dsIDs) {
-    for (const pid of membersByDs[ds]) {
-      const pattern = `v1:${pid}:${ds}:*`;
-      patterns.push({ ds, pid });
-      multi.keys(pattern);
-    }
-  }
+async function publishDatasetEvent(ds, kind, uids = null) {
+  const version = await redis.hIncrBy(VERSIONS_KEY, ds, 1);
+  await redis.publish(EVENTS_CHANNEL, JSON.stringify({
+    dataset: ds, kind, uids, version, ts: Date.now()
+  }));
+}
 
-  // 2) Execute all the KEYS calls in one shot
-  //    results is an array of key‑lists, in the same order
-  const keyLists = await multi.exec(); // [ [keysForPattern1], [keysForPattern2], … ]
+/* re-read just the changed uids; keep the sorted-by-uid order */
+async function refreshQuestions(ds, uids) {
+  const cached = questionsCache[ds];
+  if (!cached) return;
+  if (!Array.isArray(uids)) { delete questionsCache[ds]; return; }
 
-  // 3) Flatten out all the individual keys for the second pipeline
-  const allKeys = keyLists.flat();
-  const keyToIndex = [];
-  keyLists.forEach((keys, idx) => {
-    for (const key of keys) {
-      keyToIndex.push(idx);  // record which (ds, pid) this key belongs to
-    }
+  const vals = uids.length ? await redis.mGet(uids.map(uid => `v1:datasets:${ds}:${uid}`)) : [];
+  const changed = new Set(uids);
+  const arr = cached.filter(q => !changed.has(q.uid));
+  vals.forEach(v => {
+    if (!v) return;                          // deleted question
+    try   { arr.push(normalise(JSON.parse(v.toString()))); }
+    catch (err) { console.warn('Bad question JSON:', err); }
   });
+  arr.sort((a, b) => (a.uid < b.uid ? -1 : a.uid > b.uid ? 1 : 0));
+  questionsCache[ds] = arr;
+}
 
-  // 4) Build a second multi that GETs (or JSON.GETs) each key’s value
-  const multi2 = redis.multi();
-  for (const key of allKeys) {
-    // Replace .get with .jsonGet if you’re storing JSON
-    multi2.get(key);
+async function applyDatasetEvent({ dataset: ds, kind, uids, version }) {
+  if (!ds) return;
+  switch (kind) {
+    case 'questions':   await refreshQuestions(ds, uids); break;
+    case 'meta':        delete metaCache[ds];             break;
+    case 'assignments': delete assignedCache[ds];         break;
+    case 'created':     dropDatasetCaches(ds); addDatasetToGlobals(ds);      break;
+    case 'deleted':
+    case 'archived':    dropDatasetCaches(ds); removeDatasetFromGlobals(ds); break;
+    default:            dropDatasetCaches(ds);
   }
-  const values = await multi2.exec();  // array of string results
+  if (version != null) cacheVersions[ds] = Number(version);
+}
 
-  // 5) Assemble the nested object
-  const questionsByDsUser = {};
-  dsIDs.forEach(ds => (questionsByDsUser[ds] = {}));
-  patterns.forEach(({ ds, pid }, patternIdx) => {
-    questionsByDsUser[ds][pid] = [];
-  });
+/* after a (re)connect: drop whatever moved while we were not listening */
+async function resyncDatasetVersions() {
+  const current = await redis.hGetAll(VERSIONS_KEY);
+  for (const [ds, v] of Object.entries(current)) {
+    if (cacheVersions[ds] !== undefined && cacheVersions[ds] !== Number(v))
+      dropDatasetCaches(ds);
+    cacheVersions[ds] = Number(v);
+  }
+}
 
-  // Walk each returned value → put into the right ds/pid bucket
-  values.forEach((val, i) => {
-    const patternIdx = keyToIndex[i];
-    const { ds, pid } = patterns[patternIdx];
-    questionsByDsUser[ds][pid].push(val);
+async function subscribeDatasetEvents() {
+  const subscriber = redis.duplicate();
+  let connectedBefore = false;
+  subscriber.on('error', err => console.error('Redis subscriber error:', err));
+  subscriber.on('ready', async () => {
+    try {
+      if (connectedBefore) await loadDatasetsFromRedis();
+      await resyncDatasetVersions();
+      connectedBefore = true;
+    } catch (err) {
+      console.error('Cache resync failed:', err);
+    }
   });
+  await subscriber.connect();
+  await subscriber.subscribe(EVENTS_CHANNEL, message => {
+    let event;
+    try { event = JSON.parse(message); } catch { return; }
+    applyDatasetEvent(event).catch(err => console.error('Cache invalidation failed:', err));
+  });
+}
+
+async function fetchQuestionCounts(dsIDs){
+  const pipeline = redis.multi();
+  for (const ds of dsIDs) {
+    pipeline.sCard(`v1:datasets:${ds}`);
+  }
+  const results = await pipeline.exec();
 
-  return questionsByDsUser;
+  const countByDs = {};
+  for (let i = 0; i < dsIDs.length; i++) {
+    countByDs[dsIDs[i]] = results[i];
+  }
+  return countByDs;
 }
 
-async function fetchAllQuestions(dsIDs){
+/* v1:progress:<ds> hashes: <pid>:answered / <pid>:last (maintained by
+   /submit_question, /edit_qresponse and py/progress.py) */
+async function fetchAllProgress(dsIDs) {
   const pipeline = redis.multi();
   for (const ds of dsIDs) {
-    pipeline.sMembers(`v1:datasets:${ds}`);
+    pipeline.hGetAll(v1ProgressKey(ds));
   }
   const results = await pipeline.exec();
 
-  const questionsByDs = {};
+  const progressByDs = {};
   for (let i = 0; i < dsIDs.length; i++) {
-    questionsByDs[dsIDs[i]] = results[i];
+    progressByDs[dsIDs[i]] = results[i] || {};
   }
-  return questionsByDs;
+  return progressByDs;
 }
 
 async function fetchAllAssignments(dsIDs) {
@@ -259,12 +327,56 @@ async function fetchAllAssignments(dsIDs) {
  * Return an array of questions for <dsID>.
  * If the set in Redis is empty, cache and return [] without calling MGET.
  */
+/* cold tier (py/archive_datasets.py): an archived dataset's meta stub points
+   at one gzip member of archive/segments/*.seg holding its questions and answers */
+const ARCHIVE_DIR = path.join(__dirname, 'archive');
+const ARCHIVE_CACHE_SIZE = 8;
+const archiveCache = new Map();            // ds → parsed document, least recent first
+
+async function loadArchivedDataset(dsID) {
+  const entry = (await getDatasetMeta(dsID)).archived;
+  if (!entry) return null;
+  if (archiveCache.has(dsID)) {
+    const doc = archiveCache.get(dsID);
+    archiveCache.delete(dsID);
+    return archiveCache.set(dsID, doc).get(dsID);
+  }
+  const fh = await fs.promises.open(path.join(ARCHIVE_DIR, entry.segment), 'r');
+  try {
+    const buf = Buffer.alloc(entry.length);
+    await fh.read(buf, 0, entry.length, entry.offset);
+    const doc = JSON.parse((await gunzipAsync(buf)).toString('utf8'));
+    archiveCache.set(dsID, doc);
+    if (archiveCache.size > ARCHIVE_CACHE_SIZE) archiveCache.delete(archiveCache.keys().next().value);
+    return doc;
+  } finally {
+    await fh.close();
+  }
+}
+
 async function getDatasetQuestions(dsID) {
   if (questionsCache[dsID]) return questionsCache[dsID];
 
-  const uids = await redis.sMembers(`v1:datasets:${dsID}`);
+  /* prefer the static bundle when it was built from the current version */
+  const bundle = getBundleManifest()?.datasets?.[dsID];
+  if (bundle && bundle.version === (cacheVersions[dsID] ?? 0)) {
+    try {
+      const raw = await fs.promises.readFile(path.join(BUNDLE_DIR, bundle.file), 'utf8');
+      return (questionsCache[dsID] = JSON.parse(raw));
+    } catch (err) {
+      console.warn(`Unreadable question bundle for ${dsID}:`, err.message);
+    }
+  }
+
+  /* sorted: positions index the v1:answered:<ds>:<pid> bitmaps (py/answered_bitmaps.py) */
+  const uids = (await redis.sMembers(`v1:datasets:${dsID}`)).sort();
   if (uids.length === 0) {
-    return (questionsCache[dsID] = []);
+    const archived = await loadArchivedDataset(dsID);
+    const raws = archived ? Object.keys(archived.questions).sort().map(uid => archived.questions[uid]) : [];
+    return (questionsCache[dsID] = raws.flatMap(raw => {
+      const obj = raw == null ? null : parseQuestion(raw);
+      return obj ? [normalise(obj)] : [];
+    }));
   }
 
   const keys = uids.map(uid => `v1:datasets:${dsID}:${uid}`);
@@ -278,12 +390,9 @@ async function getDatasetQuestions(dsID) {
   const arr = [];
   vals.forEach(v => {
     if (!v) return;                          // null entry – key missing
-    try {
-      const obj = JSON.parse(v.toString());  // ← convert Buffer → string
-      arr.push(normalise(obj));
-    } catch (err) {
-      console.warn('Bad question JSON:', err);
-    }
+    const obj = parseQuestion(v.toString()); // ← convert Buffer → string
+    if (obj) arr.push(normalise(obj));
+    else     console.warn(`Not a question in ${dsID}:`, v.toString().slice(0, 80));
   });
 
   questionsCache[dsID] = arr;
@@ -305,16 +414,55 @@ async function userFinished(pid, dsID) {
 }
 
 async function setAccess (pid, datasetID, allow) {
-  if (allow)
-    await Promise.all([
-      redis.sAdd(v1AssignUser(pid), datasetID),
-      redis.sAdd(v1AssignDb(datasetID), pid)
-    ]);
+  if (allow) {
+    const write = redis.multi()
+      .sAdd(v1AssignUser(pid), datasetID)
+      .sAdd(v1AssignDb(datasetID), pid);
+    if (!await getStatus(pid, datasetID)) write.sAdd(v1OpenKey(pid), datasetID);
+    await write.exec();
+  } else
+    await redis.multi()
+      .sRem(v1AssignUser(pid), datasetID)
+      .sRem(v1AssignDb(datasetID), pid)
+      .sRem(v1OpenKey(pid), datasetID)
+      .exec();
+  delete assignedCache[datasetID];
+  await trackAvailability(datasetID);
+  await publishDatasetEvent(datasetID, 'assignments');
+}
+
+/* availability index (py/availability.py): campaign datasets scored by
+   assignee count, plus each user's assigned-but-unsubmitted datasets */
+async function trackAvailability(dsID, topic = null) {
+  topic = topic ?? (await getDatasetMeta(dsID)).topic;
+  if (!topic) return;
+  if (isAccuracyDataset(dsID))
+    await redis.sAdd(v1AvailAccKey(topic), dsID);
   else
-    await Promise.all([
-      redis.sRem(v1AssignUser(pid), datasetID),
-      redis.sRem(v1AssignDb(datasetID), pid)
-    ]);
+    await redis.zAdd(v1AvailKey(topic), { score: await redis.sCard(v1AssignDb(dsID)), value: dsID });
+}
+
+async function untrackAvailability(dsID, topic) {
+  if (!topic) return;
+  await redis.multi().zRem(v1AvailKey(topic), dsID).sRem(v1AvailAccKey(topic), dsID).exec();
+}
+
+/* store a submission marker / score; the dataset is no longer open for pid */
+async function setUserMeta(pid, ds, value) {
+  await redis.multi()
+    .set(`v1:${pid}:${ds}:meta`, value)
+    .sRem(v1OpenKey(pid), ds)
+    .exec();
+}
+
+/* first boot after an upgrade: build the index once */
+async function ensureAvailabilityIndex() {
+  if (await redis.exists('v1:avail:built')) return;
+  try {
+    await execFileAsync(surveyPython, [availabilityIndex], { cwd: surveyRoot });
+  } catch (err) {
+    console.error('Building the availability index failed:', err.stderr || err);
+  }
 }
 
 function addDatasetToGlobals(id, label = id) {
@@ -331,6 +479,19 @@ function removeDatasetFromGlobals(id) {
   // delete DATASETS_MAP[id];
 }
 
+/* reserves the next campaign index (index hash + retry list, see the script);
+   shared with py/pregenerate_datasets.py */
+const RESERVE_INDEX_LUA = fs.readFileSync(path.join(__dirname, 'py', 'reserve_index.lua'), 'utf8');
+const campaignIndexKeys = topic =>
+  [`v1:campaigns:${topic}:meta`, `v1:campaigns:${topic}:index`, `v1:campaigns:${topic}:retry`];
+
+/* index settled (inserted or skipped): advance curIndex in the campaign meta
+   (status page / metrics) atomically, never backwards – shared with Python */
+const COMMIT_INDEX_LUA = fs.readFileSync(path.join(__dirname, 'py', 'commit_index.lua'), 'utf8');
+async function commitCampaignIndex(topic, index) {
+  await redis.eval(COMMIT_INDEX_LUA, { keys: [`v1:campaigns:${topic}:meta`], arguments: [String(index)] });
+}
+
 /* ─── helper: reuse or create a next dataset ───────────────────────── */
 async function getNextDataset (pid, currentDs) {
   /* 1. discover the topic of the current dataset */
@@ -338,118 +499,94 @@ async function getNextDataset (pid, currentDs) {
   if (!topic) return null;                      // no topic → nothing to do
 
   const campSetKey = `v1:campaigns:${topic}`;
-  const existing   = await redis.sMembers(campSetKey);
-  let nextDs = null;
 
-  for (const cand of existing) {
-    const assigned = await redis.sIsMember(`v1:assignments:${cand}`, pid);
-    if (!assigned) continue;
-
-    const metaExists = await redis.exists(`v1:${pid}:${cand}:meta`);
-    if (!metaExists && cand !== currentDs) {
-      nextDs = cand;
-      break;
-    }
-  }
+  /* 2a. a dataset of this campaign the user was given but has not submitted */
+  const open = await redis.sInter([v1OpenKey(pid), campSetKey]);
+  let nextDs = open.find(ds => ds !== currentDs) || null;
 
+  /* 2b. a dataset with a free annotator slot the user is not on; the user
+     can be on at most |mine| of them, so that many + 1 is enough */
   if (!nextDs) {
-    for (const cand of existing) {
-      const numAssigned = await redis.sCard(`v1:assignments:${cand}`);
-      if (numAssigned >= 2) continue;
-
-      const assigned = await redis.sIsMember(`v1:assignments:${cand}`, pid);
-      if (!assigned) {
-        nextDs = cand;
-        break;
-      }
-    }
-  }
-
-  for (const cand of existing) {
-    if (isAccuracyDataset(cand)){
-      const assigned = await redis.sIsMember(`v1:assignments:${cand}`, pid);
-      if (!assigned) {                                     // user not on it
-        nextDs = cand;
-        break;
-      }
-    }
+    const mine = new Set(await redis.sMembers(v1AssignUser(pid)));
+    const free = await redis.zRangeByScore(v1AvailKey(topic), '-inf', `(${MAX_ASSIGNEES}`,
+                                           { LIMIT: { offset: 0, count: mine.size + 1 } });
+    nextDs = free.find(ds => !mine.has(ds)) || null;
   }
 
-  /* 3. otherwise create one */
-  if (!nextDs) {
-    /* read / validate campaign meta */
-    const metaRaw = await redis.get(`${campSetKey}:meta`);
-    if (!metaRaw) throw new Error('campaign metadata missing');
-
-    let meta;
-    try { meta = JSON.parse(metaRaw); }          // strict parse
-    catch { throw new Error('campaign metadata invalid'); }
-
-    /* ── capacity check ──────────────────────────────────── */
-    const limit = meta.numImages ?? meta.NumImages;          // accept either key
-    if (limit == null) throw new Error('numImages not set in campaign metadata');
-
-    if (meta.curIndex >= limit) {
-      return null;
-    }
+  /* accuracy datasets the user has not taken yet always come first */
+  const accuracy = await redis.sDiff([v1AvailAccKey(topic), v1AssignUser(pid)]);
+  if (accuracy.length) nextDs = accuracy[0];
 
-    let index = meta.curIndex++;
+  /* 3. otherwise create one (an index the generator skips is used up) */
+  while (!nextDs) {
+    /* reserve the next index atomically – shared with py/pregenerate_datasets.py */
+    const index = await redis.eval(RESERVE_INDEX_LUA, { keys: campaignIndexKeys(topic) });
+    if (index === -2) throw new Error('campaign metadata missing');
+    if (index === -3) throw new Error('numImages not set in campaign metadata');
+    if (index < 0) return null;                  // numImages reached
 
     nextDs      = `${topic}_${index}`;
 
-    /* generate dataset via Python */
+    /* generate dataset via Python; a failure gives the index back */
     console.log(`Generating ${nextDs}`)
-    const out = await new Promise((resolve, reject) => {
-      execFile(
-        pythonBin,
-        [createDataset, topic, index],
-        { cwd: pythonRoot },           // ← use the root, not path.dirname(createDataset)
-        (err, stdout) => err ? reject(err) : resolve(stdout)
-      );
-    });
-
-    
-    if (out.includes('skipped')){
-      console.log('CreateDataset python script returned skipped')
-      return 0;
-    }
-      // Fail quietly because a dataset could not be generated
-
-    let payload;
     try {
-      payload = JSON.parse(out);
-    } catch {
-      throw new Error('dataset generator returned bad JSON');
-    }
+      const out = await new Promise((resolve, reject) => {
+        execFile(
+          pythonBin,
+          [createDataset, topic, index],
+          { cwd: pythonRoot },           // ← use the root, not path.dirname(createDataset)
+          (err, stdout) => err ? reject(err) : resolve(stdout)
+        );
+      });
+
+
+      if (out.includes('skipped')) {
+        console.log(`Generator skipped ${nextDs}; index ${index} is used up`);
+        await commitCampaignIndex(topic, index);
+        nextDs = null;
+        continue;
+      }
 
-    /* ---- extract and sanity-check ----------------------------------- */
-    const metaFromPy = payload.dataset_meta;
-    // console.log(payload)
-    if (!metaFromPy || !metaFromPy.topic || !Array.isArray(payload.dataset_entries))
-      throw new Error(`generator payload missing required fields\nreturned: ${out}`);
-
-    const questions = payload.dataset_entries; // array of { uid, Question, Map, … }
-
-    /* bulk-insert question objects ------------------------------------ */
-    const dsSetKey = `v1:datasets:${nextDs}`;
-    const pipe     = redis.multi();
-    questions.forEach(q => {
-      if (!q.uid) return;                      // guard malformed rows
-      pipe.sAdd(dsSetKey, q.uid);
-      pipe.set(`${dsSetKey}:${q.uid}`, JSON.stringify(q));
-    });
-    await pipe.exec();
-
-    /* register new dataset  & campaign links -------------------------- */
-    await Promise.all([
-      redis.sAdd('v1:datasets', nextDs),
-      redis.sAdd(campSetKey,    nextDs),
-      redis.set(`v1:datasets:${nextDs}:meta`, JSON.stringify(metaFromPy)),
-      redis.set(`${campSetKey}:meta`,         JSON.stringify(meta))
-    ]);
+      let payload;
+      try {
+        payload = JSON.parse(out);
+      } catch {
+        throw new Error('dataset generator returned bad JSON');
+      }
 
-    DATASET_IDS.push(nextDs);
-    DATASETS.push({ id: nextDs, label: metaFromPy.label || nextDs });
+      /* ---- extract and sanity-check ----------------------------------- */
+      const metaFromPy = payload.dataset_meta;
+      // console.log(payload)
+      if (!metaFromPy || !metaFromPy.topic || !Array.isArray(payload.dataset_entries))
+        throw new Error(`generator payload missing required fields\nreturned: ${out}`);
+
+      const questions = payload.dataset_entries; // array of { uid, Question, Map, … }
+
+      /* bulk-insert question objects ------------------------------------ */
+      const dsSetKey = `v1:datasets:${nextDs}`;
+      const pipe     = redis.multi();
+      questions.forEach(q => {
+        if (!q.uid) return;                      // guard malformed rows
+        pipe.sAdd(dsSetKey, q.uid);
+        pipe.set(`${dsSetKey}:${q.uid}`, JSON.stringify(q));
+      });
+      await pipe.exec();
+
+      /* register new dataset  & campaign links -------------------------- */
+      await Promise.all([
+        redis.sAdd('v1:datasets', nextDs),
+        redis.sAdd(campSetKey,    nextDs),
+        redis.zAdd(v1AvailKey(topic), { score: 0, value: nextDs }),
+        redis.set(`v1:datasets:${nextDs}:meta`, JSON.stringify(metaFromPy))
+      ]);
+
+      addDatasetToGlobals(nextDs, metaFromPy.label || nextDs);
+    } catch (err) {
+      await redis.rPush(campaignIndexKeys(topic)[2], String(index));
+      throw err;
+    }
+    await commitCampaignIndex(topic, index);
+    await publishDatasetEvent(nextDs, 'created');
   }
 
   /* 4. assign the user if not already */
@@ -458,7 +595,9 @@ async function getNextDataset (pid, currentDs) {
 }
 
 async function getAssigned(dataset){
-  return await redis.sMembers(`v1:assignments:${dataset}`);
+  if (!assignedCache[dataset])
+    assignedCache[dataset] = await redis.sMembers(`v1:assignments:${dataset}`);
+  return assignedCache[dataset].slice();
 }
 
 async function getStatus(pid, ds){
@@ -523,6 +662,8 @@ app.post('/admin/dataset_meta/:id', async (req, res) => {
 
   const meta = { label: label || dsID, description: description || '', topic: topic || '' };
   await redis.set(`v1:datasets:${dsID}:meta`, JSON.stringify(meta));
+  delete metaCache[dsID];
+  await publishDatasetEvent(dsID, 'meta');
 
   const oldTopic = (prevMeta.topic || '').trim();
   const newTopic = (meta.topic   || '').trim();
@@ -530,11 +671,13 @@ app.post('/admin/dataset_meta/:id', async (req, res) => {
   if (oldTopic !== newTopic) {
     if (oldTopic) {
       await redis.sRem(`v1:campaigns:${oldTopic}`, dsID);
+      await untrackAvailability(dsID, oldTopic);
       /* optional: clean up empty sets or meta keys here */
     }
     if (newTopic) {
       /* add dataset to the new campaign set */
       await redis.sAdd(`v1:campaigns:${newTopic}`, dsID);
+      await trackAvailability(dsID, newTopic);
 
       /* ensure campaign meta exists once */
       const campMetaKey = `v1:campaigns:${newTopic}:meta`;
@@ -547,6 +690,43 @@ app.post('/admin/dataset_meta/:id', async (req, res) => {
   res.json({ ok: true });
 });
 
+app.get('/admin/grading_queue', async (_req, res) => {
+  try {
+    const [depth, dead, counters] = await Promise.all([
+      redis.xLen(GRADING_STREAM),
+      redis.xLen('v1:grading:dead'),
+      redis.hGetAll('v1:grading:metrics')
+    ]);
+    let pending = 0;
+    try { pending = (await redis.xPending(GRADING_STREAM, 'graders')).pending; }
+    catch { /* consumer group not created yet */ }
+    const graded = Number(counters.graded || 0);
+    res.json({
+      depth, pending, waiting: depth - pending, dead,
+      graded, failed: Number(counters.failed || 0), retried: Number(counters.retried || 0),
+      latencyMsAvg: graded ? Math.round(Number(counters.latency_ms_total || 0) / graded) : null
+    });
+  } catch (err) {
+    console.error('Failed to read grading queue:', err);
+    res.status(500).json({ error: 'Failed to read grading queue' });
+  }
+});
+
+/* py/grading_worker.py reports every grade here; same pass gate as /run-python */
+app.post('/admin/graded', express.json(), async (req, res) => {
+  const { pid, dataset, accuracy } = req.body || {};
+  if (!pid || !dataset)
+    return res.status(400).json({ error: 'pid & dataset required' });
+  if (!passesGate(dataset, accuracy))
+    return res.json({ ok: true, passed: false, nextDataset: null });
+  try {
+    res.json({ ok: true, passed: true, nextDataset: await getNextDataset(pid, dataset) });
+  } catch (e) {
+    console.error(`Next dataset for ${pid} after ${dataset} failed:`, e);
+    res.status(500).json({ error: e.message });
+  }
+});
+
 app.get('/admin/user_datasets/:pid', async (req,res) =>
   res.json(await redis.sMembers(v1AssignUser(req.params.pid))));
 
@@ -587,41 +767,24 @@ app.get('/admin/campaign_status/:topic', async (req, res) => {
   const accuracyArr = await Promise.all(accPromises);
 
   const membersByDs = await fetchAllAssignments(dsIDs);
-  const questionsByDs = await fetchAllQuestions(dsIDs);
-  const questionsByDsUser = await fetchUserQuestions(dsIDs, membersByDs);
-
-  const progArr = [];
-  for (const ds of dsIDs){
-    const total = questionsByDs[ds].length;
-    for (const pid of membersByDs[ds]){
-      let answered = questionsByDsUser[ds][pid].length
-      let lastTS = null, submitted = false;
-      for (const question of questionsByDsUser[ds][pid]){
-        const asNum = parseFloat(question);
-        const isNumericFlag = !isNaN(asNum) && asNum >= 0 && asNum <= 1;
-
-        if (question === 'submitted' || isNumericFlag) {
-          submitted = true;
-          continue;
-        }
-
-        // otherwise assume it's your JSON blob
-        try {
-          const obj = JSON.parse(question);
-          const ts  = obj.editTimestamp || obj.origTimestamp;
-          if (ts && (!lastTS || ts > lastTS)) {
-            lastTS = ts;
-          }
-        } catch (e) {
-          console.warn(`Invalid JSON for ${pid}/${ds}:`, question);
-        }
-      }
-      if (submitted){
-        answered--;
-      }
-      progArr.push({ pid, dataset: ds, answered, total, lastTS, submitted });
-    }
-  }
+  const totalByDs = await fetchQuestionCounts(dsIDs);
+  const progressByDs = await fetchAllProgress(dsIDs);
+
+  /* submission markers for every (dataset, assignee) pair in one MGET */
+  const pairs = dsIDs.flatMap(ds => membersByDs[ds].map(pid => ({ ds, pid })));
+  const metas = pairs.length
+    ? await redis.mGet(pairs.map(({ ds, pid }) => `v1:${pid}:${ds}:meta`))
+    : [];
+
+  const progArr = pairs.map(({ ds, pid }, i) => {
+    const raw = metas[i];
+    const asNum = parseFloat(raw);
+    const submitted = raw === 'submitted' || (!isNaN(asNum) && asNum >= 0 && asNum <= 1);
+    const fields = progressByDs[ds];
+    const answered = Number(fields[`${pid}:answered`] || 0);
+    const lastTS = fields[`${pid}:last`] ? Number(fields[`${pid}:last`]) : null;
+    return { pid, dataset: ds, answered, total: totalByDs[ds], lastTS, submitted };
+  });
 
   /* ➊ read campaign meta (curIndex, numImages, etc.) */
   const metaRaw = await redis.get(`v1:campaigns:${topic}:meta`);
@@ -670,10 +833,88 @@ app.post('/login', async (req, res) => {
   });
 });
 
+/* pre-generated thumbnail manifest (py/build_thumbnails.py), re-read on change */
+const THUMB_MANIFEST = path.join(__dirname, 'thumbs', 'manifest.json');
+let thumbManifest = { mtimeMs: 0, data: null };
+
+function getThumbManifest() {
+  try {
+    const { mtimeMs } = fs.statSync(THUMB_MANIFEST);
+    if (mtimeMs !== thumbManifest.mtimeMs) {
+      thumbManifest = { mtimeMs, data: JSON.parse(fs.readFileSync(THUMB_MANIFEST, 'utf8')) };
+    }
+  } catch {
+    thumbManifest = { mtimeMs: 0, data: null };
+  }
+  return thumbManifest.data;
+}
+
+/* static question bundles from py/build_question_bundles.py */
+const BUNDLE_DIR      = path.join(__dirname, 'bundles');
+const BUNDLE_MANIFEST = path.join(BUNDLE_DIR, 'manifest.json');
+let bundleManifest = { mtimeMs: 0, data: null };
+
+function getBundleManifest() {
+  try {
+    const { mtimeMs } = fs.statSync(BUNDLE_MANIFEST);
+    if (mtimeMs !== bundleManifest.mtimeMs) {
+      bundleManifest = { mtimeMs, data: JSON.parse(fs.readFileSync(BUNDLE_MANIFEST, 'utf8')) };
+    }
+  } catch {
+    bundleManifest = { mtimeMs: 0, data: null };
+  }
+  return bundleManifest.data;
+}
+
+app.get('/bundles/manifest.json', (_req, res, next) => {
+  res.set('Cache-Control', 'no-cache');
+  res.sendFile(BUNDLE_MANIFEST, err => err && next());
+});
+
+/* content-addressed bundles: immutable, precompressed variants picked by Accept-Encoding */
+app.get('/bundles/:ds/:file', (req, res, next) => {
+  const { ds, file } = req.params;
+  const base = path.join(BUNDLE_DIR, ds, file);
+  if (!/^[0-9a-f]+\.json$/.test(file) || path.dirname(base) !== path.join(BUNDLE_DIR, ds) ||
+      path.dirname(path.dirname(base)) !== BUNDLE_DIR) return next();
+
+  const accepts = req.headers['accept-encoding'] || '';
+  const variant = [['br', '.br'], ['gzip', '.gz']]
+    .find(([enc, ext]) => accepts.includes(enc) && fs.existsSync(base + ext));
+
+  res.set({
+    'Cache-Control': 'public, max-age=31536000, immutable',
+    'Vary': 'Accept-Encoding',
+    'ETag': `"${file.slice(0, -'.json'.length)}"`
+  });
+  if (req.headers['if-none-match'] === res.get('ETag')) return res.status(304).end();
+  res.type('json');
+  if (variant) res.set('Content-Encoding', variant[0]);
+  res.sendFile(variant ? base + variant[1] : base, { etag: false, lastModified: false },
+               err => err && !res.headersSent && next());
+});
+
+/* current bundle for a dataset (falls back to the Redis-backed list) */
+app.get('/question_bundle/:ds', async (req, res) => {
+  const ds = req.params.ds;
+  if (!DATASET_IDS.includes(ds)) return res.status(404).json({ error: 'unknown dataset' });
+  const bundle = getBundleManifest()?.datasets?.[ds];
+  res.set('Cache-Control', 'no-cache');
+  if (bundle && bundle.version === (cacheVersions[ds] ?? 0))
+    return res.redirect(302, `/bundles/${bundle.file}`);
+  res.json(await getDatasetQuestions(ds));
+});
+
 /* thumbnail helper */
 app.get('/thumb', async (req, res) => {
   try {
     const { file, width = 200, height = 200 } = req.query;
+    const manifest = getThumbManifest();
+    const entry = manifest?.maps?.[file];
+    if (entry && +width === manifest.thumb[0] && +height === manifest.thumb[1]) {
+      const cached = path.join(__dirname, 'thumbs', entry.variants.thumb);
+      if (fs.existsSync(cached)) return res.type('jpeg').sendFile(cached);
+    }
     const fp = path.join(__dirname, 'maps', file);
     if (!fs.existsSync(fp)) return res.status(404).send('File not found');
     const img = await sharp(fp)
@@ -692,25 +933,35 @@ app.get('/get_questions', async (req, res) => {
   // await ensureUser(prolificID);
 
   const qs = await getDatasetQuestions(dataset);
+  const rcount = await redis.hGetAll(v1RcountKey(dataset));
+
+  /* already answered by this user? The bitmap is authoritative once it
+     exists; without one (answers from before py/answered_bitmaps.py) check
+     every answer key in one MULTI and write the bitmap from the result */
+  const bitsKey = v1AnsweredKey(dataset, prolificID);
+  let bits = await redis.get(commandOptions({ returnBuffers: true }), bitsKey);
+  if (bits === null) {
+    const check = redis.multi();
+    qs.forEach(q => check.exists(v1AnswerKey(prolificID, dataset, q.uid || q.QID)));
+    const found = qs.length ? await check.exec() : [];
+    const backfill = redis.multi().append(bitsKey, '');   // an empty bitmap still counts
+    found.forEach((n, i) => { if (Number(n)) backfill.setBit(bitsKey, i, 1); });
+    await backfill.exec();
+    bits = await redis.get(commandOptions({ returnBuffers: true }), bitsKey);
+  }
+  const answered = i => i >> 3 < bits.length && (bits[i >> 3] >> (7 - (i & 7))) & 1;
 
   for (let i = 0; i < qs.length; i++) {
     const q   = qs[i];
     const uid = q.uid || q.QID;
 
-    /* already answered by this user? */
-    if (await redis.exists(v1AnswerKey(prolificID, dataset, uid))) continue;
+    if (answered(i)) continue;
 
     /* how many total answers exist for this question? */
-    // let count = 0;
-    // for await (const _ of redis.scanIterator({ MATCH: `v1:*:${dataset}:${uid}` })) {
-    //   count++;
-    // }
-
-    // console.log(count, MAX_RESPONSES)
-    // if (count < MAX_RESPONSES) {
-      console.log(prolificID, dataset, i)
-      return res.json({ done: false, questionIndex: i, question: q });
-    // }
+    if (Number(rcount[uid] || 0) >= MAX_RESPONSES) continue;
+
+    console.log(prolificID, dataset, i)
+    return res.json({ done: false, questionIndex: i, question: q });
   }
   res.json({ done: true });
 });
@@ -723,19 +974,20 @@ app.post('/submit_question', async (req, res) => {
 
   await ensureUser(prolificID);
 
-  /* capacity check */
+  /* capacity check: reserve a slot in v1:rcount:<ds> (see py/response_counts.py) */
   const qArr = await getDatasetQuestions(dataset);
-  const uid  = req.body.uid || (qArr[questionIndex]?.uid);
-  let count  = 0;
-  for await (const _ of redis.scanIterator({ MATCH: `v1:*:${dataset}:${uid}` })) {
-    count++;
+  const uid  = req.body.uid || (qArr[req.body.questionIndex]?.uid);
+  const answerKey = v1AnswerKey(prolificID, dataset, uid);
+  const reserved  = !(await redis.exists(answerKey));
+  if (reserved && await redis.hIncrBy(v1RcountKey(dataset), uid, 1) > MAX_RESPONSES) {
+    await redis.hIncrBy(v1RcountKey(dataset), uid, -1);
+    return res.status(400).json({ error: 'No slots left' });
   }
-  // if (count >= MAX_RESPONSES)
-  //   return res.status(400).json({ error: 'No slots left' });
 
   /* store answer */
-  await redis.set(
-    v1AnswerKey(prolificID, dataset, uid),
+  const origTimestamp = Date.now();
+  const previous = await redis.set(
+    answerKey,
     JSON.stringify({
       uid: uid,
       prolificID,
@@ -749,9 +1001,23 @@ app.post('/submit_question', async (req, res) => {
       discard: req.body.discard,
       startTime: req.body.startTime,
       stopTime: req.body.stopTime,
-      origTimestamp: Date.now()
-    })
+      origTimestamp
+    }),
+    { GET: true }
   );
+
+  /* keep v1:progress:<ds> in step (see py/progress.py) and settle the
+     slot if a concurrent request beat us to the answer key */
+  const counters = redis.multi();
+  if (previous === null) counters.hIncrBy(v1ProgressKey(dataset), `${prolificID}:answered`, 1);
+  counters.hSet(v1ProgressKey(dataset), `${prolificID}:last`, String(origTimestamp));
+  if (previous === null && !reserved) counters.hIncrBy(v1RcountKey(dataset), uid, 1);
+  if (previous !== null && reserved)  counters.hIncrBy(v1RcountKey(dataset), uid, -1);
+  const position = qArr.findIndex(q => (q.uid || q.QID) === uid);
+  if (position >= 0) counters.setBit(v1AnsweredKey(dataset, prolificID), position, 1);
+  if (prolificID === BASELINE_PID) counters.hDel(v1GtKey(dataset), uid);
+  await counters.exec();
+
   res.json({ success: true });
 });
 
@@ -761,7 +1027,7 @@ app.post('/submit_dataset', express.json(), async (req, res) => {
   if (!prolificID || !dataset) 
     return res.status(400).json({ error: 'prolificID & dataset required' });
   // key = v1:<user>:<dataset>:meta
-  await redis.set(`v1:${prolificID}:${dataset}:meta`, value);
+  await setUserMeta(prolificID, dataset, value);
   res.json({ ok: true });
 });
 
@@ -786,6 +1052,9 @@ app.get('/get_question_by_uid', async (req, res) => {
     return res.status(400).json({ error: 'Missing dataset or uid' });
   }
 
+  const cached = questionsCache[dsID]?.find(q => q.uid === uid);
+  if (cached) return res.json(cached);
+
   const key = `v1:datasets:${dsID}:${uid}`;
   try {
     const raw = await redis.get(key);   // node‐redis v4 supports promise syntax
@@ -820,131 +1089,147 @@ app.get('/user_datasets/:pid', async (req, res) => {
 });
 
 
-/* fetch past answers (now includes Map file) */
-app.get('/qresponses/:pid', async (req, res) => {
-  const { dataset } = req.query;
-  const pid = req.params.pid;
-  if (!dataset) return res.status(400).json({ error: 'dataset query param required' });
-
-  const pattern = `v1:${pid}:${dataset}:*`;
-  const out = [];
-  // ans.mapFile = mapFile;
-  
-  const usesGroundTruth = hasGroundTruthSuffix(dataset);
-
-  const getJkdewittAnswer = async uid => {
-    if (!usesGroundTruth) return undefined;
+/* ground truth, extracted once per question into v1:gt:<ds> (see py/ground_truth.py) */
+const GROUND_TRUTH_KEYS = [
+  'groundTruth', 'ground_truth', 'GroundTruth', 'groundtruth',
+  'groundTruthAnswer', 'ground_truth_answer', 'groundtruth_answer',
+  'groundTruthResponse', 'ground_truth_response',
+  'answer_key', 'answerKey', 'gold_answer', 'goldAnswer', 'gold',
+  'correct_answer', 'correctAnswer', 'expected_answer', 'expectedAnswer'
+];
 
-    const baselineKey = `v1:jkdewitt:${dataset}:${uid}`;
-    const rawBaseline = await redis.get(baselineKey);
-    if (!rawBaseline) return undefined;
+function extractGroundTruth(obj, { allowLabelFallback = false } = {}) {
+  const visit = value => {
+    if (value == null) return undefined;
 
-    try {
-      const parsed = JSON.parse(rawBaseline.toString());
-      return parsed.answer
-        ?? parsed.Answer
-        ?? parsed.response
-        ?? parsed.Response
-        ?? parsed.llm_response
-        ?? parsed.label
-        ?? parsed.Label;
-    } catch {
+    // Strings may themselves be JSON that carry the ground-truth answer
+    if (typeof value === 'string') {
+      try {
+        const parsed = JSON.parse(value);
+        if (parsed && typeof parsed === 'object') {
+          return visit(parsed);
+        }
+      } catch {/* not JSON – fall through */}
       return undefined;
     }
-  };
-  
-
-  const extractGroundTruth = (obj, { allowLabelFallback = false } = {}) => {
-    const visit = value => {
-      if (value == null) return undefined;
-
-      // Strings may themselves be JSON that carry the ground-truth answer
-      if (typeof value === 'string') {
-        try {
-          const parsed = JSON.parse(value);
-          if (parsed && typeof parsed === 'object') {
-            return visit(parsed);
-          }
-        } catch {/* not JSON – fall through */}
-        return undefined;
-      }
 
-      if (Array.isArray(value)) {
-        for (const item of value) {
-          const found = visit(item);
-          if (found != null) return found;
-        }
-        return undefined;
+    if (Array.isArray(value)) {
+      for (const item of value) {
+        const found = visit(item);
+        if (found != null) return found;
       }
+      return undefined;
+    }
 
-      if (typeof value !== 'object') return undefined;
-
-      const truthKeys = [
-        'groundTruth', 'ground_truth', 'GroundTruth', 'groundtruth',
-        'groundTruthAnswer', 'ground_truth_answer', 'groundtruth_answer',
-        'groundTruthResponse', 'ground_truth_response',
-        'answer_key', 'answerKey', 'gold_answer', 'goldAnswer', 'gold',
-        'correct_answer', 'correctAnswer', 'expected_answer', 'expectedAnswer'
-      ];
-
-      for (const key of truthKeys) {
-        if (value[key] != null) return value[key];
-      }
+    if (typeof value !== 'object') return undefined;
 
-      if (allowLabelFallback) {
-        if (value.Label != null) return value.Label;
-        if (value.label != null) return value.label;
-        if (value.Answer != null) return value.Answer;
-        if (value.answer != null) return value.answer;
-      }
+    for (const key of GROUND_TRUTH_KEYS) {
+      if (value[key] != null) return value[key];
+    }
 
-      for (const [key, child] of Object.entries(value)) {
-        const cleaned = key.replace(/[_\s-]/g, '').toLowerCase();
-        if (cleaned.includes('groundtruth') && child != null) {
-          return child;
-        }
+    if (allowLabelFallback) {
+      if (value.Label != null) return value.Label;
+      if (value.label != null) return value.label;
+      if (value.Answer != null) return value.Answer;
+      if (value.answer != null) return value.answer;
+    }
 
-        const found = visit(child);
-        if (found != null) return found;
+    for (const [key, child] of Object.entries(value)) {
+      const cleaned = key.replace(/[_\s-]/g, '').toLowerCase();
+      if (cleaned.includes('groundtruth') && child != null) {
+        return child;
       }
 
-      return undefined;
-    };
+      const found = visit(child);
+      if (found != null) return found;
+    }
 
-    return visit(obj);
+    return undefined;
   };
 
+  return visit(obj);
+}
 
+const baselineAnswer = raw => {
+  if (!raw) return undefined;
+  try {
+    const parsed = JSON.parse(raw.toString());
+    return parsed.answer
+      ?? parsed.Answer
+      ?? parsed.response
+      ?? parsed.Response
+      ?? parsed.llm_response
+      ?? parsed.label
+      ?? parsed.Label;
+  } catch {
+    return undefined;
+  }
+};
+
+/* uid → { baseline?, question? }; entries missing from the hash are
+   extracted here and stored, so the next request is a plain HMGET */
+async function fetchGroundTruth(dataset, uids) {
+  uids = [...new Set(uids)];
+  if (!uids.length) return {};
+  const out = {};
+  const missing = [];
+  (await redis.hmGet(v1GtKey(dataset), uids)).forEach((raw, i) => {
+    if (raw == null) return missing.push(uids[i]);
+    try { out[uids[i]] = JSON.parse(raw.toString()); } catch { missing.push(uids[i]); }
+  });
+  if (!missing.length) return out;
+
+  const qRaws = await redis.mGet(missing.map(uid => `v1:datasets:${dataset}:${uid}`));
+  const bRaws = hasGroundTruthSuffix(dataset)
+    ? await redis.mGet(missing.map(uid => v1AnswerKey(BASELINE_PID, dataset, uid)))
+    : [];
+  const fill = {};
+  missing.forEach((uid, i) => {
+    if (!qRaws[i]) return;
+    const entry = {};
+    const baseline = baselineAnswer(bRaws[i]);
+    if (baseline != null) entry.baseline = baseline;
+    try {
+      const question = extractGroundTruth(JSON.parse(qRaws[i].toString()), { allowLabelFallback: true });
+      if (question != null) entry.question = question;
+    } catch {/* ignore bad json */}
+    out[uid] = entry;
+    fill[uid] = JSON.stringify(entry);
+  });
+  if (Object.keys(fill).length) await redis.hSet(v1GtKey(dataset), fill);
+  return out;
+}
 
-  for await (const keyBuf of redis.scanIterator({ MATCH: pattern })) {
-    const key   = keyBuf.toString();
-    const buf   = await redis.get(key);
-    if (!buf) continue;
+/* fetch past answers (now includes Map file) */
+app.get('/qresponses/:pid', async (req, res) => {
+  const { dataset } = req.query;
+  const pid = req.params.pid;
+  if (!dataset) return res.status(400).json({ error: 'dataset query param required' });
 
+  /* answers: one MGET over the dataset's uid list (questions come from the
+     cache, archived datasets from their segment); no SCAN */
+  const qs = await getDatasetQuestions(dataset);
+  const archived = await loadArchivedDataset(dataset);
+  const raws = archived ? qs.map(q => archived.answers[pid]?.[q.uid])
+                        : (qs.length ? await redis.mGet(qs.map(q => v1AnswerKey(pid, dataset, q.uid))) : []);
+
+  /* ground truth: one HMGET on v1:gt:<ds> for the answered uids */
+  const answered = [];
+  raws.forEach((raw, i) => {
+    if (!raw) return;
     let ans;
-    try { ans = JSON.parse(buf.toString()); } catch { continue; }
-
-    const uid = ans.uid || ans.QID;
-    if (!uid) continue;
-
-    /* pull the question to get the Map filename */
-    const qRaw = await redis.get(`v1:datasets:${dataset}:${uid}`);
-    let mapFile = '';
-    if (qRaw) {
-      try {
-        const qObj = JSON.parse(qRaw.toString());
-        mapFile = qObj.Map || qObj.map || '';
-        const baselineGroundTruth = await getJkdewittAnswer(uid);
-        const answerGroundTruth = extractGroundTruth(ans);
-        const questionGroundTruth = extractGroundTruth(qObj, { allowLabelFallback: true });
-        ans.groundTruth = baselineGroundTruth ?? answerGroundTruth ?? questionGroundTruth ?? '';
-
-      } catch {/* ignore bad json */}
-    }
-
-    ans.mapFile = mapFile;        // <- attach for front-end use
-    out.push(ans);
-  }
+    try { ans = JSON.parse(raw.toString()); } catch { return; }
+    if (ans && typeof ans === 'object') answered.push([qs[i], ans]);
+  });
+  const truths = await fetchGroundTruth(dataset, answered.map(([q]) => q.uid));
+
+  const out = answered.map(([qObj, ans]) => {
+    const gt = truths[qObj.uid] || { question: extractGroundTruth(qObj, { allowLabelFallback: true }) };
+    ans.uid = ans.uid || qObj.uid;
+    ans.groundTruth = gt.baseline ?? gt.question ?? '';
+    ans.mapFile = qObj.Map || qObj.map || '';   // <- attach for front-end use
+    return ans;
+  });
 
   res.json({ responses: out });
 });
@@ -985,6 +1270,13 @@ app.get('/user_datasets_summary/:pid', async (req, res) => {
     if (summary[ds]) summary[ds].hasResponses = true;
   }
 
+  // 4b) archived datasets keep who answered in their meta stub
+  for (const ds of dsIDs) {
+    if (summary[ds].hasResponses) continue;
+    const { archived } = await getDatasetMeta(ds);
+    if (archived?.responders?.includes(pid)) summary[ds].hasResponses = true;
+  }
+
   // 5) turn it into an array and send
   const datasets = dsIDs.map(id => ({ id, ...summary[id] }));
   res.json({ datasets });
@@ -1008,7 +1300,12 @@ app.post('/edit_qresponse/:pid', async (req, res) => {
   obj.badReason = badQuestion ? (badReason || '') : '';
   obj.discard = !!discard;
   obj.editTimestamp = Date.now();
-  await redis.set(key, JSON.stringify(obj));
+  const write = redis.multi()
+    .set(key, JSON.stringify(obj))
+    .hSet(v1ProgressKey(dataset), `${pid}:last`, String(obj.editTimestamp));
+  if (pid === BASELINE_PID) write.hDel(v1GtKey(dataset), uid);
+  await write.exec();
+  await refreshAdjudicationsFor(dataset, uid);
   res.json({ success: true });
 });
 
@@ -1020,116 +1317,154 @@ app.post('/request_adjudication', express.json(), async (req, res) => {
   if (hasGroundTruthSuffix(dataset))
     return res.status(400).json({ error: 'adjudication not allowed' });
 
-  await redis.sAdd('v1:adjudications', `${pid}:${dataset}:${uid}`);
+  await redis.sAdd(ADJ_SETS.pending, `${pid}:${dataset}:${uid}`);
+  await materializeAdjudications([`${pid}:${dataset}:${uid}`], Date.now());
   res.json({ ok: true });
 });
 
-// List all pending adjudication requests
-app.get('/adjudications', async (req, res) => {
-  if (req.query.code !== ADJUDICATION_PASSCODE)
-    return res.status(403).json({ error: 'forbidden' });
-
-  const ids = await redis.sMembers('v1:adjudications');
-  const out = [];
-  for (const id of ids) {
-    const [pid, dataset, uid] = id.split(':');
-    if (hasGroundTruthSuffix(dataset))
-      continue;
-    const ansRaw = await redis.get(`v1:${pid}:${dataset}:${uid}`);
-    const qRaw   = await redis.get(`v1:datasets:${dataset}:${uid}`);
-    let answer = '', otherAnswer = '', question = '', label = '', mapFile = '';
-    let adjudicator_label = '', badReason = '', otherBadReason = '';
-    try {
-      if (ansRaw) {
-        const obj = JSON.parse(ansRaw.toString());
-        answer = obj.answer || '';
-        otherAnswer = obj.nonconcurred_response || '';
-        adjudicator_label = obj.adjudicator_label || '';
-        badReason = obj.badReason || '';
-      }
-    } catch {}
-    try {
-      if (qRaw) {
-        const q = JSON.parse(qRaw.toString());
-        question = q.Question || q.question || '';
-        label    = q.Label || '';
-        mapFile  = q.Map || q.map || '';
-
-      }
-    } catch {}
-    let otherPid = null;
-    try {
-      const assigned = await getAssigned(dataset);
-      otherPid = assigned.find(p => p !== pid) || null;
-    } catch {}
-    if (otherPid) {
-      try {
-        const otherRaw = await redis.get(`v1:${otherPid}:${dataset}:${uid}`);
-        if (otherRaw) {
-          const obj2 = JSON.parse(otherRaw.toString());
-          if (!otherAnswer) otherAnswer = obj2.answer || '';
-          otherBadReason = obj2.badReason || '';
-        }
-      } catch {}
+/* adjudication queue view (v1:adjview:*, see py/adjudication_view.py):
+   one hash per id, indexed by request / resolution time. An id in both sets
+   (re-requested) is pending; ground-truth datasets are never pending. Ids a
+   set holds but its index deliberately leaves out are kept in ADJ_SKIPS, so
+   |index| = |set| − |skip| */
+const ADJ_SETS    = { pending: 'v1:adjudications', past: 'v1:past_adjudications' };
+const ADJ_INDEXES = { pending: 'v1:adjview:pending', past: 'v1:adjview:past' };
+const ADJ_SKIPS   = { pending: 'v1:adjview:skip:pending', past: 'v1:adjview:skip:past' };
+const v1AdjViewKey = id => v1(`adjview:${id}`);
+
+const parseJSON = raw => {
+  if (!raw) return {};
+  try { const obj = JSON.parse(raw.toString()); return obj && typeof obj === 'object' ? obj : {}; }
+  catch { return {}; }
+};
+
+/* rebuild the rows for ids; index them under `score` (default: keep / now) */
+async function materializeAdjudications(ids, score = null) {
+  ids = [...new Set(ids)].filter(id => id.split(':').length >= 3);
+  if (!ids.length) return;
+  const member = redis.multi();
+  ids.forEach(id => member.sIsMember(ADJ_SETS.pending, id).sIsMember(ADJ_SETS.past, id));
+  const flags = await member.exec();
+
+  const rows = await Promise.all(ids.map(async id => {
+    const [pid, dataset, ...rest] = id.split(':');
+    const uid = rest.join(':');
+    const otherPid = (await getAssigned(dataset)).sort().find(p => p !== pid) || null;
+    /* archived datasets: the answers only live in the segment (py/archive_datasets.py) */
+    const archived = await loadArchivedDataset(dataset);
+    let ansRaw, qRaw, otherRaw;
+    if (archived) {
+      [ansRaw, qRaw, otherRaw] = [archived.answers[pid]?.[uid], archived.questions[uid],
+                                  otherPid ? archived.answers[otherPid]?.[uid] : null];
+    } else {
+      const keys = [v1AnswerKey(pid, dataset, uid), `v1:datasets:${dataset}:${uid}`];
+      if (otherPid) keys.push(v1AnswerKey(otherPid, dataset, uid));
+      [ansRaw, qRaw, otherRaw] = await redis.mGet(keys);
+    }
+    const ans = parseJSON(ansRaw), q = parseJSON(qRaw), other = parseJSON(otherRaw);
+    return {
+      pid, otherPid: otherPid || '', dataset, uid,
+      question: q.Question || q.question || '',
+      label: q.Label || '',
+      mapFile: q.Map || q.map || '',
+      answer: ans.answer || '',
+      otherAnswer: ans.nonconcurred_response || other.answer || '',
+      adjudication: ans.adjudication || '',
+      adjudication_reason: ans.adjudication_reason || '',
+      adjudicator_label: ans.adjudicator_label || '',
+      badQuestion: ans.badQuestion ? '1' : '',
+      badReason: ans.badReason || '',
+      otherBadQuestion: other.badQuestion ? '1' : '',
+      otherBadReason: other.badReason || '',
+      ts: String(ans.editTimestamp || ans.origTimestamp || 0)
+    };
+  }));
+
+  const write = redis.multi();
+  ids.forEach((id, i) => {
+    const [pending, past] = [flags[2 * i], flags[2 * i + 1]];
+    const kind = pending && !hasGroundTruthSuffix(rows[i].dataset) ? 'pending'
+               : past ? 'past' : null;
+    for (const [k, member] of [['pending', pending], ['past', past]]) {
+      if (member && kind !== k) write.sAdd(ADJ_SKIPS[k], id);
+      else write.sRem(ADJ_SKIPS[k], id);
+    }
+    if (!kind) {
+      write.del(v1AdjViewKey(id)).zRem(ADJ_INDEXES.pending, id).zRem(ADJ_INDEXES.past, id);
+      return;
     }
+    const [index, other] = kind === 'past' ? [ADJ_INDEXES.past, ADJ_INDEXES.pending]
+                                           : [ADJ_INDEXES.pending, ADJ_INDEXES.past];
+    write.hSet(v1AdjViewKey(id), rows[i]);
+    if (score != null) write.zAdd(index, { score, value: id });
+    else write.zAdd(index, { score: Number(rows[i].ts) || Date.now(), value: id }, { NX: true });
+    write.zRem(other, id);
+  });
+  await write.exec();
+}
+
+/* rows that show this answer (as either user's side) */
+async function refreshAdjudicationsFor(dataset, uid) {
+  const ids = (await getAssigned(dataset)).map(p => `${p}:${dataset}:${uid}`);
+  const check = redis.multi();
+  ids.forEach(id => check.zScore(ADJ_INDEXES.pending, id).zScore(ADJ_INDEXES.past, id));
+  const scores = await check.exec();
+  const listed = ids.filter((_, i) => scores[2 * i] != null || scores[2 * i + 1] != null);
+  if (listed.length) await materializeAdjudications(listed);
+}
 
-    out.push({ pid, otherPid, dataset, uid, question, answer, otherAnswer, label, mapFile, adjudicator_label, badReason, otherBadReason });
+/* page through one side of the view; ids the view has not caught up with
+   (e.g. before the first `py/adjudication_view.py` run) are built here */
+async function listAdjudications(kind, { offset = 0, limit = -1 } = {}) {
+  const [setSize, skipSize, indexSize] = await Promise.all([
+    redis.sCard(ADJ_SETS[kind]), redis.sCard(ADJ_SKIPS[kind]), redis.zCard(ADJ_INDEXES[kind])
+  ]);
+  if (setSize - skipSize !== indexSize) {
+    const [members, skipped, indexed] = (await Promise.all([
+      redis.sMembers(ADJ_SETS[kind]), redis.sMembers(ADJ_SKIPS[kind]),
+      redis.zRange(ADJ_INDEXES[kind], 0, -1)
+    ])).map(ids => new Set(ids));
+    await materializeAdjudications([
+      ...[...members].filter(id => !indexed.has(id) && !skipped.has(id)),   // missing rows
+      ...[...indexed].filter(id => !members.has(id)),                       // stale rows
+      ...[...skipped].filter(id => !members.has(id) || indexed.has(id))     // stale skips
+    ]);
   }
-  res.json(out);
+
+  if (limit === 0) return [];
+  const stop = limit < 0 ? -1 : offset + limit - 1;
+  const ids = await redis.zRange(ADJ_INDEXES[kind], offset, stop,
+                                 kind === 'past' ? { REV: true } : undefined);
+  if (!ids.length) return [];
+  const read = redis.multi();
+  ids.forEach(id => read.hGetAll(v1AdjViewKey(id)));
+  const rows = await read.exec();
+  return rows.filter(row => kind !== 'pending' || !hasGroundTruthSuffix(row.dataset)).map(row => ({
+    ...row,
+    otherPid: row.otherPid || null,
+    badQuestion: row.badQuestion === '1',
+    otherBadQuestion: row.otherBadQuestion === '1',
+    ts: Number(row.ts) || 0
+  }));
+}
+
+const pageParams = query => ({
+  offset: Math.max(0, parseInt(query.offset, 10) || 0),
+  limit: query.limit != null ? Math.max(0, parseInt(query.limit, 10) || 0) : -1
 });
 
-// List previously resolved adjudications
-app.get('/past_adjudications', async (req, res) => {
+// List all pending adjudication requests (oldest first; ?offset=&limit= to page)
+app.get('/adjudications', async (req, res) => {
   if (req.query.code !== ADJUDICATION_PASSCODE)
     return res.status(403).json({ error: 'forbidden' });
+  res.json(await listAdjudications('pending', pageParams(req.query)));
+});
 
-  const ids = await redis.sMembers('v1:past_adjudications');
-  const out = [];
-  for (const id of ids) {
-    const [pid, dataset, uid] = id.split(':');
-    const ansRaw = await redis.get(`v1:${pid}:${dataset}:${uid}`);
-    const qRaw  = await redis.get(`v1:datasets:${dataset}:${uid}`);
-    let answer='', otherAnswer='', question='', label='', mapFile='';
-    let adjudication='', adjudication_reason='';
-    let adjudicator_label='', badReason='', otherBadReason='';
-    try {
-      if (ansRaw) {
-        const obj = JSON.parse(ansRaw.toString());
-        answer = obj.answer || '';
-        otherAnswer = obj.nonconcurred_response || '';
-        adjudication = obj.adjudication || '';
-        adjudication_reason = obj.adjudication_reason || '';
-        adjudicator_label = obj.adjudicator_label || '';
-        badReason = obj.badReason || '';
-      }
-    } catch {}
-    try {
-      if (qRaw) {
-        const q = JSON.parse(qRaw.toString());
-        question = q.Question || q.question || '';
-        label = q.Label || '';
-        mapFile = q.Map || q.map || '';
-      }
-    } catch {}
-    let otherPid = null;
-    try {
-      const assigned = await getAssigned(dataset);
-      otherPid = assigned.find(p => p !== pid) || null;
-    } catch {}
-    if (otherPid) {
-      try {
-        const otherRaw = await redis.get(`v1:${otherPid}:${dataset}:${uid}`);
-        if (otherRaw) {
-          const obj2 = JSON.parse(otherRaw.toString());
-          if (!otherAnswer) otherAnswer = obj2.answer || '';
-          otherBadReason = obj2.badReason || '';
-        }
-      } catch {}
-    }
-    out.push({ pid, otherPid, dataset, uid, question, answer, otherAnswer, label,
-       mapFile, adjudication, adjudication_reason, adjudicator_label, badReason, otherBadReason });
-  }
-  res.json(out);
+// List previously resolved adjudications (newest first; ?offset=&limit= to page)
+app.get('/past_adjudications', async (req, res) => {
+  if (req.query.code !== ADJUDICATION_PASSCODE)
+    return res.status(403).json({ error: 'forbidden' });
+  res.json(await listAdjudications('past', pageParams(req.query)));
 });
 
 
@@ -1191,9 +1526,11 @@ app.post('/adjudicate_result', express.json(), async (req, res) => {
     }
   }
 
-  await redis.sAdd('v1:past_adjudications', `${pid}:${dataset}:${uid}`);
+  await redis.sAdd(ADJ_SETS.past, `${pid}:${dataset}:${uid}`);
 
-  await redis.sRem('v1:adjudications', `${pid}:${dataset}:${uid}`);
+  await redis.sRem(ADJ_SETS.pending, `${pid}:${dataset}:${uid}`);
+  await materializeAdjudications([`${pid}:${dataset}:${uid}`], Date.now());
+  if (otherPid) await refreshAdjudicationsFor(dataset, uid);
    if (newQuestion && newQuestion.trim()) {
     try {
       const { topic } = await getDatasetMeta(dataset);
@@ -1216,6 +1553,7 @@ app.post('/adjudicate_result', express.json(), async (req, res) => {
         sourceDataset: dataset,
         sourceUid: uid
       }));
+      await publishDatasetEvent(newDsId, 'created');
     } catch (err) {
       console.error('Failed to create rephrased question dataset', err);
     }
@@ -1231,7 +1569,8 @@ app.post('/cancel_adjudication', express.json(), async (req, res) => {
   const { pid, dataset, uid } = req.body || {};
   if (!pid || !dataset || !uid)
     return res.status(400).json({ error: 'missing fields' });
-  await redis.sRem('v1:adjudications', `${pid}:${dataset}:${uid}`);
+  await redis.sRem(ADJ_SETS.pending, `${pid}:${dataset}:${uid}`);
+  await materializeAdjudications([`${pid}:${dataset}:${uid}`]);
   res.json({ ok: true });
 });
 
@@ -1254,6 +1593,21 @@ app.post('/run-python', async (req, res) => {
   let output;
   let nextDs;
   let accuracy = 'submitted';
+  if (isUrbanDataset(dataset) && !hasGroundTruthSuffix(dataset)) {
+    /* graded off-request by py/grading_worker.py, which overwrites the meta and
+       reports the grade to /admin/graded – the next dataset is handed out there,
+       only on a pass */
+    let queued = false;
+    try { await enqueueGrading(prolificID, dataset, { notify: true }); queued = true; }
+    catch (e) { console.error(`Could not queue grading for ${prolificID}/${dataset}, grading now:`, e); }
+    if (queued) {
+      await setUserMeta(prolificID, dataset, accuracy);
+      output = 'Thank you for your submission. Your answers are being graded; if you pass, ' +
+               'your next dataset will appear on the home page.';
+      return res.json({ ok:true, output });
+    }
+  }
+
    if (hasGroundTruthSuffix(dataset) || isUrbanDataset(dataset)) {
     execFile(
       pythonBin,
@@ -1273,7 +1627,7 @@ app.post('/run-python', async (req, res) => {
           save_file = JSON.parse(lastLine).eval_file;
           if (typeof accuracy !== 'number' && accuracy !== 'string')
             throw new Error('missing accuracy field');
-          execFile(surveyPython, [addEval, prolificID, dataset, save_file], {cwd: surveyRoot}, async (err, stdout, stderr) =>{
+          execFile(surveyPython, [surveyCli, 'add-eval', prolificID, dataset, save_file], {cwd: surveyRoot}, async (err, stdout, stderr) =>{
             if (err) {
               console.error('Python error:', stderr);
               return res.status(500).json({ error: 'database update failed' });
@@ -1286,7 +1640,7 @@ app.post('/run-python', async (req, res) => {
 
         if (typeof accuracy === 'string') {
           output = 'Thank you for your submission.'
-        } else  if (dataset.endsWith('Training') || (accuracy >= 0.85)) {             // only then branch to new work
+        } else  if (passesGate(dataset, accuracy)) {             // only then branch to new work
           try { nextDs = await getNextDataset(prolificID, dataset); }
           catch (e) { return res.status(500).json({ error: e.message }); }
           if (isTrainingDataset(dataset)){
@@ -1300,7 +1654,7 @@ app.post('/run-python', async (req, res) => {
           output = 'We are sorry, you do not meet the requirements to continue this study. Thank you for your participation.'
         }
 
-        await redis.set(metaKey, accuracy);
+        await setUserMeta(prolificID, dataset, accuracy);
         return res.json({ ok:true, output });
       }
     );
@@ -1333,7 +1687,7 @@ app.post('/run-python', async (req, res) => {
 
   if (groundTruthAccuracies.size) {
     await Promise.all(Array.from(groundTruthAccuracies.entries()).map(([pid, score]) =>
-      redis.set(`v1:${pid}:${dataset}:meta`, score)
+      setUserMeta(pid, dataset, score)
     ));
     if (groundTruthAccuracies.has(prolificID)) {
       accuracy = groundTruthAccuracies.get(prolificID);
@@ -1349,7 +1703,7 @@ app.post('/run-python', async (req, res) => {
       if (typeof accuracy !== 'number' && accuracy !== 'string')
         throw new Error('missing accuracy field');
           // update user response for unmatched answers
-      const unmatchedOut = await execFileAsync(surveyPython, [addUnmatchedResponse, assigned[0], assigned[1], dataset, JSON.stringify(incorrect_annotations)], {cwd: surveyRoot});
+      const unmatchedOut = await execFileAsync(surveyPython, [surveyCli, 'add-unmatched', assigned[0], assigned[1], dataset, JSON.stringify(incorrect_annotations)], {cwd: surveyRoot});
       console.log(unmatchedOut.stdout)
     } catch (err) {
       console.error('Error in executing compareRespones.py\n', err);
@@ -1358,10 +1712,8 @@ app.post('/run-python', async (req, res) => {
         return res.status(500).json({ error: err.message || 'Internal error' });
       }
     }
-    const user1_meta_key = `v1:${assigned[0]}:${dataset}:meta`;
-    const user2_meta_key = `v1:${assigned[1]}:${dataset}:meta`;
-    await redis.set(user1_meta_key, accuracy);
-    await redis.set(user2_meta_key, accuracy);
+    await setUserMeta(assigned[0], dataset, accuracy);
+    await setUserMeta(assigned[1], dataset, accuracy);
   }
 
   try { nextDs = await getNextDataset(prolificID, dataset); }
@@ -1375,7 +1727,7 @@ app.post('/run-python', async (req, res) => {
              'Please check back at Prolific for future campaigns.';
   }
 
-  await redis.set(metaKey, accuracy);
+  await setUserMeta(prolificID, dataset, accuracy);
   res.json({ ok:true, output });
 });
 
@@ -1385,7 +1737,8 @@ app.get('/export_responses/:pid/:ds', async (req, res) => {
   const { pid, ds } = req.params;
 
   // sanity-check inputs
-  if (!DATASET_IDS.includes(ds))
+  const archived = DATASET_IDS.includes(ds) ? null : await loadArchivedDataset(ds);
+  if (!DATASET_IDS.includes(ds) && !archived)
     return res.status(404).json({ error: 'unknown dataset' });
 
   // Only keys that match this user & dataset
@@ -1395,6 +1748,15 @@ app.get('/export_responses/:pid/:ds', async (req, res) => {
   res.setHeader('Content-Type', 'application/x-ndjson; charset=utf-8');
 
   try {
+    if (archived) {
+      for (const [uid, raw] of Object.entries(archived.answers[pid] || {})) {
+        let obj;
+        try { obj = JSON.parse(raw); } catch { continue; }
+        res.write(JSON.stringify({ ...obj, prolificID: pid, dataset: ds, uid }) + '\n');
+      }
+      return res.end();
+    }
+
     for await (const keyBuf of redis.scanIterator({ MATCH: pattern })) {
       const key = keyBuf.toString();
 
@@ -1426,9 +1788,15 @@ app.get('/export_responses/:pid/:ds', async (req, res) => {
 async function exportAdjudicatedData() {
   const ids = await redis.sMembers('v1:past_adjudications');
   const byDataset = {};
-  for (const id of ids) {
+  const raws = ids.length
+    ? await redis.mGet(ids.map(id => {
+        const [pid, dataset, uid] = id.split(':');
+        return `v1:${pid}:${dataset}:${uid}`;
+      }))
+    : [];
+  for (const [i, id] of ids.entries()) {
     const [pid, dataset, uid] = id.split(':');
-    const raw = await redis.get(`v1:${pid}:${dataset}:${uid}`);
+    const raw = raws[i] ?? (await loadArchivedDataset(dataset))?.answers[pid]?.[uid];
     if (!raw) continue;
     let obj;
     try { obj = JSON.parse(raw.toString()); }
@@ -1468,6 +1836,8 @@ function scheduleDailyExport() {
 (async () => {
   await redis.connect();
   await loadDatasetsFromRedis();            // ← new
+  await subscribeDatasetEvents();
+  await ensureAvailabilityIndex();
   scheduleDailyExport();
   app.listen(PORT, () => console.log(`Started server on http://localhost:${PORT}`));
 })();